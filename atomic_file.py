@@ -0,0 +1,28 @@
+import json
+import os
+import tempfile
+
+def atomic_write_text(path, text, encoding='utf-8'):
+    """Write text to path via a temp file in the same directory and an atomic rename.
+
+    Readers (including the Factorio server) only ever see the old or the new
+    contents, never a partially written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Serialize data as JSON and write it atomically to path."""
+    atomic_write_text(path, json.dumps(data, **dump_kwargs))
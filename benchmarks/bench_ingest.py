@@ -0,0 +1,359 @@
+"""Benchmark the verbose.log ingest path on a synthetic log stream.
+
+Generates lines in the formats the server and the softmod write to
+verbose.log (logging.lua, fw_stats.lua, online.lua), the [DW1] records of
+current softmods and the per-event lines of older saves alike, with a
+configurable mix, then times two passes:
+
+    readlog   ReadLogCog.process_log_line for every line, against a fake
+              Discord channel, with StatsLogger subscribed the way StatsCog
+              does it and a tailer checkpoint every CHECKPOINT_MAX_LINES lines
+    stats     StatsLogger.process_line alone on the stats lines
+
+and reports lines/sec, p50/p99 per-line latency and the stats DB write rate.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_ingest --lines 100000 --mix chat=10 session=10 records=80 --json ingest.json
+
+``--write-log verbose.log`` also dumps the stream, e.g. to feed stats_replay.py.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs import stats_logger as stats_logger_module
+from cogs.readlog import CHECKPOINT_MAX_LINES, ReadLogCog
+from config_manager import ConfigManager
+from instrumentation import Instrumentation
+from location_pref_store import LocationPreferenceStore
+from registration_store import RegistrationStore
+from server_status import ServerFacts
+from state_store import StateStore
+from softmod_protocol import PROTOCOL_TAG
+from stats_parser import STATS_MARKERS
+
+# 'records' are the [DW1] JSON records of current softmods; act, stats and online are the
+# per-event and text listing lines of saves augmented before them
+DEFAULT_MIX = {'chat': 10, 'act': 5, 'stats': 5, 'online': 0, 'session': 10, 'records': 70}
+
+PLAYERS = [f"engineer{i:02d}" for i in range(24)]
+ENTITIES = ['transport-belt', 'inserter', 'fast-inserter', 'assembling-machine-2', 'stone-furnace',
+            'electric-mining-drill', 'small-electric-pole', 'pipe', 'iron-chest', 'rail']
+MINED = ENTITIES + ['tree-01', 'tree-05', 'dead-dry-hairy-tree', 'rock-big', 'huge-rock']
+ENEMIES = ['small-biter', 'medium-biter', 'big-biter', 'small-spitter', 'medium-spitter',
+           'small-worm-turret', 'biter-spawner', 'spitter-spawner']
+WEAPONS = ['submachine-gun', 'pistol', 'shotgun', 'rocket-launcher', 'unknown']
+RESEARCH = ['automation', 'logistics', 'military-2', 'oil-processing', 'advanced-circuit']
+CHAT = ['hi', 'need more iron', 'biters at the north wall', 'brb', '!statsme', 'nice base',
+        'check this [gps=12.5,-40.5]']
+
+class LogGenerator:
+    """Synthetic verbose.log lines; seeded, so runs with the same arguments see the same stream."""
+
+    def __init__(self, mix, seed=0):
+        self.random = random.Random(seed)
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.tick = 0
+        self.online = set()
+
+    def game_time(self):
+        # get_formatted_time() in logging.lua
+        total_seconds = self.tick // 60
+        return f"{total_seconds // 3600:02d}:{total_seconds % 3600 // 60:02d}:{total_seconds % 60:02d}"
+
+    def wall_time(self):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1700000000 + self.tick // 60))
+
+    def player(self):
+        return self.random.choice(sorted(self.online) or PLAYERS)
+
+    def gps(self):
+        return f"[gps={self.random.uniform(-500, 500):.1f},{self.random.uniform(-500, 500):.1f}]"
+
+    def chat(self):
+        return f"{self.wall_time()} [CHAT] {self.player()}: {self.random.choice(CHAT)}"
+
+    def act(self):
+        if self.random.random() < 0.5:
+            return f"{self.game_time()} [ACT] {self.player()} mined {self.random.choice(MINED)} {self.gps()}"
+        return f"{self.game_time()} [ACT] {self.player()} placed {self.random.choice(ENTITIES)}"
+
+    def stats(self):
+        roll = self.random.random()
+        if roll < 0.6:
+            return (f"[STATS-E1] [{self.player()}] killed [{self.random.choice(ENEMIES)}] "
+                    f"with [{self.random.choice(WEAPONS)}]")
+        if roll < 0.9:
+            return f"[STATS-E2] [gun-turret] killed [{self.random.choice(ENEMIES)}]"
+        if roll < 0.97:
+            return f"[STATS-D2] [{self.player()}] killed by [{self.random.choice(ENEMIES)}] force [enemy]"
+        return f"[STATS-D3] [{self.player()}] died from unknown cause"
+
+    def records(self):
+        roll = self.random.random()
+        if roll < 0.35:
+            event = {'t': 'act', 'p': self.player(), 'a': self.random.choice(['mined', 'placed']),
+                     'c': {name: self.random.randint(1, 50) for name in self.random.sample(MINED, 4)}}
+        elif roll < 0.6:
+            event = {'t': 'kills', 'p': self.player(), 'w': self.random.choice(WEAPONS),
+                     'c': {name: self.random.randint(1, 200) for name in self.random.sample(ENEMIES, 3)}}
+        elif roll < 0.7:
+            event = {'t': 'pdeath', 'p': self.player(), 'k': self.random.choice(ENEMIES), 'f': 'enemy'}
+        elif roll < 0.85:
+            event = {'t': 'online', 'p': [{'n': name, 's': self.random.randint(0, 600), 'm': self.random.randint(0, 600),
+                                           'r': 'player', 'a': ''} for name in sorted(self.online)]}
+        else:
+            event = {'t': 'heartbeat', 'tick': self.tick, 'speed': 1}
+        return PROTOCOL_TAG + json.dumps(event, separators=(',', ':'))
+
+    def online_line(self):
+        if self.random.random() < 0.5:
+            # on_tick listing in logging.lua
+            return "[ONLINE2] " + ", ".join(sorted(self.online))
+        # update_player_list() in online.lua: name,score,time,type,afk;
+        return "[ONLINE2] " + "".join(f"{name},{self.random.randint(0, 600)},{self.random.randint(0, 600)},player,;"
+                                      for name in sorted(self.online))
+
+    def session(self):
+        offline = [name for name in PLAYERS if name not in self.online]
+        if offline and (len(self.online) < 4 or self.random.random() < 0.5):
+            name = self.random.choice(offline)
+            self.online.add(name)
+            address = f"{{10.{self.random.randint(0, 255)}.{self.random.randint(0, 255)}.{self.random.randint(1, 254)}:34197}}"
+            return [f"{self.tick / 60:10.3f} Info ServerMultiplayerManager.cpp:1015: Received peer info for peer({len(self.online)}) "
+                    f"username({name}) from(IP ADDR:({address}))",
+                    f"{self.wall_time()} [JOIN] {name} joined the game",
+                    f"{self.game_time()} [JOIN] {name} joined the game"]
+        if self.random.random() < 0.2:
+            return [f"{self.game_time()} [MSG] Research {self.random.choice(RESEARCH)} completed."]
+        name = self.random.choice(sorted(self.online))
+        self.online.discard(name)
+        return [f"{self.wall_time()} [LEAVE] {name} left the game",
+                f"{self.game_time()} [LEAVE] {name} left the game"]
+
+    def lines(self, count):
+        produced = 0
+        while produced < count:
+            self.tick += self.random.randint(1, 30)
+            kind = self.random.choices(self.kinds, self.weights)[0]
+            if kind == 'session':
+                batch = self.session()
+            elif kind == 'online':
+                batch = [self.online_line()]
+            else:
+                batch = [getattr(self, kind)()]
+            for line in batch[:count - produced]:
+                produced += 1
+                yield line + "\n"
+
+class FakeChannel:
+    """Stands in for the Discord channel ReadLogCog announces to."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+def make_bot(workdir):
+    install_location = os.path.join(workdir, 'factorio')
+    config_file = os.path.join(workdir, 'config.json')
+    with open(config_file, 'w') as f:
+        json.dump({
+            'factorio_server': {'install_location': install_location},
+            'discord': {'factorio_general_channel_id': 1, 'show_locations': True},
+            'geo_database_path': os.path.join(workdir, 'missing.mmdb'),
+        }, f)
+    state_store = StateStore(os.path.join(workdir, 'state.db'))
+    registration_store = RegistrationStore(state_store)
+    return SimpleNamespace(config_manager=ConfigManager(config_file),
+                           state_store=state_store,
+                           registration_store=registration_store,
+                           location_prefs=LocationPreferenceStore(state_store, registration_store),
+                           server_facts=ServerFacts(),
+                           instrumentation=Instrumentation(),
+                           loop=asyncio.get_running_loop())
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def summarize(latencies, elapsed):
+    latencies.sort()
+    return {
+        'lines': len(latencies),
+        'seconds': round(elapsed, 4),
+        'lines_per_sec': round(len(latencies) / elapsed) if elapsed else 0,
+        'p50_us': round(percentile(latencies, 0.50) * 1e6, 1),
+        'p99_us': round(percentile(latencies, 0.99) * 1e6, 1),
+        'max_us': round(latencies[-1] * 1e6, 1) if latencies else 0.0,
+    }
+
+class CountingStatsLogger:
+    """Wraps StatsLogger.flush to count committed updates and time the commits."""
+
+    def __init__(self, stats_logger):
+        self.stats_logger = stats_logger
+        self.updates = 0
+        self.commits = 0
+        self.seconds = 0.0
+        self._flush = stats_logger.flush
+        stats_logger.flush = self.flush
+
+    def flush(self, reset=False):
+        pending = len(self.stats_logger.pending)
+        start = time.perf_counter()
+        self._flush(reset)
+        self.seconds += time.perf_counter() - start
+        if pending:
+            self.updates += pending
+            self.commits += 1
+
+    def result(self, elapsed):
+        return {
+            'updates': self.updates,
+            'commits': self.commits,
+            'commit_seconds': round(self.seconds, 4),
+            'updates_per_sec': round(self.updates / elapsed) if elapsed else 0,
+        }
+
+async def run(lines, send_latency):
+    workdir = tempfile.mkdtemp(prefix='bench_ingest_')
+    results = {}
+    try:
+        bot = make_bot(workdir)
+        readlog = ReadLogCog(bot)
+        channel = FakeChannel(send_latency)
+
+        stats_logger = stats_logger_module.StatsLogger(bot, db_file=os.path.join(workdir, 'player_stats.db'))
+        counter = CountingStatsLogger(stats_logger)
+
+        async def process_stats_line(line):
+            # StatsCog.process_stats_line
+            await stats_logger.process_line(line, readlog.line_position)
+
+        for message_type in ("STATS-E1", "STATS-D2", "ACT", "CHAT"):
+            readlog.subscribe(message_type, process_stats_line)
+        readlog.add_checkpoint_listener(counter.flush)
+
+        # readlog pass: the tailer's per-line work, checkpointing like process_raw_lines does
+        latencies = []
+        offset = 0
+        started = time.perf_counter()
+        for number, line in enumerate(lines, start=1):
+            offset += len(line)
+            start = time.perf_counter()
+            readlog.line_position = (readlog.log_inode, offset)
+            bot.server_facts.feed(line)
+            await readlog.process_log_line(line, channel)
+            latencies.append(time.perf_counter() - start)
+            if number % CHECKPOINT_MAX_LINES == 0:
+                readlog.checkpoint()
+        readlog.checkpoint()
+        elapsed = time.perf_counter() - started
+        results['readlog'] = summarize(latencies, elapsed)
+        results['readlog']['discord_sends'] = channel.sent
+        results['readlog']['db'] = counter.result(elapsed)
+
+        # stats pass: the stats path alone, on a fresh cursor so no line is skipped as already counted
+        stats_logger.cursor = None
+        counter.updates = counter.commits = 0
+        counter.seconds = 0.0
+        stats_lines = [line for line in lines if any(marker in line for marker in STATS_MARKERS)]
+        latencies = []
+        started = time.perf_counter()
+        for line in stats_lines:
+            start = time.perf_counter()
+            await stats_logger.process_line(line)
+            latencies.append(time.perf_counter() - start)
+        stats_logger.flush()
+        elapsed = time.perf_counter() - started
+        results['stats'] = summarize(latencies, elapsed)
+        results['stats']['db'] = counter.result(elapsed)
+
+        readlog.close_log()
+        stats_logger.close_database()
+        bot.state_store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def parse_mix(items):
+    mix = dict(DEFAULT_MIX)
+    if items:
+        mix = {kind: 0 for kind in DEFAULT_MIX}
+        for item in items:
+            kind, _, weight = item.partition('=')
+            if kind not in DEFAULT_MIX:
+                raise argparse.ArgumentTypeError(f"unknown line kind '{kind}' (choose from {', '.join(DEFAULT_MIX)})")
+            mix[kind] = float(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the D-Wire log ingest path")
+    parser.add_argument('--lines', type=int, default=50000, help="Number of synthetic log lines")
+    parser.add_argument('--mix', nargs='+', metavar='KIND=WEIGHT',
+                        help=f"Relative line mix over {', '.join(DEFAULT_MIX)} (default: "
+                             f"{' '.join(f'{kind}={weight}' for kind, weight in DEFAULT_MIX.items())})")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic stream")
+    parser.add_argument('--send-latency', type=float, default=0.0, help="Fake Discord send latency in seconds")
+    parser.add_argument('--write-log', help="Also write the synthetic stream to this file")
+    parser.add_argument('--json', dest='json_file', help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    lines = list(LogGenerator(mix, args.seed).lines(args.lines))
+    if args.write_log:
+        with open(args.write_log, 'w') as f:
+            f.writelines(lines)
+
+    # Keep per-line INFO logging out of the timings
+    for name in ('cogs.readlog', 'cogs.stats_logger', 'state_store', 'server_status', 'registration_store',
+                 'location_pref_store'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    results = asyncio.run(run(lines, args.send_latency))
+    for name, result in results.items():
+        db = result['db']
+        print(f"{name:>8}: {result['lines']} lines in {result['seconds']:.3f}s = {result['lines_per_sec']} lines/s | "
+              f"p50 {result['p50_us']}us p99 {result['p99_us']}us max {result['max_us']}us | "
+              f"db {db['updates']} updates in {db['commits']} commits ({db['commit_seconds']:.3f}s), "
+              f"{db['updates_per_sec']} updates/s")
+
+    if args.json_file:
+        with open(args.json_file, 'w') as f:
+            json.dump({'timestamp': time.time(), 'revision': git_revision(),
+                       'params': {'lines': args.lines, 'mix': mix, 'seed': args.seed,
+                                  'send_latency': args.send_latency},
+                       'results': results}, f, indent=2)
+        print(f"Wrote {args.json_file}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark the mod subsystem against the local fake portal.
+
+Times the four hot paths of the mod cogs for 10/100/500 synthetic mods:
+
+    scan          ModDiscoveryCog.scan_mods (zip indexing)
+    update-check  ModTrackerCog.check_for_updates, cold and conditional (304) pass
+    resolve       ModDiscoveryCog.match_with_portal for every installed mod
+    install       ModsCog.install_mod for every mod (download + mod-list.json)
+
+Run from the repository root::
+
+    python -m benchmarks.bench_mods --sizes 10 100 500 --latency 0.02 --json mods.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_manager import ConfigManager
+from state_store import StateStore
+from benchmarks.fake_portal import FakeModPortal, make_mod_zip
+
+def make_bot(workdir, portal_url, install_location):
+    config_file = os.path.join(workdir, 'config.json')
+    with open(config_file, 'w') as f:
+        json.dump({
+            'factorio_server': {'install_location': install_location},
+            'factorio_mod_portal': {
+                'username': 'bench',
+                'token': 'bench',
+                'portal_url': portal_url,
+                'update_check_hours': 0
+            }
+        }, f)
+    return SimpleNamespace(config_manager=ConfigManager(config_file),
+                           state_store=StateStore(os.path.join(workdir, 'state.db')))
+
+def seed_install(install_location, portal, count):
+    """Install version 1.0.0 of each mod locally; the portal also offers 1.1.0."""
+    mod_path = os.path.join(install_location, 'mods')
+    os.makedirs(mod_path, exist_ok=True)
+    names = [f"bench-mod-{i:04d}" for i in range(count)]
+    for name in names:
+        portal.add_mod(name, versions=("1.0.0", "1.1.0"))
+        make_mod_zip(mod_path, name, "1.0.0")
+    with open(os.path.join(mod_path, 'mod-list.json'), 'w') as f:
+        json.dump({'mods': [{'name': 'base', 'enabled': True}] +
+                           [{'name': name, 'enabled': True} for name in names]}, f, indent=4)
+    return names
+
+async def timed(results, label, coro):
+    start = time.perf_counter()
+    value = await coro
+    results[label] = round(time.perf_counter() - start, 4)
+    return value
+
+async def run_size(count, latency):
+    from cogs.mods import ModsCog
+    from cogs.mod_tracker import ModTrackerCog
+    from cogs.mod_discovery import ModDiscoveryCog
+
+    workdir = tempfile.mkdtemp(prefix=f'bench_mods_{count}_')
+    install_location = os.path.join(workdir, 'factorio')
+    portal = FakeModPortal(fixture_dir=os.path.join(workdir, 'portal'), latency=latency)
+    os.makedirs(portal.fixture_dir)
+    results = {'mods': count, 'latency': latency}
+    try:
+        names = seed_install(install_location, portal, count)
+        with portal:
+            bot = make_bot(workdir, portal.url, install_location)
+            mods_cog = ModsCog(bot)
+            tracker = ModTrackerCog(bot)
+            discovery = ModDiscoveryCog(bot)
+
+            installed = await timed(results, 'scan', discovery.scan_mods())
+            updates = await timed(results, 'update_check_cold', tracker.check_for_updates())
+            await timed(results, 'update_check_warm', tracker.check_for_updates())
+
+            async def resolve_all():
+                return [await discovery.match_with_portal(mod) for mod in installed]
+            matches = await timed(results, 'resolve', resolve_all())
+
+            async def install_all():
+                return [await mods_cog.install_mod(f"{portal.url}/mod/{name}") for name in names]
+            installs = await timed(results, 'install', install_all())
+
+        results['updates_found'] = len(updates)
+        results['resolved'] = sum(1 for match in matches if match)
+        results['installed'] = sum(1 for ok in installs if ok)
+        results['requests'] = dict(portal.request_counts)
+        bot.state_store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the D-Wire mod subsystem")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500], help="Numbers of synthetic mods")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake portal latency per request in seconds")
+    parser.add_argument('--json', dest='json_file', help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    # Keep per-mod INFO logging out of the timings
+    for name in ('cogs.mods', 'mod_tracker', 'mod_discovery', 'mod_list_store'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    all_results = []
+    for size in args.sizes:
+        results = asyncio.run(run_size(size, args.latency))
+        all_results.append(results)
+        print(f"{size:>5} mods: scan {results['scan']:.3f}s | "
+              f"update-check {results['update_check_cold']:.3f}s cold / {results['update_check_warm']:.3f}s warm | "
+              f"resolve {results['resolve']:.3f}s | install {results['install']:.3f}s | "
+              f"{results['updates_found']} updates, {results['resolved']} resolved, {results['installed']} installed")
+
+    if args.json_file:
+        with open(args.json_file, 'w') as f:
+            json.dump({'timestamp': time.time(), 'results': all_results}, f, indent=2)
+        print(f"Wrote {args.json_file}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""Local stand-in for the Factorio mod portal (mods.factorio.com).
+
+Serves the subset of the portal API that the mod cogs use, backed by
+synthetic fixture zips:
+
+    GET /api/mods?q=<query>         search
+    GET /api/mods/<name>            short details
+    GET /api/mods/<name>/full       full details (ETag / If-None-Match aware)
+    GET /download/<name>/<version>  release zip
+
+Point a bot at it by setting ``factorio_mod_portal.portal_url`` to
+``FakeModPortal.url``. Run standalone with::
+
+    python -m benchmarks.fake_portal --mods 100 --latency 0.05 --port 8080
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from aiohttp import web
+
+def make_mod_zip(directory, name, version, factorio_version="2.0", author="bench", extra_bytes=0):
+    """Write a Factorio-style mod zip (<name>_<version>/info.json) and return its path."""
+    file_name = f"{name}_{version}.zip"
+    path = os.path.join(directory, file_name)
+    info = {
+        'name': name,
+        'version': version,
+        'title': name.replace('-', ' ').title(),
+        'author': author,
+        'description': f"Synthetic mod {name}",
+        'factorio_version': factorio_version
+    }
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(f"{name}_{version}/info.json", json.dumps(info))
+        zip_file.writestr(f"{name}_{version}/control.lua", "-- synthetic\n" + "--\n" * (extra_bytes // 3))
+    return path
+
+class FakeModPortal:
+    def __init__(self, fixture_dir=None, latency=0.0, host='127.0.0.1', port=0):
+        self.fixture_dir = fixture_dir or tempfile.mkdtemp(prefix='fake_portal_')
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.mods = {}
+        self.request_counts = {'details': 0, 'full': 0, 'not_modified': 0, 'search': 0, 'download': 0}
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def add_mod(self, name, versions=("1.0.0",), owner="bench", extra_bytes=0):
+        """Register a mod with one fixture zip per version (oldest first)."""
+        releases = []
+        for version in versions:
+            path = make_mod_zip(self.fixture_dir, name, version, author=owner, extra_bytes=extra_bytes)
+            with open(path, 'rb') as f:
+                sha1 = hashlib.sha1(f.read()).hexdigest()
+            releases.append({
+                'download_url': f"/download/{name}/{version}",
+                'file_name': os.path.basename(path),
+                'info_json': {'factorio_version': "2.0"},
+                'released_at': "2024-10-21T00:00:00.000000Z",
+                'version': version,
+                'sha1': sha1
+            })
+        self.mods[name] = {
+            'name': name,
+            'title': name.replace('-', ' ').title(),
+            'owner': owner,
+            'summary': f"Synthetic mod {name}",
+            'downloads_count': 0,
+            'releases': releases
+        }
+
+    def _etag(self, name):
+        return '"%s"' % hashlib.sha1(json.dumps(self.mods[name]['releases'], sort_keys=True).encode()).hexdigest()
+
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def handle_search(self, request):
+        await self._delay()
+        self.request_counts['search'] += 1
+        query = request.query.get('q', '').lower()
+        results = [
+            {
+                'name': mod['name'],
+                'title': mod['title'],
+                'owner': mod['owner'],
+                'summary': mod['summary'],
+                'latest_release': mod['releases'][-1]
+            }
+            for mod in self.mods.values()
+            if query in mod['name'].lower() or query in mod['title'].lower()
+        ]
+        return web.json_response({'pagination': {'count': len(results)}, 'results': results})
+
+    async def handle_details(self, request):
+        await self._delay()
+        self.request_counts['details'] += 1
+        mod = self.mods.get(request.match_info['name'])
+        if not mod:
+            return web.json_response({'message': 'Mod not found'}, status=404)
+        return web.json_response(mod)
+
+    async def handle_full(self, request):
+        await self._delay()
+        name = request.match_info['name']
+        mod = self.mods.get(name)
+        if not mod:
+            return web.json_response({'message': 'Mod not found'}, status=404)
+        etag = self._etag(name)
+        if request.headers.get('If-None-Match') == etag:
+            self.request_counts['not_modified'] += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        self.request_counts['full'] += 1
+        return web.json_response(dict(mod, changelog="", dependencies=[]), headers={'ETag': etag})
+
+    async def handle_download(self, request):
+        await self._delay()
+        self.request_counts['download'] += 1
+        path = os.path.join(self.fixture_dir, f"{request.match_info['name']}_{request.match_info['version']}.zip")
+        if not os.path.exists(path):
+            return web.Response(status=404)
+        return web.FileResponse(path)
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get('/api/mods', self.handle_search)
+        app.router.add_get('/api/mods/{name}', self.handle_details)
+        app.router.add_get('/api/mods/{name}/full', self.handle_full)
+        app.router.add_get('/download/{name}/{version}', self.handle_download)
+        return app
+
+    async def _start(self):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def start(self):
+        """Serve from a background thread so blocking clients (requests) can't stall the portal."""
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            self._started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='fake-mod-portal', daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if not self._loop:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Factorio mod portal")
+    parser.add_argument('--mods', type=int, default=10, help="Number of synthetic mods to serve")
+    parser.add_argument('--latency', type=float, default=0.0, help="Added latency per request in seconds")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    portal = FakeModPortal(latency=args.latency, host=args.host, port=args.port)
+    for i in range(args.mods):
+        portal.add_mod(f"bench-mod-{i:04d}", versions=("1.0.0", "1.1.0"))
+    print(f"Serving {args.mods} mods from {portal.fixture_dir} at http://{args.host}:{args.port}")
+    web.run_app(portal.make_app(), host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,11 @@ import time
 import subprocess
 import traceback
 from config_manager import ConfigManager
+from instrumentation import Instrumentation
+from location_pref_store import LocationPreferenceStore
+from registration_store import RegistrationStore
+from server_status import ServerFacts
+from state_store import StateStore
 from logger import setup_logger
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
@@ -360,6 +365,16 @@ class CogWatcher(FileSystemEventHandler):
                 self.bot.loop
             ).result()  # Wait for the result
 
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """Command tree that times every application command into bot.instrumentation"""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras['perf_started'] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        self.client.instrumentation.command_finished(interaction, 'error')
+        await super().on_error(interaction, error)
+
 class AutoReconnectBot(commands.Bot):
     async def setup_hook(self):
         self.reconnect_attempts = 0
@@ -372,6 +387,9 @@ class AutoReconnectBot(commands.Bot):
             self.config_manager.set('discord.application_id', str(self.application_id))
             self.config_manager.save()
 
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        self.instrumentation.command_finished(interaction, 'ok')
+
     async def on_guild_join(self, guild):
         """Handle bot joining a new guild"""
         logger.info(f'Bot joined guild: {guild.name} (ID: {guild.id})')
@@ -418,6 +436,7 @@ class AutoReconnectBot(commands.Bot):
     async def close(self):
         self.reconnect_attempts = 0
         await super().close()
+        self.state_store.close()
 
     async def connect(self, *, reconnect=True):
         while True:
@@ -444,34 +463,24 @@ class AutoReconnectBot(commands.Bot):
     async def track_role_assignment(self, member: discord.Member, role: discord.Role):
         """Track when a role is assigned to a member"""
         try:
-            assignments_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "role_assignments.json")
-            assignments = {}
-            
-            if os.path.exists(assignments_file):
-                with open(assignments_file, 'r') as f:
-                    assignments = json.load(f)
-            
-            # Add the member to the role's assignments
-            role_assignments = assignments.get(str(role.id), [])
-            if str(member.id) not in role_assignments:
-                role_assignments.append(str(member.id))
-                assignments[str(role.id)] = role_assignments
-                
-                with open(assignments_file, 'w') as f:
-                    json.dump(assignments, f, indent=2)
-                
+            if await self.state_store.run(self.state_store.add_role_assignment, role.id, member.id):
                 logger.debug(f"Tracked role assignment: {role.name} -> {member.name}")
-            
         except Exception as e:
-            logger.error(f"Error tracking role assignment: {str(e)}")            
+            logger.error(f"Error tracking role assignment: {str(e)}")
 
 # Start the bot
 intents = discord.Intents.all()
 intents.messages = True
 intents.message_content = True
 
-bot = AutoReconnectBot(command_prefix='/', intents=intents)
+bot = AutoReconnectBot(command_prefix='/', intents=intents, tree_cls=InstrumentedCommandTree)
 bot.config_manager = config_manager
+bot.instrumentation = Instrumentation()
+bot.state_store = StateStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dwire_state.db'))
+bot.state_store.import_legacy_files(os.path.dirname(os.path.abspath(__file__)))
+bot.registration_store = RegistrationStore(bot.state_store)
+bot.location_prefs = LocationPreferenceStore(bot.state_store, bot.registration_store)
+bot.server_facts = ServerFacts()
 bot.logger = logger
 
 if config_manager.get('debug_mode', False):
@@ -561,16 +570,8 @@ async def send_status_message(channel, title, description, color=discord.Color.b
 async def restore_role_assignments(guild, old_role_id, new_role):
     """Restores role assignments when a role is recreated"""
     try:
-        # Load the role assignments file
-        assignments_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "role_assignments.json")
-        assignments = {}
-        
-        if os.path.exists(assignments_file):
-            with open(assignments_file, 'r') as f:
-                assignments = json.load(f)
-        
         # Get the list of member IDs for the old role
-        member_ids = assignments.get(str(old_role_id), [])
+        member_ids = await bot.state_store.run(bot.state_store.get_role_members, old_role_id)
         
         # Reassign the role to all previous members
         success_count = 0
@@ -583,13 +584,8 @@ async def restore_role_assignments(guild, old_role_id, new_role):
                 except Exception as e:
                     logger.error(f"Failed to reassign role to member {member_id}: {str(e)}")
         
-        # Update the assignments with the new role ID
-        assignments[str(new_role.id)] = member_ids
-        assignments.pop(str(old_role_id), None)
-        
-        # Save the updated assignments
-        with open(assignments_file, 'w') as f:
-            json.dump(assignments, f, indent=2)
+        # Move the assignments over to the new role ID
+        await bot.state_store.run(bot.state_store.move_role_assignments, old_role_id, new_role.id)
         
         logger.info(f"Restored role assignments for {success_count}/{len(member_ids)} members")
         
@@ -599,22 +595,7 @@ async def restore_role_assignments(guild, old_role_id, new_role):
 async def track_role_assignment(member, role):
     """Tracks when a role is assigned to a member"""
     try:
-        assignments_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "role_assignments.json")
-        assignments = {}
-        
-        if os.path.exists(assignments_file):
-            with open(assignments_file, 'r') as f:
-                assignments = json.load(f)
-        
-        # Add the member to the role's assignments
-        role_assignments = assignments.get(str(role.id), [])
-        if str(member.id) not in role_assignments:
-            role_assignments.append(str(member.id))
-            assignments[str(role.id)] = role_assignments
-            
-            with open(assignments_file, 'w') as f:
-                json.dump(assignments, f, indent=2)
-            
+        if await bot.state_store.run(bot.state_store.add_role_assignment, role.id, member.id):
             logger.debug(f"Tracked role assignment: {role.name} -> {member.name}")
             
     except Exception as e:
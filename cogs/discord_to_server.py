@@ -29,7 +29,8 @@ class DiscordToServerCog(commands.Cog):
     async def connect_rcon(self):
         try:
             self.rcon_client = RCONClient(self.rcon_host, self.rcon_port, self.rcon_password)
-            await self.bot.loop.run_in_executor(None, self.rcon_client.connect)
+            with self.bot.instrumentation.rcon('chat', 'connect'):
+                await self.bot.loop.run_in_executor(None, self.rcon_client.connect)
             logger.info("RCON client connected successfully.")
             self.reconnect_attempts = 0  # Reset reconnect attempts on success
             return True
@@ -95,7 +96,8 @@ class DiscordToServerCog(commands.Cog):
                     return
 
             try:
-                response = await self.bot.loop.run_in_executor(None, self.rcon_client.send_command, rcon_command)
+                with self.bot.instrumentation.rcon('chat'):
+                    response = await self.bot.loop.run_in_executor(None, self.rcon_client.send_command, rcon_command)
                 logger.info(f"RCON command sent: {rcon_command}")
                 logger.info(f"RCON response: {response}")
                 return  # Success, exit the function
@@ -0,0 +1,110 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import asyncio
+import re
+from typing import Optional
+from logger import setup_logger
+from geo_analytics import GeoAnalytics, quietest_window
+from session_ledger import parse_log_timestamp
+
+logger = setup_logger(__name__, 'logs/geography.log')
+
+JOIN_PATTERN = r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) )?\[JOIN\] (.+) joined the game"
+MAX_COUNTRIES = 10
+MAX_REGIONS = 5
+
+class GeographyCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config_manager = bot.config_manager
+        self.analytics = GeoAnalytics(bot.state_store)
+        self.readlog_cog = None
+        logger.info("GeographyCog initialized")
+
+    def cog_unload(self):
+        if self.readlog_cog:
+            self.readlog_cog.unsubscribe("JOIN", self.on_join)
+        logger.info("GeographyCog unloaded")
+
+    async def ensure_readlog_cog(self):
+        """Ensure connection to ReadLogCog"""
+        max_attempts = 5
+        attempt = 0
+        while attempt < max_attempts:
+            self.readlog_cog = self.bot.get_cog('ReadLogCog')
+            if self.readlog_cog:
+                self.readlog_cog.subscribe("JOIN", self.on_join)
+                logger.info("Successfully connected to ReadLogCog.")
+                return True
+            attempt += 1
+            logger.warning(f"ReadLogCog not found (Attempt {attempt}/{max_attempts}). Retrying in 2 seconds...")
+            await asyncio.sleep(2)
+
+        logger.error("ReadLogCog not found. Geography tracking will not work.")
+        return False
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.ensure_readlog_cog()
+        logger.info("GeographyCog is ready.")
+
+    async def on_join(self, line):
+        join_match = re.search(JOIN_PATTERN, line)
+        if not join_match:
+            return
+        player_name = join_match.group(2)
+        # ReadLogCog only resolves locations for players who haven't opted out
+        location = self.readlog_cog.player_locations.get(player_name)
+        if not location or location[0] == "Unknown":
+            return
+        country, region = location
+        self.analytics.record_join(player_name, country, region, parse_log_timestamp(join_match.group(1)))
+
+    @app_commands.command(name="geography", description="Show where players join from over a period")
+    @app_commands.describe(period="How far back to look")
+    @app_commands.choices(period=[
+        app_commands.Choice(name="Last 24 hours", value=1),
+        app_commands.Choice(name="Last 7 days", value=7),
+        app_commands.Choice(name="Last 30 days", value=30),
+        app_commands.Choice(name="Last 90 days", value=90),
+        app_commands.Choice(name="All time", value=0)
+    ])
+    @app_commands.default_permissions(administrator=True, moderate_members=True)
+    @app_commands.checks.has_permissions(administrator=True, moderate_members=True)
+    async def geography(self, interaction: discord.Interaction, period: Optional[app_commands.Choice[int]] = None):
+        days = period.value if period else 30
+        label = period.name if period else "Last 30 days"
+        summary = self.analytics.summary(days or None)
+        if not summary['joins']:
+            await interaction.response.send_message(f"No located joins recorded for: {label}.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title=f"Player Geography - {label}", color=discord.Color.blue())
+        embed.description = f"**{summary['joins']}** joins by **{summary['players']}** players with a known location."
+        embed.add_field(
+            name="Countries (joins / players)",
+            value="\n".join(f"{country}: {joins} / {players}"
+                            for country, joins, players in summary['countries'][:MAX_COUNTRIES]),
+            inline=False
+        )
+        embed.add_field(
+            name="Top Regions (joins / players)",
+            value="\n".join(f"{region}, {country}: {joins} / {players}"
+                            for country, region, joins, players in summary['regions'][:MAX_REGIONS]),
+            inline=False
+        )
+        hours = summary['hours']
+        busiest = sorted(range(24), key=lambda hour: hours[hour], reverse=True)[:3]
+        quiet_start = quietest_window(hours)
+        embed.add_field(name="Busiest Hours (UTC)",
+                        value=", ".join(f"{hour:02d}:00 ({hours[hour]})" for hour in busiest), inline=True)
+        embed.add_field(name="Quietest 2h Window (UTC)",
+                        value=f"{quiet_start:02d}:00-{(quiet_start + 2) % 24:02d}:00", inline=True)
+        embed.set_footer(text="Players who disabled location sharing are not counted.")
+        await interaction.response.send_message(embed=embed)
+        logger.info(f"Geography ({label}) requested by {interaction.user.name}")
+
+async def setup(bot):
+    await bot.add_cog(GeographyCog(bot))
+    logger.info("GeographyCog added to bot")
@@ -2,43 +2,128 @@ import os
 import discord
 from discord.ext import commands
 from discord import app_commands
-import io
+import shutil
+import tempfile
+import time
+from typing import Optional
 from logger import setup_logger
 from config_manager import ConfigManager
+from log_export import export_logs
+from log_index import LogIndex, rotated_logs
 
 logger = setup_logger(__name__, 'logs/getlog.log')
 
+DEFAULT_UPLOAD_LIMIT = 8 * 1024 * 1024
+# Tag markers kept by each /verbose filter choice
+LOG_FILTERS = {
+    'chat': ['[CHAT]'],
+    'joins': ['[JOIN]', '[LEAVE]'],
+    'commands': ['[CMD]'],
+    'stats': ['[STATS-E1]', '[STATS-D2]', '[ACT]'],
+    'records': ['[DW1]'],
+}
+# [DW1] record types kept by each /verbose filter choice, next to its tag markers
+RECORD_FILTERS = {
+    'chat': ['chat'],
+    'joins': ['join', 'leave'],
+    'commands': ['cmd', 'access'],
+    'stats': ['act', 'kills', 'pdeath'],
+}
+
 class GetLogCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_manager = bot.config_manager
         self.log_file = self.config_manager.get('factorio_server.verbose_log_file')
+        if not self.log_file:
+            base_path = self.config_manager.get('factorio_server.install_location') or ''
+            self.log_file = os.path.join(base_path, "logs/verbose.log")
         logger.info("GetLogCog initialized")
 
+    def get_index(self, log_file):
+        """The tailer's live index for the current log, or a loaded/rebuilt one for other files. Blocking."""
+        readlog_cog = self.bot.get_cog('ReadLogCog')
+        if readlog_cog and readlog_cog.log_index and os.path.samefile(readlog_cog.log_index.log_file, log_file):
+            return readlog_cog.log_index
+        return LogIndex.open(log_file)
+
+    def plan_export(self, since):
+        """Pick the logs and start offsets to read. Blocking.
+
+        Without a time window only the current log is exported. With one,
+        rotated logs written to after the cutoff are included too, and each
+        file is entered at the indexed offset just before the cutoff.
+        """
+        if since is None:
+            return [(self.log_file, 0, None)]
+        sources = []
+        for log_file in rotated_logs(self.log_file) + [self.log_file]:
+            if os.path.getmtime(log_file) < since:
+                continue
+            if log_file.endswith('.gz'):
+                # Archives can't be seeked into, so they are scanned from the start
+                sources.append((log_file, 0, None))
+                continue
+            index = self.get_index(log_file)
+            sources.append((log_file, index.offset_for(since), index.clock.base))
+        return sources
+
     @app_commands.command(name='verbose', description='Upload the Factorio verbose log file')
+    @app_commands.describe(
+        filter='Only include lines of this kind',
+        minutes='Only include the last N minutes of the log'
+    )
+    @app_commands.choices(filter=[
+        app_commands.Choice(name="Everything", value="all"),
+        app_commands.Choice(name="Chat", value="chat"),
+        app_commands.Choice(name="Joins and leaves", value="joins"),
+        app_commands.Choice(name="Commands", value="commands"),
+        app_commands.Choice(name="Stats events", value="stats"),
+        app_commands.Choice(name="Softmod event records", value="records"),
+        app_commands.Choice(name="Errors and warnings", value="errors")
+    ])
     @app_commands.default_permissions(administrator=True, moderate_members=True)
     @app_commands.checks.has_permissions(administrator=True, moderate_members=True)
-    async def verbose(self, interaction: discord.Interaction):
+    async def verbose(self, interaction: discord.Interaction, filter: Optional[app_commands.Choice[str]] = None,
+                      minutes: Optional[app_commands.Range[int, 1, 100000]] = None):
         logger.info(f"User {interaction.user.name} requested verbose log file")
-        if os.path.isfile(self.log_file):
-            try:
-                with open(self.log_file, 'rb') as f:
-                    log_data = f.read()
-                    
-                file_size = len(log_data)
-                if file_size > 8 * 1024 * 1024:  # 8 MB in bytes
-                    logger.warning(f"Verbose log file is too large to upload ({file_size / (1024 * 1024):.2f} MB)")
-                    await interaction.response.send_message(f"The log file is too large to upload ({file_size / (1024 * 1024):.2f} MB). Discord has a file size limit of 8 MB.")
-                else:
-                    await interaction.response.send_message(file=discord.File(io.BytesIO(log_data), filename='verbose.log'))
-                    logger.info("Verbose log file uploaded successfully")
-            except Exception as e:
-                logger.error(f"Error reading log file: {str(e)}")
-                await interaction.response.send_message(f"An error occurred while reading the log file: {str(e)}")
-        else:
+        if not os.path.isfile(self.log_file):
             logger.warning(f"Log file {self.log_file} doesn't exist")
             await interaction.response.send_message(f"The log file {self.log_file} doesn't exist.")
+            return
+
+        await interaction.response.defer()
+        selected = filter.value if filter else 'all'
+        upload_limit = interaction.guild.filesize_limit if interaction.guild else DEFAULT_UPLOAD_LIMIT
+        output_dir = tempfile.mkdtemp(prefix='dwire-log-')
+        try:
+            since = time.time() - minutes * 60 if minutes else None
+            parts = await self.bot.loop.run_in_executor(
+                None,
+                lambda: export_logs(
+                    self.plan_export(since), output_dir, os.path.basename(self.log_file), upload_limit,
+                    tags=LOG_FILTERS.get(selected, ()),
+                    record_types=RECORD_FILTERS.get(selected, ()),
+                    errors_only=selected == 'errors',
+                    since=since
+                )
+            )
+            if not parts:
+                await interaction.followup.send("No log lines matched that filter.")
+                return
+
+            for number, part in enumerate(parts, start=1):
+                await interaction.followup.send(
+                    f"Verbose log part {number}/{len(parts)}" if len(parts) > 1 else "Verbose log",
+                    file=discord.File(part)
+                )
+            logger.info(f"Verbose log uploaded in {len(parts)} part(s) (filter={selected}, minutes={minutes})")
+        except Exception as e:
+            logger.error(f"Error exporting log file: {str(e)}")
+            await interaction.followup.send(f"An error occurred while reading the log file: {str(e)}")
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
 
 async def setup(bot):
     await bot.add_cog(GetLogCog(bot))
-    logger.info("GetLogCog added to bot")
\ No newline at end of file
+    logger.info("GetLogCog added to bot")
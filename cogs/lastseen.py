@@ -1,67 +1,123 @@
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
-import json
+import asyncio
+import bisect
 import os
-import datetime
 import re
+import time
+from typing import Dict, List, Optional, Tuple
 from logger import setup_logger
+from session_ledger import format_duration, parse_log_timestamp
 
 logger = setup_logger(__name__, 'logs/lastseen.log')
 
+# Last-seen changes are kept in memory and written in one batch at this interval
+FLUSH_INTERVAL_SECONDS = 30
+MAX_INACTIVE_LINES = 50
+
+JOIN_PATTERNS = [
+    r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \[JOIN\] (.+) joined the game",
+    r"Player (.+) joined the game",
+    r"(.+) has joined the game"
+]
+LEAVE_PATTERN = r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) )?\[LEAVE\] (.+) left the game"
+
 class LastSeenCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_manager = bot.config_manager
         self.parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.registrations_file = os.path.join(self.parent_dir, "registrations.json")
-        self.last_seen_file = os.path.join(self.parent_dir, "last_seen.json")
-        self.load_registrations()
+        self.registration_store = bot.registration_store
+        self.state_store = bot.state_store
+        self.last_seen_data: Dict[str, float] = {}
+        self.last_session: Dict[str, float] = {}
+        self.join_times: Dict[str, float] = {}
+        # (last_seen, player_name) pairs kept sorted for range queries
+        self._seen_index: List[Tuple[float, str]] = []
+        self._dirty = set()
         self.load_last_seen()
         self.readlog_cog = None
+        self.flush_loop.start()
 
-    def load_registrations(self):
-        try:
-            with open(self.registrations_file, "r") as file:
-                self.registrations = json.load(file)
-            logger.info("Registrations loaded successfully.")
-        except Exception as e:
-            self.registrations = {}
-            logger.error(f"Error loading registrations: {str(e)}")
+    def cog_unload(self):
+        self.flush_loop.cancel()
+        self.flush()
+        if self.readlog_cog:
+            self.readlog_cog.unsubscribe("JOIN", self.on_join)
+            self.readlog_cog.unsubscribe("LEAVE", self.on_leave)
+        logger.info("LastSeenCog unloaded")
 
     def load_last_seen(self):
         try:
-            if os.path.exists(self.last_seen_file):
-                with open(self.last_seen_file, "r") as file:
-                    self.last_seen_data = json.load(file)
-            else:
-                self.last_seen_data = {}
+            records = self.state_store.load_last_seen()
+            self.last_seen_data = {name: last_seen for name, (last_seen, _) in records.items()}
+            self.last_session = {name: session for name, (_, session) in records.items() if session is not None}
             logger.info("Last seen data loaded successfully.")
         except Exception as e:
             self.last_seen_data = {}
+            self.last_session = {}
             logger.error(f"Error loading last seen data: {str(e)}")
+        self._seen_index = sorted((last_seen, name) for name, last_seen in self.last_seen_data.items())
 
-    def save_last_seen(self):
+    def flush(self):
+        """Write every last-seen change made since the previous flush in one transaction."""
+        if not self._dirty:
+            return
+        rows = [(name, self.last_seen_data[name], self.last_session.get(name)) for name in self._dirty]
+        self._dirty.clear()
         try:
-            with open(self.last_seen_file, "w") as file:
-                json.dump(self.last_seen_data, file, indent=4)
-            logger.info("Last seen data saved successfully.")
+            self.state_store.submit(self.state_store.upsert_last_seen_many, rows)
+            logger.info(f"Flushed last seen data for {len(rows)} player(s)")
         except Exception as e:
             logger.error(f"Error saving last seen data: {str(e)}")
 
+    @tasks.loop(seconds=FLUSH_INTERVAL_SECONDS)
+    async def flush_loop(self):
+        self.flush()
+
     def get_player_name(self, user_id):
         """Get the registered Factorio player name from Discord user ID."""
-        user_id_str = str(user_id)
-        return self.registrations.get(user_id_str)
+        return self.registration_store.get_player_name(user_id)
 
-    def update_last_seen(self, player_name):
+    def update_last_seen(self, player_name, timestamp=None, session_seconds=None):
         """Update the last seen time for a player."""
-        self.last_seen_data[player_name] = datetime.datetime.now().isoformat()
-        self.save_last_seen()
+        timestamp = timestamp or time.time()
+        previous = self.last_seen_data.get(player_name)
+        if previous is not None:
+            position = bisect.bisect_left(self._seen_index, (previous, player_name))
+            if position < len(self._seen_index) and self._seen_index[position] == (previous, player_name):
+                del self._seen_index[position]
+        self.last_seen_data[player_name] = timestamp
+        bisect.insort(self._seen_index, (timestamp, player_name))
+        if session_seconds is not None:
+            self.last_session[player_name] = session_seconds
+        self._dirty.add(player_name)
+
+    def inactive_players(self, days: int) -> List[Tuple[float, str]]:
+        """Players not seen for at least `days` days, oldest first. Online players are excluded."""
+        cutoff = time.time() - days * 86400
+        end = bisect.bisect_left(self._seen_index, (cutoff,))
+        return [(last_seen, name) for last_seen, name in self._seen_index[:end] if name not in self.join_times]
 
     @app_commands.command(name='lastseen', description='Get the last seen time of a Factorio player')
-    @app_commands.describe(member='The registered Discord member to check')
-    async def lastseen(self, interaction: discord.Interaction, member: discord.Member):
+    @app_commands.describe(
+        member='The registered Discord member to check',
+        inactive_days='List every player who has not been seen for this many days'
+    )
+    async def lastseen(self, interaction: discord.Interaction, member: Optional[discord.Member] = None,
+                       inactive_days: Optional[app_commands.Range[int, 1, 3650]] = None):
+        if inactive_days is not None:
+            await interaction.response.send_message(embed=self.build_inactive_embed(inactive_days))
+            return
+
+        if member is None:
+            await interaction.response.send_message(
+                "Please choose a member, or use `inactive_days` to list inactive players.",
+                ephemeral=True
+            )
+            return
+
         await interaction.response.defer()
 
         # Check if the user is registered
@@ -73,29 +129,73 @@ class LastSeenCog(commands.Cog):
             )
             return
 
+        joined_at = self.join_times.get(player_name)
+        if joined_at:
+            await interaction.followup.send(
+                f"{member.mention} ({player_name}) is online now, playing for {format_duration(time.time() - joined_at)}."
+            )
+            return
+
         # Retrieve last seen time from last_seen_data
         last_seen_time = self.last_seen_data.get(player_name)
         if last_seen_time:
-            last_seen_dt = datetime.datetime.fromisoformat(last_seen_time)
-            
             # Create Discord timestamp
-            discord_timestamp = f"<t:{int(last_seen_dt.timestamp())}:R>"
-
-            await interaction.followup.send(
-                f"{member.mention} ({player_name}) was last seen {discord_timestamp}."
-            )
+            discord_timestamp = f"<t:{int(last_seen_time)}:R>"
+            message = f"{member.mention} ({player_name}) was last seen {discord_timestamp}."
+            session = self.last_session.get(player_name)
+            if session:
+                message += f" Their last session lasted {format_duration(session)}."
+            await interaction.followup.send(message)
         else:
             await interaction.followup.send(
                 f"{member.mention} ({player_name}) has not been seen online recently."
             )
 
+    def build_inactive_embed(self, days):
+        inactive = self.inactive_players(days)
+        embed = discord.Embed(
+            title=f"Players inactive for {days}+ days",
+            color=discord.Color.orange()
+        )
+        if not inactive:
+            embed.description = "Everyone has been seen recently."
+            return embed
+
+        lines = []
+        for last_seen, name in inactive[:MAX_INACTIVE_LINES]:
+            discord_id = self.registration_store.get_discord_id(name)
+            who = f"{name} (<@{discord_id}>)" if discord_id else name
+            lines.append(f"{who} - <t:{int(last_seen)}:R>")
+        if len(inactive) > MAX_INACTIVE_LINES:
+            lines.append(f"...and {len(inactive) - MAX_INACTIVE_LINES} more")
+        embed.description = "\n".join(lines)[:4096]
+        embed.set_footer(text=f"{len(inactive)} inactive player(s)")
+        return embed
+
+    async def on_join(self, line):
+        """Handle player connection events."""
+        for pattern in JOIN_PATTERNS:
+            join_match = re.search(pattern, line)
+            if join_match:
+                if len(join_match.groups()) > 1:
+                    timestamp, player_name = parse_log_timestamp(join_match.group(1)), join_match.group(2)
+                else:
+                    timestamp, player_name = time.time(), join_match.group(1)
+                self.join_times[player_name] = timestamp
+                logger.debug(f"Processing join event for player: {player_name}")
+                return
+        logger.debug(f"Received line that does not match join pattern: {line}")
+
     async def on_leave(self, line):
         """Handle player disconnection events."""
-        leave_match = re.search(r"\[LEAVE\] (.+) left the game", line)
+        leave_match = re.search(LEAVE_PATTERN, line)
         if leave_match:
-            player_name = leave_match.group(1)
+            player_name = leave_match.group(2)
+            timestamp = parse_log_timestamp(leave_match.group(1))
             logger.debug(f"Processing leave event for player: {player_name}")
-            self.update_last_seen(player_name)
+            joined_at = self.join_times.pop(player_name, None)
+            session_seconds = max(0.0, timestamp - joined_at) if joined_at else None
+            self.update_last_seen(player_name, timestamp, session_seconds)
             logger.info(f"Updated last seen time for {player_name}")
         else:
             logger.debug(f"Received line that does not match leave pattern: {line}")
@@ -112,6 +212,7 @@ class LastSeenCog(commands.Cog):
         while attempt < max_attempts:
             self.readlog_cog = self.bot.get_cog('ReadLogCog')
             if self.readlog_cog:
+                self.readlog_cog.subscribe("JOIN", self.on_join)
                 self.readlog_cog.subscribe("LEAVE", self.on_leave)
                 logger.info("Successfully connected to ReadLogCog.")
                 return True
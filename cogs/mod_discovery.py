@@ -22,7 +22,11 @@ class ModDiscoveryCog(commands.Cog):
         self.bot = bot
         self.config_manager = bot.config_manager
         self.mod_path = self.config_manager.get('factorio_mod_portal.mod_path')
-        self.api_url = 'https://mods.factorio.com/api'
+        if not self.mod_path:
+            install_location = self.config_manager.get('factorio_server.install_location')
+            self.mod_path = os.path.join(install_location, "mods") if install_location else None
+        self.portal_url = self.config_manager.get('factorio_mod_portal.portal_url', 'https://mods.factorio.com')
+        self.api_url = f"{self.portal_url}/api"
         logger.info("ModDiscoveryCog initialized")
 
     async def scan_mods(self) -> List[InstalledMod]:
@@ -77,7 +81,7 @@ class ModDiscoveryCog(commands.Cog):
                         latest_version = data['releases'][-1]['version']
                         logger.info(f"Found exact match for mod: {mod.name}")
                         return {
-                            'portal_url': f"https://mods.factorio.com/mod/{mod.name}",
+                            'portal_url': f"{self.portal_url}/mod/{mod.name}",
                             'latest_version': latest_version,
                             'needs_update': latest_version != mod.version
                         }
@@ -97,7 +101,7 @@ class ModDiscoveryCog(commands.Cog):
                                 latest_version = result['latest_release']['version']
                                 logger.info(f"Found match for mod: {mod.name}")
                                 return {
-                                    'portal_url': f"https://mods.factorio.com/mod/{result['name']}",
+                                    'portal_url': f"{self.portal_url}/mod/{result['name']}",
                                     'latest_version': latest_version,
                                     'needs_update': latest_version != mod.version
                                 }
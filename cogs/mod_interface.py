@@ -11,6 +11,7 @@ class ModInterfaceCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_manager = bot.config_manager
+        self.portal_url = self.config_manager.get('factorio_mod_portal.portal_url', 'https://mods.factorio.com')
         logger.info("ModInterfaceCog initialized")
 
     async def handle_mod_mismatch(self, interaction: discord.Interaction, mod_name: str, local_info: Dict, portal_info: Dict) -> bool:
@@ -39,6 +40,7 @@ class ModInterfaceCog(commands.Cog):
 
         # Create view with options
         view = discord.ui.View(timeout=60)
+        mod_page_prefix = f"{self.portal_url}/mod/"
         
         # Use Future to get the result
         future = asyncio.Future()
@@ -57,7 +59,7 @@ class ModInterfaceCog(commands.Cog):
                 super().__init__(title="Provide Correct Mod URL")
                 self.url = discord.ui.TextInput(
                     label="Correct Mod Portal URL",
-                    placeholder="https://mods.factorio.com/mod/mod_name",
+                    placeholder=f"{mod_page_prefix}mod_name",
                     style=discord.TextStyle.short,
                     required=True,
                     min_length=1,
@@ -67,7 +69,7 @@ class ModInterfaceCog(commands.Cog):
 
             async def on_submit(self, interaction: discord.Interaction):
                 url = self.url.value.strip()
-                if not url.startswith("https://mods.factorio.com/mod/"):
+                if not url.startswith(mod_page_prefix):
                     await interaction.response.send_message(
                         "Invalid URL. Must be a Factorio mod portal URL.",
                         ephemeral=True
@@ -198,7 +200,7 @@ class ModInterfaceCog(commands.Cog):
                     'author': local_info.get('author', 'Unknown'),
                     'title': local_info.get('title', mod_name),
                     'description': mod_details.get('summary', local_info.get('description', 'No description available')),
-                    'url': f"https://mods.factorio.com/mod/{mod_name}"
+                    'url': f"{self.portal_url}/mod/{mod_name}"
                 })
 
         if not updates_available:
@@ -1,108 +1,190 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import json
 import os
+import shutil
+import hashlib
 import logging
+import asyncio
 import aiohttp
 from typing import Dict, List, Optional
 
 logger = logging.getLogger('mod_tracker')
 
+# Base game mods that are never fetched from the portal
+BASE_GAME_MODS = {
+    "base",
+    "elevated-rails",
+    "quality",
+    "space-age"
+}
+
+def version_key(version: str) -> tuple:
+    """Sortable form of a mod version like '1.2.10'; unparsable versions sort first"""
+    try:
+        return tuple(int(part) for part in version.split('.'))
+    except ValueError:
+        return ()
+
 class ModTrackerCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_manager = bot.config_manager
-        
+        self.portal_url = self.config_manager.get('factorio_mod_portal.portal_url', 'https://mods.factorio.com')
+        self.api_url = f"{self.portal_url}/api"
+        self.max_concurrent_requests = self.config_manager.get('factorio_mod_portal.max_concurrent_requests', 4)
+        self.prefetch_updates = self.config_manager.get('factorio_mod_portal.prefetch_updates', False)
+
+        # Conditional request cache: portal name -> (etag, last_modified, details)
+        self._portal_cache: Dict[str, tuple] = {}
+        self.pending_updates: List[dict] = []
+        self._last_digest = None
+        self.state_store = bot.state_store
+
         # Get install location from config
         install_location = self.config_manager.get('factorio_server.install_location')
         if not install_location:
             logger.warning("Factorio install location not set - mod tracking will be limited until server is installed")
             self.mod_path = None
-            self.urls_file = None
+            self.staging_dir = None
             self.mod_urls = {}
-            self.api_url = 'https://mods.factorio.com/api'
             return
-                
+
         # Setup paths using Factorio's standard structure
-        self.mod_path = os.path.join(install_location, "factorio", "mods")
-        self.urls_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mod_urls.json')  # Changed store_path to self.urls_file
+        self.mod_path = os.path.join(install_location, "mods")
+        self.staging_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mod_staging')
         self.mod_urls: Dict[str, str] = {}
-        self.api_url = 'https://mods.factorio.com/api'
         self._load_urls()
+
+        check_hours = self.config_manager.get('factorio_mod_portal.update_check_hours', 6)
+        if check_hours:
+            self.scheduled_update_check.change_interval(hours=check_hours)
+            self.scheduled_update_check.start()
         logger.info(f"ModTrackerCog initialized with mod_path: {self.mod_path}")
 
-    def _load_urls(self) -> None:
-        """Load the mod URLs from disk."""
-        if os.path.exists(self.urls_file):
-            try:
-                with open(self.urls_file, 'r') as f:
-                    self.mod_urls = json.load(f)
-                logger.info(f"Loaded {len(self.mod_urls)} mod URLs from storage")
-            except Exception as e:
-                logger.error(f"Error loading mod URLs: {str(e)}")
-                self.mod_urls = {}
+    def cog_unload(self):
+        self.scheduled_update_check.cancel()
+        logger.info("ModTrackerCog unloaded")
 
-    def _save_urls(self) -> None:
-        """Save the mod URLs to disk."""
+    def _load_urls(self) -> None:
+        """Load the mod URLs from the state store."""
         try:
-            with open(self.urls_file, 'w') as f:
-                json.dump(self.mod_urls, f, indent=4)
-            logger.info("Saved mod URLs to storage")
+            self.mod_urls = self.state_store.load_mod_urls()
+            logger.info(f"Loaded {len(self.mod_urls)} mod URLs from storage")
         except Exception as e:
-            logger.error(f"Error saving mod URLs: {str(e)}")
+            logger.error(f"Error loading mod URLs: {str(e)}")
+            self.mod_urls = {}
 
     def add_url(self, mod_name: str, url: str) -> None:
         """Add or update a mod's URL."""
         self.mod_urls[mod_name] = url
-        self._save_urls()
+        self.state_store.submit(self.state_store.upsert_mod_url, mod_name, url)
         logger.info(f"Added URL for mod: {mod_name}")
 
     def remove_url(self, mod_name: str) -> None:
         """Remove a mod's URL."""
         if mod_name in self.mod_urls:
             del self.mod_urls[mod_name]
-            self._save_urls()
+            self.state_store.submit(self.state_store.delete_mod_url, mod_name)
             logger.info(f"Removed URL for mod: {mod_name}")
 
-    async def get_mod_details(self, mod_name: str) -> Optional[dict]:
-        """Get mod details from the Factorio mod portal."""
+    async def get_mod_details(self, mod_name: str, session: Optional[aiohttp.ClientSession] = None) -> Optional[dict]:
+        """Get mod details from the Factorio mod portal.
+
+        Requests are conditional: a previously seen ETag/Last-Modified is sent
+        back and a 304 reuses the cached details without transferring them.
+        """
         try:
             portal_name = mod_name.split('/')[-1] if '/' in mod_name else mod_name
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.api_url}/mods/{portal_name}/full") as response:
+            headers = {}
+            cached = self._portal_cache.get(portal_name)
+            if cached:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+
+            owns_session = session is None
+            if owns_session:
+                session = aiohttp.ClientSession()
+            try:
+                async with session.get(f"{self.api_url}/mods/{portal_name}/full", headers=headers) as response:
+                    if response.status == 304 and cached:
+                        logger.debug(f"Details for {mod_name} not modified")
+                        return cached[2]
                     if response.status == 200:
                         data = await response.json()
+                        self._portal_cache[portal_name] = (
+                            response.headers.get('ETag'),
+                            response.headers.get('Last-Modified'),
+                            data
+                        )
                         logger.info(f"Retrieved details for mod: {mod_name}")
                         return data
-                    else:
-                        logger.warning(f"Failed to get details for {mod_name}. Status: {response.status}")
-                        return None
+                    logger.warning(f"Failed to get details for {mod_name}. Status: {response.status}")
+                    return None
+            finally:
+                if owns_session:
+                    await session.close()
         except Exception as e:
             logger.error(f"Error getting mod details for {mod_name}: {str(e)}")
             return None
 
+    def _scan_installed_versions(self) -> Dict[str, tuple]:
+        """Map mod name -> (version, file name) from the mod zip names in one directory listing."""
+        installed = {}
+        try:
+            for filename in os.listdir(self.mod_path):
+                if not filename.endswith('.zip') or '_' not in filename:
+                    continue
+                name, version = filename[:-4].rsplit('_', 1)
+                # With several zips of one mod, the newest is the one that counts
+                if name not in installed or version_key(version) > version_key(installed[name][0]):
+                    installed[name] = (version, filename)
+        except Exception as e:
+            logger.error(f"Error scanning mods directory: {str(e)}")
+        return installed
+
     async def check_for_updates(self) -> List[dict]:
-        """Check all tracked mods for available updates."""
+        """Check all tracked and installed mods for available updates."""
         updates_available = []
-        
+
         try:
-            for mod_name, url in self.mod_urls.items():
-                mod_details = await self.get_mod_details(mod_name)
-                if not mod_details:
-                    continue
+            if self.mod_path:
+                self._load_urls()  # Pick up URLs stored by other cogs since the last check
+            installed = self._scan_installed_versions()
+            targets = (set(self.mod_urls) | set(installed)) - BASE_GAME_MODS
+            semaphore = asyncio.Semaphore(self.max_concurrent_requests)
 
-                latest_version = mod_details['releases'][-1]['version']
-                installed_version = self._get_installed_version(mod_name)
+            async with aiohttp.ClientSession() as session:
+                async def check(mod_name):
+                    async with semaphore:
+                        url = self.mod_urls.get(mod_name, f"{self.portal_url}/mod/{mod_name}")
+                        mod_details = await self.get_mod_details(url, session)
+                    if not mod_details or not mod_details.get('releases'):
+                        return None
+
+                    latest_release = mod_details['releases'][-1]
+                    latest_version = latest_release['version']
+                    installed_version = installed[mod_name][0] if mod_name in installed else self._get_installed_version(mod_name)
+
+                    if installed_version and installed_version != latest_version:
+                        logger.info(f"Update available for {mod_name}: {installed_version} -> {latest_version}")
+                        return {
+                            'name': mod_name,
+                            'current_version': installed_version,
+                            'latest_version': latest_version,
+                            'url': url,
+                            'download_url': latest_release.get('download_url'),
+                            'file_name': latest_release.get('file_name'),
+                            'sha1': latest_release.get('sha1')
+                        }
+                    return None
 
-                if installed_version and installed_version != latest_version:
-                    updates_available.append({
-                        'name': mod_name,
-                        'current_version': installed_version,
-                        'latest_version': latest_version,
-                        'url': url
-                    })
-                    logger.info(f"Update available for {mod_name}: {installed_version} -> {latest_version}")
+                results = await asyncio.gather(*(check(mod_name) for mod_name in sorted(targets)))
 
+            updates_available = [update for update in results if update]
             return updates_available
         except Exception as e:
             logger.error(f"Error checking for updates: {str(e)}")
@@ -129,6 +211,155 @@ class ModTrackerCog(commands.Cog):
             logger.error(f"Error getting installed version for {mod_name}: {str(e)}")
         return None
 
+    @tasks.loop(hours=6)
+    async def scheduled_update_check(self):
+        """Periodically check for mod updates and post a digest when the pending set changes."""
+        try:
+            self.pending_updates = await self.check_for_updates()
+            if self.prefetch_updates and self.pending_updates:
+                await self.prefetch_pending_updates()
+
+            digest = tuple((u['name'], u['latest_version']) for u in self.pending_updates)
+            if digest != self._last_digest:
+                self._last_digest = digest
+                if self.pending_updates:
+                    await self.post_update_digest()
+            logger.info(f"Scheduled mod update check complete: {len(self.pending_updates)} update(s) pending")
+        except Exception as e:
+            logger.error(f"Error during scheduled mod update check: {str(e)}")
+
+    @scheduled_update_check.before_loop
+    async def before_scheduled_update_check(self):
+        await self.bot.wait_until_ready()
+        logger.info("Scheduled mod update check task is ready to start")
+
+    async def post_update_digest(self):
+        """Post one embed summarising all pending mod updates to the admin channel."""
+        channel_id = self.config_manager.get('discord.factorio_admin_channel_id')
+        if not channel_id or not str(channel_id).isdigit():
+            logger.warning("No admin channel configured for mod update digest")
+            return
+        channel = self.bot.get_channel(int(channel_id))
+        if not channel:
+            logger.error(f"Could not find admin channel with ID: {channel_id}")
+            return
+
+        embed = discord.Embed(
+            title="Mod Updates Available",
+            description=f"{len(self.pending_updates)} mod(s) have newer versions on the mod portal.",
+            color=discord.Color.yellow()
+        )
+        lines = []
+        for update in self.pending_updates:
+            staged = " (staged)" if self.get_staged_file(update) else ""
+            lines.append(f"**{update['name']}**: `{update['current_version']}` → `{update['latest_version']}`{staged}")
+
+        # Embed field values are limited to 1024 characters
+        chunk = []
+        for line in lines:
+            if sum(len(l) + 1 for l in chunk) + len(line) > 1024:
+                embed.add_field(name="Pending Updates", value="\n".join(chunk), inline=False)
+                chunk = []
+            chunk.append(line)
+        if chunk:
+            embed.add_field(name="Pending Updates", value="\n".join(chunk), inline=False)
+
+        if self.prefetch_updates:
+            embed.set_footer(text="Staged updates are applied the next time the server starts.")
+        else:
+            embed.set_footer(text="Use /update_mods to install.")
+        await channel.send(embed=embed)
+
+    def get_staged_file(self, update: dict) -> Optional[str]:
+        """Return the path of a staged zip for an update, if it has already been downloaded."""
+        if not self.staging_dir or not update.get('file_name'):
+            return None
+        path = os.path.join(self.staging_dir, update['file_name'])
+        return path if os.path.exists(path) else None
+
+    async def prefetch_pending_updates(self):
+        """Download updated mod zips into the staging cache so restarts don't wait on the portal."""
+        os.makedirs(self.staging_dir, exist_ok=True)
+        username = self.config_manager.get('factorio_mod_portal.username')
+        token = self.config_manager.get('factorio_mod_portal.token')
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        async with aiohttp.ClientSession() as session:
+            async def fetch(update):
+                if not update.get('download_url') or self.get_staged_file(update):
+                    return
+                target = os.path.join(self.staging_dir, update['file_name'])
+                partial = target + '.part'
+                url = f"{self.portal_url}{update['download_url']}"
+                sha1 = hashlib.sha1()
+                async with semaphore:
+                    try:
+                        async with session.get(url, params={'username': username, 'token': token}) as response:
+                            if response.status != 200:
+                                logger.error(f"Failed to prefetch {update['name']}. Status: {response.status}")
+                                return
+                            with open(partial, 'wb') as f:
+                                async for chunk in response.content.iter_chunked(64 * 1024):
+                                    sha1.update(chunk)
+                                    f.write(chunk)
+                        if update.get('sha1') and sha1.hexdigest() != update['sha1']:
+                            logger.error(f"Checksum mismatch for prefetched {update['file_name']}")
+                            os.remove(partial)
+                            return
+                        os.replace(partial, target)
+                        logger.info(f"Staged update {update['file_name']}")
+                    except Exception as e:
+                        logger.error(f"Error prefetching {update['name']}: {str(e)}")
+                        if os.path.exists(partial):
+                            os.remove(partial)
+
+            await asyncio.gather(*(fetch(update) for update in self.pending_updates))
+
+    def apply_staged_updates(self) -> List[str]:
+        """Move staged mod zips into the mods directory, replacing older versions.
+
+        Only the newest staged zip of a mod is applied, and only if it is newer
+        than the installed one; stale staged zips are deleted. Blocking file
+        work, meant to be run in an executor while the server is stopped,
+        right before it starts.
+        """
+        applied = []
+        if not self.staging_dir or not os.path.isdir(self.staging_dir) or not self.mod_path:
+            return applied
+        installed = self._scan_installed_versions()
+        staged = {}  # mod name -> [(version, file name)]
+        for filename in os.listdir(self.staging_dir):
+            if not filename.endswith('.zip') or '_' not in filename:
+                continue
+            name, version = filename[:-4].rsplit('_', 1)
+            staged.setdefault(name, []).append((version, filename))
+        for name in sorted(staged):
+            candidates = sorted(staged[name], key=lambda candidate: version_key(candidate[0]))
+            version, filename = candidates[-1]
+            stale = [stale_file for _, stale_file in candidates[:-1]]
+            if name in installed and version_key(installed[name][0]) >= version_key(version):
+                logger.info(f"Discarding staged {filename}: {installed[name][1]} is already installed")
+                stale.append(filename)
+                filename = None
+            for stale_file in stale:
+                try:
+                    os.remove(os.path.join(self.staging_dir, stale_file))
+                except OSError as e:
+                    logger.error(f"Error removing stale staged update {stale_file}: {str(e)}")
+            if not filename:
+                continue
+            try:
+                shutil.move(os.path.join(self.staging_dir, filename), os.path.join(self.mod_path, filename))
+                if name in installed and installed[name][1] != filename:
+                    os.remove(os.path.join(self.mod_path, installed[name][1]))
+                applied.append(f"{name} {version}")
+                logger.info(f"Applied staged update {filename}")
+            except Exception as e:
+                logger.error(f"Error applying staged update {filename}: {str(e)}")
+        if applied:
+            self.pending_updates = [u for u in self.pending_updates if f"{u['name']} {u['latest_version']}" not in applied]
+        return applied
+
     def get_all_tracked_mods(self) -> Dict[str, str]:
         """Get all tracked mods and their URLs."""
         return self.mod_urls.copy()
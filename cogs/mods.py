@@ -9,6 +9,7 @@ import requests
 import zipfile
 from logger import setup_logger
 from config_manager import ConfigManager
+from mod_list_store import ModListStore
 from typing import Dict, List, Optional
 
 logger = setup_logger(__name__, 'logs/mods.log')
@@ -27,7 +28,8 @@ class ModsCog(commands.Cog):
         self.config_manager = bot.config_manager
         self.mod_portal_username = self.config_manager.get('factorio_mod_portal.username')
         self.mod_portal_token = self.config_manager.get('factorio_mod_portal.token')
-        self.mod_portal_api_url = 'https://mods.factorio.com/api'
+        self.mod_portal_url = self.config_manager.get('factorio_mod_portal.portal_url', 'https://mods.factorio.com')
+        self.mod_portal_api_url = f"{self.mod_portal_url}/api"
         
         # Get install location from config
         install_location = self.config_manager.get('factorio_server.install_location')
@@ -37,6 +39,7 @@ class ModsCog(commands.Cog):
         # Setup mod paths using Factorio's standard structure
         self.mod_path = os.path.join(install_location, "mods")
         self.mod_list_file = os.path.join(self.mod_path, 'mod-list.json')
+        self.mod_list = ModListStore(self.mod_list_file, protected_mods=BASE_GAME_MODS)
 
     async def get_mod_details(self, mod_name):
         """Retrieve mod details from the Factorio mod portal API."""
@@ -57,31 +60,28 @@ class ModsCog(commands.Cog):
                 logger.warning(f"Attempted to modify base game mod: {mod_name}")
                 return
 
-            with open(self.mod_list_file, 'r') as file:
-                mod_list = json.load(file)
-
             if action == 'add':
-                mod_entry = {'name': mod_name, 'enabled': True}
-                mod_list['mods'].append(mod_entry)
+                self.mod_list.add(mod_name)
             elif action == 'remove':
-                mod_list['mods'] = [mod for mod in mod_list['mods'] if mod['name'] != mod_name]
+                self.mod_list.remove(mod_name)
             elif action == 'enable':
-                for mod in mod_list['mods']:
-                    if mod['name'] == mod_name:
-                        mod['enabled'] = True
-                        break
+                self.mod_list.set_enabled(mod_name, True)
             elif action == 'disable':
-                for mod in mod_list['mods']:
-                    if mod['name'] == mod_name:
-                        mod['enabled'] = False
-                        break
-
-            with open(self.mod_list_file, 'w') as file:
-                json.dump(mod_list, file, indent=4)
+                self.mod_list.set_enabled(mod_name, False)
             logger.info(f"Updated mod list: {action} {mod_name}")
         except Exception as e:
             logger.error(f"Error updating mod list: {str(e)}")
 
+    def set_mods_enabled(self, mod_names: List[str], enabled: bool) -> List[str]:
+        """Enable or disable several mods with a single mod-list.json write."""
+        try:
+            changed = self.mod_list.set_enabled_many(mod_names, enabled)
+            logger.info(f"{'Enabled' if enabled else 'Disabled'} {len(changed)} mod(s): {', '.join(changed)}")
+            return changed
+        except Exception as e:
+            logger.error(f"Error updating mod list: {str(e)}")
+            return []
+
     def get_mod_name_from_zip(self, file_path):
         """Extract the mod name from the mod zip file."""
         try:
@@ -141,21 +141,8 @@ class ModsCog(commands.Cog):
     async def store_mod_url(self, mod_name: str, url: str) -> bool:
         """Store the correct URL for a mod."""
         try:
-            # You might want to store this in a separate file or database
-            store_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mod_urls.json')
-            
-            # Load existing URLs
-            urls = {}
-            if os.path.exists(store_path):
-                with open(store_path, 'r') as f:
-                    urls = json.load(f)
-            
-            # Update or add new URL
-            urls[mod_name] = url
-            
-            # Save back to file
-            with open(store_path, 'w') as f:
-                json.dump(urls, f, indent=4)
+            state_store = self.bot.state_store
+            await state_store.run(state_store.upsert_mod_url, mod_name, url)
                 
             logger.info(f"Stored URL for mod {mod_name}: {url}")
             return True
@@ -180,50 +167,47 @@ class ModsCog(commands.Cog):
         install_button = discord.ui.Button(label="Install", style=discord.ButtonStyle.primary, custom_id="install_button")
         install_button.callback = lambda interaction: interaction.response.send_modal(InstallModal(self.config_manager, self.update_mod_list, self.get_mod_name_from_zip))
 
-        async def select_callback(interaction: discord.Interaction, selected_mod):
+        def describe(mod_names):
+            return mod_names[0] if len(mod_names) == 1 else f"{len(mod_names)} mods"
+
+        async def select_callback(interaction: discord.Interaction, selected_mods):
             enable_button = discord.ui.Button(label="Enable", style=discord.ButtonStyle.success, custom_id="enable_button")
             disable_button = discord.ui.Button(label="Disable", style=discord.ButtonStyle.secondary, custom_id="disable_button")
             remove_button = discord.ui.Button(label="Remove", style=discord.ButtonStyle.danger, custom_id="remove_button")
+            manageable_mods = [mod for mod in selected_mods if mod not in BASE_GAME_MODS]
+
+            async def set_enabled(interaction: discord.Interaction, enabled: bool):
+                state = "enabled" if enabled else "disabled"
+                changed = self.set_mods_enabled(manageable_mods, enabled)
+                if not changed:
+                    await interaction.response.edit_message(content=f"Mod {describe(manageable_mods)} is already {state}.", view=view)
+                    logger.info(f"Mod {describe(manageable_mods)} is already {state}")
+                    return
+
+                await interaction.response.edit_message(content=f"{state.capitalize()} mod: {', '.join(changed)}", view=view)
+                logger.info(f"{state.capitalize()} mod: {', '.join(changed)}")
 
             async def enable_callback(interaction: discord.Interaction):
-                with open(self.mod_list_file, 'r') as file:
-                    mod_list = json.load(file)
-                    mod_info = next((mod for mod in mod_list["mods"] if mod["name"] == selected_mod), None)
-                    if mod_info and mod_info['enabled']:
-                        await interaction.response.edit_message(content=f"Mod {selected_mod} is already enabled.", view=view)
-                        logger.info(f"Mod {selected_mod} is already enabled")
-                        return
-
-                self.update_mod_list(selected_mod, 'enable')
-                await interaction.response.edit_message(content=f"Enabled mod: {selected_mod}", view=view)
-                logger.info(f"Enabled mod: {selected_mod}")
+                await set_enabled(interaction, True)
 
             async def disable_callback(interaction: discord.Interaction):
-                with open(self.mod_list_file, 'r') as file:
-                    mod_list = json.load(file)
-                    mod_info = next((mod for mod in mod_list["mods"] if mod["name"] == selected_mod), None)
-                    if mod_info and not mod_info['enabled']:
-                        await interaction.response.edit_message(content=f"Mod {selected_mod} is already disabled.", view=view)
-                        logger.info(f"Mod {selected_mod} is already disabled")
-                        return
-
-                self.update_mod_list(selected_mod, 'disable')
-                await interaction.response.edit_message(content=f"Disabled mod: {selected_mod}", view=view)
-                logger.info(f"Disabled mod: {selected_mod}")
+                await set_enabled(interaction, False)
 
             async def remove_callback(interaction: discord.Interaction):
-                if selected_mod in BASE_GAME_MODS:
-                    await interaction.response.edit_message(content=f"Cannot remove base game mod: {selected_mod}", view=view)
-                    logger.warning(f"Attempted to remove base game mod: {selected_mod}")
+                if not manageable_mods:
+                    await interaction.response.edit_message(content=f"Cannot remove base game mod: {describe(selected_mods)}", view=view)
+                    logger.warning(f"Attempted to remove base game mod: {describe(selected_mods)}")
                     return
 
-                self.update_mod_list(selected_mod, 'remove')
-                mod_file = os.path.join(self.mod_path, f"{selected_mod}.zip")
-                if os.path.exists(mod_file):
-                    os.remove(mod_file)
-                    logger.info(f"Removed mod file: {mod_file}")
-                await interaction.response.edit_message(content=f"Removed mod: {selected_mod}", view=view)
-                logger.info(f"Removed mod: {selected_mod}")
+                with self.mod_list.batch():
+                    for selected_mod in manageable_mods:
+                        self.update_mod_list(selected_mod, 'remove')
+                        mod_file = os.path.join(self.mod_path, f"{selected_mod}.zip")
+                        if os.path.exists(mod_file):
+                            os.remove(mod_file)
+                            logger.info(f"Removed mod file: {mod_file}")
+                await interaction.response.edit_message(content=f"Removed mod: {', '.join(manageable_mods)}", view=view)
+                logger.info(f"Removed mod: {', '.join(manageable_mods)}")
 
             enable_button.callback = enable_callback
             disable_button.callback = disable_callback
@@ -231,18 +215,26 @@ class ModsCog(commands.Cog):
 
             view = discord.ui.View()
             # Only add management buttons for non-base game mods
-            if selected_mod not in BASE_GAME_MODS:
+            if manageable_mods:
                 view.add_item(enable_button)
                 view.add_item(disable_button)
                 view.add_item(remove_button)
             view.add_item(install_button)
 
             await interaction.response.edit_message(
-                content=f"Selected mod: {selected_mod}" + 
-                       (" (Base Game Mod)" if selected_mod in BASE_GAME_MODS else ""),
+                content=f"Selected mod: {', '.join(selected_mods)}" +
+                       (" (Base Game Mod)" if not manageable_mods else ""),
                 view=view
             )
-            logger.info(f"Selected mod: {selected_mod}")
+            logger.info(f"Selected mod: {', '.join(selected_mods)}")
+
+        async def set_all_enabled(interaction: discord.Interaction, enabled: bool):
+            state = "Enabled" if enabled else "Disabled"
+            changed = self.set_mods_enabled(mods_list, enabled)
+            await interaction.response.edit_message(
+                content=f"{state} {len(changed)} mod(s)." if changed else f"All mods are already {state.lower()}.",
+                view=update_view(current_page)
+            )
 
         current_page = 0
 
@@ -255,11 +247,17 @@ class ModsCog(commands.Cog):
                     description="Base Game Mod" if mod_name in BASE_GAME_MODS else None
                 ) for mod_name in mod_chunk
             ]
-            select = discord.ui.Select(placeholder=f"Select a mod (Page {current_page + 1}/{len(mod_chunks)})", options=options)
-            select.callback = lambda interaction: select_callback(interaction, select.values[0])
+            select = discord.ui.Select(
+                placeholder=f"Select one or more mods (Page {current_page + 1}/{len(mod_chunks)})",
+                options=options,
+                max_values=len(options)
+            )
+            select.callback = lambda interaction: select_callback(interaction, select.values)
 
             prev_button = discord.ui.Button(label="Previous", style=discord.ButtonStyle.secondary, custom_id="prev_button", disabled=current_page == 0)
             next_button = discord.ui.Button(label="Next", style=discord.ButtonStyle.secondary, custom_id="next_button", disabled=current_page == len(mod_chunks) - 1)
+            enable_all_button = discord.ui.Button(label="Enable All", style=discord.ButtonStyle.success, custom_id="enable_all_button")
+            disable_all_button = discord.ui.Button(label="Disable All", style=discord.ButtonStyle.secondary, custom_id="disable_all_button")
 
             async def prev_callback(interaction: discord.Interaction):
                 nonlocal current_page
@@ -275,10 +273,14 @@ class ModsCog(commands.Cog):
 
             prev_button.callback = prev_callback
             next_button.callback = next_callback
+            enable_all_button.callback = lambda interaction: set_all_enabled(interaction, True)
+            disable_all_button.callback = lambda interaction: set_all_enabled(interaction, False)
 
             view = discord.ui.View()
             view.add_item(select)
             view.add_item(install_button)
+            view.add_item(enable_all_button)
+            view.add_item(disable_all_button)
             if len(mod_chunks) > 1:
                 view.add_item(prev_button)
                 view.add_item(next_button)
@@ -288,11 +290,9 @@ class ModsCog(commands.Cog):
         logger.info("Mod selection menu displayed")
 
     def get_installed_mods(self):
-        if os.path.exists(self.mod_list_file):
-            with open(self.mod_list_file, 'r') as file:
-                mod_list = json.load(file)
-                # Filter out base game mods
-                return [mod["name"] for mod in mod_list["mods"] if mod["name"] not in BASE_GAME_MODS]
+        if self.mod_list.exists():
+            # Filter out base game mods
+            return self.mod_list.names(include_protected=False)
         else:
             logger.warning(f"Mod list file not found: {self.mod_list_file}")
             return []
@@ -316,7 +316,7 @@ class ModsCog(commands.Cog):
             download_url = latest_release['download_url']
             file_name = latest_release['file_name']
 
-            download_url = f"https://mods.factorio.com{download_url}?username={self.mod_portal_username}&token={self.mod_portal_token}"
+            download_url = f"{self.mod_portal_url}{download_url}?username={self.mod_portal_username}&token={self.mod_portal_token}"
             
             with requests.get(download_url, stream=True) as req:
                 if req.status_code == 200:
@@ -377,7 +377,8 @@ class InstallModal(discord.ui.Modal):
         file_name = latest_release['file_name']
         version = latest_release['version']
 
-        download_url = f"https://mods.factorio.com{download_url}?username={self.config_manager.get('factorio_mod_portal.username')}&token={self.config_manager.get('factorio_mod_portal.token')}"
+        portal_url = self.config_manager.get('factorio_mod_portal.portal_url', 'https://mods.factorio.com')
+        download_url = f"{portal_url}{download_url}?username={self.config_manager.get('factorio_mod_portal.username')}&token={self.config_manager.get('factorio_mod_portal.token')}"
         
         try:
             with requests.get(download_url, stream=True) as req:
@@ -1,20 +1,33 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import re
 import asyncio
+import datetime
+import time
+from collections import deque
 from logger import setup_logger
 from config_manager import ConfigManager
+from online_snapshot import OnlineSnapshot
+from softmod_protocol import decode
 
 logger = setup_logger(__name__, 'logs/online.log')
 
 ONLINE_PATTERN = r"\[ONLINE2\]"
+HISTORY_SECONDS = 3600
+HISTORY_SIZE = 240
+MAX_PLAYER_FIELDS = 20
+# The cached embed is also refreshed this often so the last-hour summary does not go stale
+EMBED_MAX_AGE = 60
 
 class OnlineCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_manager = bot.config_manager
-        self.last_online_message = ""
+        self.snapshot = None
+        # Recent snapshots that differed from their predecessor, oldest first
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self._embed = None
+        self._embed_built_at = 0
         self.readlog_cog = None
         logger.info("OnlineCog initialized")
 
@@ -36,7 +49,7 @@ class OnlineCog(commands.Cog):
             attempt += 1
             logger.warning(f"ReadLogCog not found (Attempt {attempt}/{max_attempts}). Retrying in 2 seconds...")
             await asyncio.sleep(2)
-        
+
         logger.error("ReadLogCog not found. Online tracking will not work.")
         return False
 
@@ -46,55 +59,74 @@ class OnlineCog(commands.Cog):
         logger.info("OnlineCog is ready.")
 
     async def process_online(self, line):
-        if "[ONLINE2]" in line:
-            self.last_online_message = line.strip()
-            logger.debug(f"Updated last online message: {self.last_online_message}")
+        if "[ONLINE2]" not in line and not decode(line):
+            return
+        snapshot = OnlineSnapshot.from_line(line)
+        if self.snapshot and snapshot.players == self.snapshot.players:
+            return  # Nothing changed; keep the cached embed
+        if self.snapshot:
+            snapshot.diff(self.snapshot)  # The first snapshot after startup has no baseline
+        self.snapshot = snapshot
+        self.history.append(snapshot)
+        self._embed = None
+        logger.debug(f"Updated online snapshot: {snapshot.count} players")
+
+    def recent_history(self):
+        """Snapshots from the last hour, plus the one that was current when the hour began."""
+        cutoff = time.time() - HISTORY_SECONDS
+        recent = [snapshot for snapshot in self.history if snapshot.timestamp >= cutoff]
+        earlier = [snapshot for snapshot in self.history if snapshot.timestamp < cutoff]
+        return earlier[-1:], recent
+
+    def build_embed(self):
+        snapshot = self.snapshot
+        embed = discord.Embed(title="Online Players", color=0x00ff00)
+        if not snapshot.players:
+            embed.description = "No players online."
+        else:
+            embed.description = "Here are the currently online players and their stats:"
+        for player in snapshot.players[:MAX_PLAYER_FIELDS]:
+            if player.score is None:
+                embed.add_field(name=f"**{player.name}**", value="Online", inline=False)
+                continue
+            details = f"**Score**: {player.score}, **Time Played**: {(player.minutes or 0) // 60} hours, **Rank**: {player.rank}"
+            if player.afk:
+                details += f", AFK for {player.afk}"
+            embed.add_field(name=f"**{player.name}**", value=details, inline=False)
+        if snapshot.count > MAX_PLAYER_FIELDS:
+            embed.add_field(name="...", value=f"and {snapshot.count - MAX_PLAYER_FIELDS} more", inline=False)
+
+        earlier, recent = self.recent_history()
+        joined = sorted({name for entry in recent for name in entry.joined})
+        left = sorted({name for entry in recent for name in entry.left})
+        counts = [entry.count for entry in earlier + recent]
+        if joined or left:
+            activity = []
+            if joined:
+                activity.append(f"**Joined**: {', '.join(joined)}")
+            if left:
+                activity.append(f"**Left**: {', '.join(left)}")
+            embed.add_field(name="Last Hour", value="\n".join(activity)[:1024], inline=False)
+        if counts:
+            embed.add_field(name="Concurrency (last hour)", value=f"Peak {max(counts)}, Low {min(counts)}", inline=False)
+        embed.set_footer(text=f"{snapshot.count} player(s) online")
+        embed.timestamp = datetime.datetime.fromtimestamp(snapshot.timestamp, tz=datetime.timezone.utc)
+        return embed
 
     @app_commands.command(name="online", description="Show currently online players and their stats")
     async def online(self, interaction: discord.Interaction):
         logger.info(f"Online command called by {interaction.user.name}")
 
-        if self.last_online_message:
-            player_info = self.parse_player_data(self.last_online_message)
-            embed = discord.Embed(title="Online Players", description="Here are the currently online players and their stats:", color=0x00ff00)
-            for line in player_info.split('\n'):
-                if line:
-                    parts = line.split(" - ")
-                    username = parts[0].strip()
-                    details = " - ".join(parts[1:])
-                    embed.add_field(name=f"**{username}**", value=details, inline=False)
-            await interaction.response.send_message(embed=embed)
+        if self.snapshot:
+            if self._embed is None or time.time() - self._embed_built_at > EMBED_MAX_AGE:
+                self._embed = self.build_embed()
+                self._embed_built_at = time.time()
+            await interaction.response.send_message(embed=self._embed)
             logger.info("Online players information sent successfully")
         else:
             await interaction.response.send_message("No recent online data available.")
             logger.info("No recent online data available")
 
-    def parse_player_data(self, log_entry):
-        try:
-            player_data = log_entry.split("[ONLINE2]")[-1].strip()
-            player_entries = player_data.split(";")
-            response_lines = []
-            for entry in player_entries:
-                if entry.strip():
-                    parts = entry.split(",")
-                    if len(parts) < 4:
-                        logger.warning(f"Incomplete player data: {entry}")
-                        continue  # Skip if there aren't enough data parts to parse
-                    username = parts[0]
-                    score = parts[1]
-                    time_minutes = parts[2]
-                    rank = parts[3].strip()
-                    hours_played = int(time_minutes) // 60  # Convert minutes to hours
-                    afk_time = ""
-                    if len(parts) > 4 and parts[4].strip():  # Check if the AFK time is present and not empty
-                        afk_time = f", AFK for {parts[4].strip()}"
-                    player_info = f"{username} - **Score**: {score}, **Time Played**: {hours_played} hours, **Rank**: {rank}{afk_time}"
-                    response_lines.append(player_info)
-            return "\n".join(response_lines) if response_lines else "No players online."
-        except Exception as e:
-            logger.error(f"Error parsing player data: {str(e)}")
-            return "Error processing player data."
-
 async def setup(bot):
     await bot.add_cog(OnlineCog(bot))
-    logger.info("OnlineCog added to bot")
\ No newline at end of file
+    logger.info("OnlineCog added to bot")
@@ -0,0 +1,131 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import datetime
+import math
+import time
+import psutil
+from logger import setup_logger
+from instrumentation import LOOP_LAG_INTERVAL_SECONDS, SLOW_CALLBACK_SECONDS, LoopMonitor, MetricsServer
+
+logger = setup_logger(__name__, 'logs/perf.log')
+
+MAX_ROWS = 8
+MAX_STACK_CHARS = 900
+INGEST_STAGES = ('read', 'parse', 'dispatch', 'send', 'db')
+
+def ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+def summarize(histogram):
+    return (f"{histogram.count}x, p50 {ms(histogram.quantile(0.5))} / p99 {ms(histogram.quantile(0.99))} / "
+            f"max {ms(histogram.max)} ms")
+
+class PerfCog(commands.Cog):
+    """Runs the event-loop monitor and the optional metrics endpoint, and reports both via /perf"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.config_manager = bot.config_manager
+        self.instrumentation = bot.instrumentation
+        self.loop_monitor = LoopMonitor(
+            self.instrumentation,
+            interval=self.config_manager.get('instrumentation.loop_lag_interval', LOOP_LAG_INTERVAL_SECONDS),
+            slow_threshold=self.config_manager.get('instrumentation.slow_callback_seconds', SLOW_CALLBACK_SECONDS))
+        self.metrics_server = None
+        self.process = psutil.Process()
+        self.instrumentation.add_collector(self.collect_metrics)
+        logger.info("PerfCog initialized")
+
+    def collect_metrics(self):
+        """The bot's own process and Discord connection"""
+        with self.process.oneshot():
+            samples = [
+                ('bot_cpu_percent', {}, self.process.cpu_percent()),
+                ('bot_rss_bytes', {}, self.process.memory_info().rss),
+                ('bot_threads', {}, self.process.num_threads()),
+            ]
+        latency = self.bot.latency
+        if not math.isnan(latency) and not math.isinf(latency):
+            samples.append(('discord_gateway_latency_seconds', {}, latency))
+        return samples
+
+    async def cog_load(self):
+        self.loop_monitor.start()
+        if self.config_manager.get('instrumentation.metrics_enabled', False):
+            self.metrics_server = MetricsServer(
+                self.instrumentation,
+                host=self.config_manager.get('instrumentation.metrics_host', '127.0.0.1'),
+                port=int(self.config_manager.get('instrumentation.metrics_port', 9105)))
+            try:
+                await self.metrics_server.start()
+            except Exception as e:
+                logger.error(f"Error starting metrics endpoint: {str(e)}")
+                self.metrics_server = None
+
+    async def cog_unload(self):
+        self.instrumentation.remove_collector(self.collect_metrics)
+        self.loop_monitor.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+            self.metrics_server = None
+        logger.info("PerfCog unloaded")
+
+    def histogram_rows(self, name, label, sort_key):
+        """'label: n, p50/p99 ms' lines for the busiest series of histogram `name`"""
+        rows = []
+        for labels, histogram in self.instrumentation.series(name).items():
+            values = dict(labels)
+            name_text = f"`{values.get(label, '?')}`" + (" (error)" if values.get('status') == 'error' else "")
+            rows.append((sort_key(histogram), f"{name_text}: {summarize(histogram)}"))
+        rows.sort(key=lambda row: row[0], reverse=True)
+        return "\n".join(text for _, text in rows[:MAX_ROWS]) or "No data yet"
+
+    @app_commands.command(name="perf", description="Show bot event-loop lag, command timings and log ingest latency")
+    @app_commands.default_permissions(administrator=True, moderate_members=True)
+    @app_commands.checks.has_permissions(administrator=True, moderate_members=True)
+    async def perf(self, interaction: discord.Interaction):
+        instrumentation = self.instrumentation
+        embed = discord.Embed(title="Bot Performance", color=discord.Color.blue())
+
+        lag = instrumentation.histogram('event_loop_lag_seconds')
+        stalls = instrumentation.counters.get('event_loop_stalls_total', {}).get((), 0)
+        if lag:
+            embed.add_field(name="Event Loop Lag",
+                            value=f"now {ms(self.loop_monitor.last_lag)} ms | {summarize(lag)}\n"
+                                  f"{int(stalls)} stall(s) over {ms(self.loop_monitor.slow_threshold)} ms",
+                            inline=False)
+
+        stage_lines = []
+        for stage in INGEST_STAGES:
+            histogram = instrumentation.histogram('ingest_stage_seconds', stage=stage)
+            if histogram:
+                stage_lines.append(f"`{stage}`: {summarize(histogram)}")
+        lines_total = instrumentation.counters.get('ingest_lines_total', {}).get((), 0)
+        embed.add_field(name=f"Log Ingest ({int(lines_total)} lines)", value="\n".join(stage_lines) or "No data yet",
+                        inline=False)
+        embed.add_field(name="Commands (by p99)",
+                        value=self.histogram_rows('command_seconds', 'command', lambda h: h.quantile(0.99)),
+                        inline=False)
+        embed.add_field(name="Subscribers (by total time)",
+                        value=self.histogram_rows('subscriber_seconds', 'callback', lambda h: h.sum),
+                        inline=False)
+
+        if self.loop_monitor.slow_samples:
+            when, blocked, stack = self.loop_monitor.slow_samples[-1]
+            # The innermost frames say what was blocking
+            stack = stack[-MAX_STACK_CHARS:]
+            embed.add_field(name=f"Last Stall: {blocked:.2f}s+ at {datetime.datetime.fromtimestamp(when):%H:%M:%S}",
+                            value=f"```\n{stack}\n```", inline=False)
+
+        uptime = datetime.timedelta(seconds=int(time.time() - instrumentation.started_at))
+        footer = f"Collected over {uptime}"
+        if self.metrics_server:
+            footer += f" | Prometheus: http://{self.metrics_server.host}:{self.metrics_server.port}/metrics"
+        embed.set_footer(text=footer)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        logger.info(f"Perf report requested by {interaction.user.name}")
+
+async def setup(bot):
+    await bot.add_cog(PerfCog(bot))
+    logger.info("PerfCog added to bot")
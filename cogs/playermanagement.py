@@ -25,7 +25,8 @@ class PlayerManagementCog(commands.Cog):
 
         try:
             self.rcon_client = RCONClient(rcon_host, rcon_port, rcon_password)
-            await self.bot.loop.run_in_executor(None, self.rcon_client.connect)
+            with self.bot.instrumentation.rcon('playermanagement', 'connect'):
+                await self.bot.loop.run_in_executor(None, self.rcon_client.connect)
             logger.info("RCON client connected successfully.")
             return True
         except Exception as e:
@@ -41,7 +42,8 @@ class PlayerManagementCog(commands.Cog):
                 return "Failed to establish RCON connection."
 
         try:
-            response = await self.bot.loop.run_in_executor(None, self.rcon_client.send_command, command)
+            with self.bot.instrumentation.rcon('playermanagement'):
+                response = await self.bot.loop.run_in_executor(None, self.rcon_client.send_command, command)
             logger.info(f"RCON command sent: {command}")
             if response:
                 logger.info(f"RCON response: {response}")
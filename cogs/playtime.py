@@ -0,0 +1,128 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import asyncio
+import re
+import time
+from typing import Optional
+from logger import setup_logger
+from online_snapshot import OnlineSnapshot
+from session_ledger import SessionLedger, format_duration, parse_log_timestamp
+
+logger = setup_logger(__name__, 'logs/playtime.log')
+
+JOIN_PATTERN = r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) )?\[JOIN\] (.+) joined the game"
+LEAVE_PATTERN = r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) )?\[LEAVE\] (.+) left the game"
+
+class PlaytimeCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config_manager = bot.config_manager
+        self.registration_store = bot.registration_store
+        self.ledger = SessionLedger(bot.state_store)
+        self.readlog_cog = None
+        logger.info("PlaytimeCog initialized")
+
+    def cog_unload(self):
+        if self.readlog_cog:
+            self.readlog_cog.unsubscribe("JOIN", self.on_join)
+            self.readlog_cog.unsubscribe("LEAVE", self.on_leave)
+            self.readlog_cog.unsubscribe("ONLINE2", self.on_online)
+            self.readlog_cog.unsubscribe("HEARTBEAT", self.on_heartbeat)
+        logger.info("PlaytimeCog unloaded")
+
+    async def ensure_readlog_cog(self):
+        """Ensure connection to ReadLogCog"""
+        max_attempts = 5
+        attempt = 0
+        while attempt < max_attempts:
+            self.readlog_cog = self.bot.get_cog('ReadLogCog')
+            if self.readlog_cog:
+                self.readlog_cog.subscribe("JOIN", self.on_join)
+                self.readlog_cog.subscribe("LEAVE", self.on_leave)
+                self.readlog_cog.subscribe("ONLINE2", self.on_online)
+                self.readlog_cog.subscribe("HEARTBEAT", self.on_heartbeat)
+                logger.info("Successfully connected to ReadLogCog.")
+                return True
+            attempt += 1
+            logger.warning(f"ReadLogCog not found (Attempt {attempt}/{max_attempts}). Retrying in 2 seconds...")
+            await asyncio.sleep(2)
+
+        logger.error("ReadLogCog not found. Playtime tracking will not work.")
+        return False
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.ensure_readlog_cog()
+        logger.info("PlaytimeCog is ready.")
+
+    async def on_join(self, line):
+        join_match = re.search(JOIN_PATTERN, line)
+        if join_match:
+            self.ledger.join(join_match.group(2), parse_log_timestamp(join_match.group(1)))
+
+    async def on_leave(self, line):
+        leave_match = re.search(LEAVE_PATTERN, line)
+        if leave_match:
+            duration = self.ledger.leave(leave_match.group(2), parse_log_timestamp(leave_match.group(1)))
+            if duration is not None:
+                logger.info(f"Session closed for {leave_match.group(2)}: {format_duration(duration)}")
+
+    async def on_online(self, line):
+        snapshot = OnlineSnapshot.from_line(line)
+        self.ledger.reconcile(snapshot.names(), snapshot.timestamp)
+
+    async def on_heartbeat(self, line):
+        self.ledger.confirm(time.time())
+
+    @app_commands.command(name="playtime", description="Show total playtime for a player, or the top players")
+    @app_commands.describe(member="The registered Discord member to check (leave empty for the leaderboard)")
+    async def playtime(self, interaction: discord.Interaction, member: Optional[discord.Member] = None):
+        if member is None:
+            top = self.ledger.top_players(10)
+            embed = discord.Embed(title="Top Playtime", color=discord.Color.blue())
+            if top:
+                embed.description = "\n".join(
+                    f"**{rank}.** {name} - {format_duration(seconds)}" for rank, (name, seconds) in enumerate(top, start=1)
+                )
+            else:
+                embed.description = "No sessions recorded yet."
+            await interaction.response.send_message(embed=embed)
+            return
+
+        player_name = self.registration_store.get_player_name(member.id)
+        if not player_name:
+            await interaction.response.send_message(
+                f"{member.mention} has not yet registered on the Factorio game server.",
+                ephemeral=True
+            )
+            return
+
+        total, sessions, longest = self.ledger.playtime(player_name)
+        embed = discord.Embed(title=f"Playtime for {player_name}", color=discord.Color.blue())
+        embed.add_field(name="Total", value=format_duration(total), inline=True)
+        embed.add_field(name="Sessions", value=str(sessions), inline=True)
+        embed.add_field(name="Longest Session", value=format_duration(longest), inline=True)
+        if sessions:
+            embed.add_field(name="Average Session", value=format_duration(total / sessions), inline=True)
+        if player_name in self.ledger.open_sessions:
+            embed.set_footer(text="Currently online")
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(name="peakplayers", description="Show the highest number of players online at once")
+    @app_commands.describe(days="Only consider the last N days (leave empty for all time)")
+    async def peakplayers(self, interaction: discord.Interaction, days: Optional[app_commands.Range[int, 1, 3650]] = None):
+        peak = self.ledger.peak_concurrency(days)
+        period = f"the last {days} day(s)" if days else "all time"
+        if not peak:
+            await interaction.response.send_message(f"No player activity recorded for {period}.")
+            return
+        count, peak_at = peak
+        await interaction.response.send_message(
+            f"Peak concurrency for {period}: **{count}** player(s), reached <t:{int(peak_at)}:f>. "
+            f"Currently online: **{len(self.ledger.open_sessions)}**."
+        )
+
+async def setup(bot):
+    await bot.add_cog(PlaytimeCog(bot))
+    logger.info("PlaytimeCog added to bot")
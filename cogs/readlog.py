@@ -7,9 +7,14 @@ import geoip2.database
 import logging
 import traceback
 import time
-import json
+import hashlib
+from collections import OrderedDict
 from logger import setup_logger
 from config_manager import ConfigManager
+from log_index import LogIndex
+from geo_cache import GeoCache, clean_ip
+from instrumentation import SLOW_CALLBACK_SECONDS
+from softmod_protocol import EVENT_MESSAGE_TYPES, PROTOCOL_TAG, decode
 
 logger = setup_logger(__name__, 'logs/readlog.log')
 
@@ -28,8 +33,10 @@ def debug_log(category, message):
 
 def load_geo_database(config_manager):
     database_path = config_manager.get('geo_database_path', 'GeoLite2-City.mmdb')
+    # Memory-mapping avoids reading the whole database into the heap
+    mode = geoip2.database.MODE_MMAP if config_manager.get('geo_database_mmap', False) else geoip2.database.MODE_AUTO
     try:
-        reader = geoip2.database.Reader(database_path)
+        reader = geoip2.database.Reader(database_path, mode=mode)
         logger.info(f"GeoLite2 City database loaded successfully from {database_path}")
         return reader
     except Exception as e:
@@ -40,11 +47,11 @@ def get_location_from_ip(ip_address, reader):
     if reader is None:
         return "Unknown", "Unknown"
     try:
-        clean_ip = ip_address.strip('{}').split(':')[0]
-        response = reader.city(clean_ip)
+        address = clean_ip(ip_address)
+        response = reader.city(address)
         country = response.country.name or "Unknown"
         state = response.subdivisions.most_specific.name if response.subdivisions else "Unknown"
-        debug_log('connections', f"IP Address: {clean_ip}, Country: {country}, State: {state}")
+        debug_log('connections', f"IP Address: {address}, Country: {country}, State: {state}")
         return country, state
     except Exception as e:
         logger.error(f"Error getting location for IP Address: {ip_address}, Error: {str(e)}")
@@ -71,6 +78,27 @@ ONLINE_PATTERN = r"\[ONLINE2\] (.*)"
 STATS_MINE_PATTERN = r"\[ACT\] ([^[\]]+) mined ([^[\]]+) \[gps="
 
 TIMEOUT_SECONDS = 30
+# Checkpoint the tailer at most this often, or after this many lines
+CHECKPOINT_INTERVAL_SECONDS = 5
+CHECKPOINT_MAX_LINES = 1000
+# How far back to look for the checkpointed line when verifying it on startup
+CHECKPOINT_VERIFY_BYTES = 64 * 1024
+
+def line_hash(line):
+    return hashlib.blake2b(line, digest_size=8).hexdigest()
+
+def read_line_ending_at(log_file, position):
+    """The complete line that ends at byte `position`, or None if it can't be found"""
+    start = max(0, position - CHECKPOINT_VERIFY_BYTES)
+    with open(log_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(position - start)
+    if not data.endswith(b'\n'):
+        return None
+    line_start = data.rfind(b'\n', 0, len(data) - 1) + 1
+    if line_start == 0 and start > 0:
+        return None  # Longer than the verify window
+    return data[line_start:]
 
 class ReadLogCog(commands.Cog):
     def __init__(self, bot):
@@ -81,9 +109,12 @@ class ReadLogCog(commands.Cog):
         self.log_file = os.path.join(base_path, "logs/verbose.log")
         
         self.parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.position_file = os.path.join(self.parent_dir, "last_position.txt")
-        self.location_prefs_file = os.path.join(self.parent_dir, "location_prefs.json")
+        self.state_store = bot.state_store
+        self.server_facts = bot.server_facts
+        self.instrumentation = bot.instrumentation
+        self.log_index = None
         self.geo_reader = load_geo_database(self.config_manager)
+        self.geo_cache = GeoCache(lambda ip_address: get_location_from_ip(ip_address, self.geo_reader))
         
         # Create logs directory if it doesn't exist
         os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
@@ -92,12 +123,22 @@ class ReadLogCog(commands.Cog):
         if not os.path.exists(self.log_file):
             open(self.log_file, 'a').close()
         
-        # Initialize last_position
-        try:
-            with open(self.position_file, 'r') as f:
-                self.last_position = int(f.read().strip())
-        except:
-            self.last_position = 0
+        # Initialize last_position, following the file by inode across rotations
+        self.log_handle = None
+        self.piped = False
+        self.log_inode = os.stat(self.log_file).st_ino
+        self.last_line = None
+        self.line_position = None
+        self.checkpoint_listeners = []
+        self._checkpoint_at = time.monotonic()
+        self._lines_since_checkpoint = 0
+        # Time spent in subscribers and Discord sends for the line being processed
+        self._dispatch_seconds = 0.0
+        self._send_seconds = 0.0
+        self.sends_in_flight = 0
+        self.last_line_at = None
+        self.last_position = self.get_last_position()
+        if not self.last_position:
             logger.info("Starting from beginning of log file")
         
         # Use new channel ID configuration
@@ -108,10 +149,13 @@ class ReadLogCog(commands.Cog):
             logger.warning("Using legacy channel_id configuration")
         
         # Initialize other attributes
-        self.ip_to_username = {}
-        self.ip_timestamps = {}
+        # Unclaimed connection attempts, oldest first: ip -> time last seen
+        self.pending_ips = OrderedDict()
         self.connected_players = set()
-        self.location_preferences = self.load_location_preferences()
+        # Resolved (country, state) of online players who allow their location to be used
+        self.player_locations = {}
+        self.location_prefs = bot.location_prefs
+        self.registration_store = bot.registration_store
         self.message_subscribers = {
             "CHAT": set(),
             "CHAT_STATS": set(),
@@ -121,17 +165,10 @@ class ReadLogCog(commands.Cog):
             "ONLINE2": set(),
             "STATS-E1": set(),
             "STATS-D2": set(),
-            "ACT": set()
+            "ACT": set(),
+            "HEARTBEAT": set(),
+            "ACCESS": set()
         }
-        
-        # Ensure location_prefs.json exists
-        if not os.path.exists(self.location_prefs_file):
-            try:
-                with open(self.location_prefs_file, 'w') as f:
-                    json.dump({}, f)
-                logger.info(f"Created new location preferences file: {self.location_prefs_file}")
-            except Exception as e:
-                logger.error(f"Error creating location preferences file: {str(e)}")
 
         if self.config_manager.get('debug_mode', False):
             DEBUG_CONFIG.update({
@@ -141,35 +178,26 @@ class ReadLogCog(commands.Cog):
                 'debug_connections': True
             })
         
+        self.instrumentation.add_collector(self.collect_metrics)
         logger.info("ReadLogCog initialized")
 
-    def load_location_preferences(self):
-        """Load location display preferences from JSON file"""
-        try:
-            with open(self.location_prefs_file, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading location preferences: {str(e)}")
-            return {}
-
-    def save_location_preferences(self):
-        """Save location display preferences to JSON file"""
+    def collect_metrics(self):
+        """Ingest progress and GeoIP cache figures for the metrics endpoint"""
         try:
-            with open(self.location_prefs_file, 'w') as f:
-                json.dump(self.location_preferences, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving location preferences: {str(e)}")
-
-    def get_factorio_username(self, discord_id):
-        """Get Factorio username from registrations file"""
-        registrations_file = os.path.join(self.parent_dir, "registrations.json")
-        try:
-            with open(registrations_file, 'r') as f:
-                registrations = json.load(f)
-                return registrations.get(str(discord_id))
-        except Exception as e:
-            logger.error(f"Error reading registrations file: {str(e)}")
-            return None
+            log_size = os.stat(self.log_file).st_size
+        except OSError:
+            log_size = None
+        stats = self.geo_cache.stats()
+        return [
+            ('ingest_lag_bytes', {}, max(0, log_size - self.last_position) if log_size is not None else None),
+            ('ingest_last_line_age_seconds', {}, time.time() - self.last_line_at if self.last_line_at else None),
+            ('discord_sends_in_flight', {}, self.sends_in_flight),
+            ('geo_cache_entries', {}, stats['entries']),
+            ('geo_cache_hits_total', {}, stats['hits']),
+            ('geo_cache_misses_total', {}, stats['misses']),
+            ('geo_cache_expirations_total', {}, stats['expirations']),
+            ('geo_cache_evictions_total', {}, stats['evictions']),
+        ]
 
     @app_commands.command(name="disablelocation", description="Enable or disable location display when joining the server")
     @app_commands.describe(
@@ -181,7 +209,7 @@ class ReadLogCog(commands.Cog):
     ])
     async def disablelocation(self, interaction: discord.Interaction, setting: app_commands.Choice[str]):
         # Check if user is registered
-        factorio_username = self.get_factorio_username(interaction.user.id)
+        factorio_username = self.registration_store.get_player_name(interaction.user.id)
         if not factorio_username:
             await interaction.response.send_message(
                 "You must be registered on the Factorio server to use this command. "
@@ -191,11 +219,7 @@ class ReadLogCog(commands.Cog):
             return
 
         # Update preference
-        self.location_preferences[str(interaction.user.id)] = {
-            "show_location": setting.value == "enable",
-            "factorio_username": factorio_username
-        }
-        self.save_location_preferences()
+        self.location_prefs.set_show_location(interaction.user.id, factorio_username, setting.value == "enable")
 
         status = "enabled" if setting.value == "enable" else "disabled"
         await interaction.response.send_message(
@@ -224,6 +248,7 @@ class ReadLogCog(commands.Cog):
                 return
                 
             for callback in list(self.message_subscribers[message_type]):  # Convert set to list for iteration
+                started = time.perf_counter()
                 try:
                     if callback:  # Check if callback exists
                         debug_log('debug_stats' if 'STATS' in message_type else 'debug_commands', 
@@ -232,88 +257,150 @@ class ReadLogCog(commands.Cog):
                 except Exception as e:
                     logger.error(f"Error in subscriber callback {callback.__qualname__}: {str(e)}")
                     logger.error(traceback.format_exc())
+                finally:
+                    elapsed = time.perf_counter() - started
+                    self._dispatch_seconds += elapsed
+                    self.instrumentation.observe('subscriber_seconds', elapsed, type=message_type,
+                                                 callback=callback.__qualname__)
+                    if elapsed >= SLOW_CALLBACK_SECONDS:
+                        logger.warning(f"Slow subscriber {callback.__qualname__} for {message_type}: {elapsed:.3f}s")
+
+    async def send(self, channel, message):
+        """Post to the game channel, timing the Discord send"""
+        started = time.perf_counter()
+        self.sends_in_flight += 1
+        try:
+            await channel.send(message)
+        except Exception:
+            self.instrumentation.inc('discord_send_errors_total')
+            raise
+        finally:
+            self.sends_in_flight -= 1
+            elapsed = time.perf_counter() - started
+            self._send_seconds += elapsed
+            self.instrumentation.observe('ingest_stage_seconds', elapsed, stage='send')
 
     def get_last_position(self):
-        """Get the last read position from the position file"""
+        """Get the last checkpointed position, or 0 if the log was replaced or rewritten since"""
         try:
-            with open(self.position_file, "r") as file:
-                return int(file.read().strip())
-        except FileNotFoundError:
-            logger.error(f"Position file not found: {self.position_file}")
-            return 0
+            position, inode, checkpoint_hash = self.state_store.get_log_checkpoint('verbose')
+            if inode is not None and inode != self.log_inode:
+                logger.info("Log file was replaced since the last run")
+                return 0
+            if position > os.path.getsize(self.log_file):
+                logger.info("Log file is shorter than the last checkpoint")
+                return 0
+            if checkpoint_hash and position:
+                last_line = read_line_ending_at(self.log_file, position)
+                if last_line is not None and line_hash(last_line) != checkpoint_hash:
+                    logger.info("Log file no longer matches the last checkpoint")
+                    return 0
+                self.last_line = last_line
+            return position
         except Exception as e:
-            logger.error(f"Error reading position file: {str(e)}")
+            logger.error(f"Error reading last position: {str(e)}")
             return 0
 
-    def cog_unload(self):
+    def add_checkpoint_listener(self, callback):
+        """Register callback(reset) to run before each checkpoint.
+
+        Consumers that keep their own cursor commit buffered work there, so
+        the tailer never checkpoints past lines they haven't persisted.
+        reset is True when the log was truncated and offsets start over.
+        """
+        if callback not in self.checkpoint_listeners:
+            self.checkpoint_listeners.append(callback)
+
+    def remove_checkpoint_listener(self, callback):
+        if callback in self.checkpoint_listeners:
+            self.checkpoint_listeners.remove(callback)
+
+    def checkpoint(self, reset=False):
+        """Flush checkpoint listeners, then queue position, inode and last line hash as one write"""
+        with self.instrumentation.timer('ingest_stage_seconds', stage='db'):
+            self._checkpoint(reset)
+
+    def _checkpoint(self, reset):
+        for callback in list(self.checkpoint_listeners):
+            try:
+                callback(reset)
+            except Exception as e:
+                logger.error(f"Error in checkpoint listener {callback.__qualname__}: {str(e)}")
         try:
-            with open(self.position_file, 'w') as f:
-                f.write(str(self.last_position))
+            self.state_store.submit(self.state_store.set_log_position, 'verbose', self.last_position, self.log_inode,
+                                    line_hash(self.last_line) if self.last_line else None)
         except Exception as e:
-            logger.error(f"Error saving last position during unload: {str(e)}")
+            logger.error(f"Error saving last position: {str(e)}")
+        if self.log_index and self.log_index.dirty:
+            self.log_index.flush()
+        self._checkpoint_at = time.monotonic()
+        self._lines_since_checkpoint = 0
+
+    def maybe_checkpoint(self):
+        """Checkpoint if enough lines or time have passed since the last one"""
+        if not self._lines_since_checkpoint:
+            return
+        if (self._lines_since_checkpoint >= CHECKPOINT_MAX_LINES
+                or time.monotonic() - self._checkpoint_at >= CHECKPOINT_INTERVAL_SECONDS):
+            self.checkpoint()
+
+    def open_log(self):
+        """Open the log for tailing and remember which file (inode) is being followed"""
+        self.log_handle = open(self.log_file, 'rb')
+        self.log_inode = os.fstat(self.log_handle.fileno()).st_ino
+
+    def close_log(self):
+        if self.log_handle:
+            self.log_handle.close()
+            self.log_handle = None
+
+    def follow_rotation(self):
+        """Switch to a new file at the log path once the old one has been drained.
+
+        Returns True if the tailer moved to a new file.
+        """
+        try:
+            inode = os.stat(self.log_file).st_ino
+        except FileNotFoundError:
+            return False  # Rotated away but not recreated yet
+        if inode == self.log_inode:
+            return False
+        logger.info("Log file was rotated. Following the new file.")
+        self.checkpoint()
+        self.close_log()
+        self.open_log()
+        self.last_position = 0
+        self.last_line = None
+        self.server_facts.reset()
+        if self.log_index:
+            self.log_index = LogIndex(self.log_file)
+            self.log_index.reset()
+        self.checkpoint()
+        return True
+
+    def cog_unload(self):
+        self.instrumentation.remove_collector(self.collect_metrics)
         self.check_log.cancel()
+        self.checkpoint()
+        self.close_log()
+        logger.info(f"GeoIP cache stats: {self.geo_cache.stats()}")
         logger.info("ReadLogCog unloaded")
 
     @tasks.loop(seconds=1)
     async def check_log(self):
         try:
-            if not os.path.exists(self.log_file):
-                return  # Just return if the file doesn't exist yet
-
-            if os.path.getsize(self.log_file) < self.last_position:
-                logger.info("Log file has been reset. Starting from the beginning.")
-                self.last_position = 0
-
-            with open(self.log_file, "r") as file:
-                file.seek(self.last_position)
-                new_lines = file.readlines()
-                new_position = file.tell()
-
-                if new_lines:
-                    # Use factorio_general_id for channel
-                    channel_id = self.config_manager.get('discord.factorio_general_channel_id')
-                    if not channel_id:
-                        # Fallback to old config key if exists
-                        channel_id = self.config_manager.get('discord.channel_id')
-                        if not channel_id:
-                            logger.error("No channel ID configured")
-                            return
+            if self.piped:
+                self.maybe_checkpoint()  # Lines arrive through ingest_pipe_lines instead
+                return
+            if self.log_handle is None:
+                if not os.path.exists(self.log_file):
+                    return  # Just return if the file doesn't exist yet
+                self.open_log()
 
-                    try:
-                        channel = self.bot.get_channel(int(channel_id))
-                        if channel:
-                            for line in new_lines:
-                                try:
-                                    await self.process_log_line(line, channel)
-                                except Exception as e:
-                                    logger.error(f"Error processing log line: {line}, Error: {str(e)}")
-                                    logger.error(traceback.format_exc())
-                            
-                            # Update and save position after successful processing
-                            self.last_position = new_position
-                            try:
-                                with open(self.position_file, 'w') as f:
-                                    f.write(str(self.last_position))
-                                    f.flush()
-                                    os.fsync(f.fileno())
-                            except Exception as e:
-                                logger.error(f"Error saving last position: {str(e)}")
-                        else:
-                            logger.error(f"Could not find channel with ID: {channel_id}")
-                    except ValueError as e:
-                        logger.error(f"Invalid channel ID format: {channel_id}")
-                    except Exception as e:
-                        logger.error(f"Error processing channel: {str(e)}")
-
-                    # Clean up old IP addresses
-                    current_time = time.time()
-                    for ip_address, timestamp in list(self.ip_timestamps.items()):
-                        if current_time - timestamp > TIMEOUT_SECONDS:
-                            if ip_address in self.ip_to_username:
-                                debug_log('connections', f"Removing timed out IP Address: {ip_address}")
-                                del self.ip_to_username[ip_address]
-                            if ip_address in self.ip_timestamps:
-                                del self.ip_timestamps[ip_address]
+            if not await self.read_new_lines():
+                # Only switch files once everything written to the old one has been read
+                if not self.follow_rotation():
+                    self.maybe_checkpoint()
 
         except FileNotFoundError:
             logger.error(f"Log file not found: {self.log_file}")
@@ -321,8 +408,151 @@ class ReadLogCog(commands.Cog):
             logger.error(f"Error checking log file: {str(e)}")
             logger.error(traceback.format_exc())
 
+    async def read_new_lines(self):
+        """Dispatch complete lines appended to the tailed file. Returns False if there were none."""
+        if os.fstat(self.log_handle.fileno()).st_size < self.last_position:
+            logger.info("Log file has been reset. Starting from the beginning.")
+            self.last_position = 0
+            self.last_line = None
+            self.server_facts.reset()
+            if self.log_index:
+                self.log_index.reset()
+            self.checkpoint(reset=True)
+
+        file = self.log_handle
+        with self.instrumentation.timer('ingest_stage_seconds', stage='read'):
+            file.seek(self.last_position)
+            raw_lines = file.readlines()
+            new_position = file.tell()
+        if raw_lines and not raw_lines[-1].endswith(b'\n'):
+            # Leave a partially written last line for the next poll
+            new_position -= len(raw_lines.pop())
+
+        if not raw_lines:
+            return False
+        await self.process_raw_lines(raw_lines, new_position)
+        return True
+
+    async def attach_pipe(self):
+        """Stop tailing the file and take lines from ingest_pipe_lines instead.
+
+        Call once the file the piped output is written to exists; anything
+        left unread in the previous file is dispatched first.
+        """
+        self.piped = True
+        if self.log_handle is None:
+            self.open_log()
+            self.last_position = os.fstat(self.log_handle.fileno()).st_size
+        else:
+            await self.read_new_lines()
+            self.follow_rotation()
+        logger.info("Receiving server output through the pipe")
+
+    def detach_pipe(self):
+        """Go back to tailing the file, e.g. after the piped server exited"""
+        self.piped = False
+        logger.info("Server output pipe closed. Tailing the log file again.")
+
+    async def ingest_pipe_lines(self, raw_lines):
+        """Dispatch complete lines read from the server's stdout, which were also appended to the log"""
+        new_position = self.last_position + sum(len(raw_line) for raw_line in raw_lines)
+        await self.process_raw_lines(raw_lines, new_position)
+        # The pipe can't replay lines that could not be dispatched, so keep offsets in step with the file
+        self.last_position = new_position
+
+    async def process_raw_lines(self, raw_lines, new_position):
+        """Dispatch lines that start at last_position and end at byte new_position of the log"""
+        # Use factorio_general_id for channel
+        channel_id = self.config_manager.get('discord.factorio_general_channel_id')
+        if not channel_id:
+            # Fallback to old config key if exists
+            channel_id = self.config_manager.get('discord.channel_id')
+            if not channel_id:
+                logger.error("No channel ID configured")
+                return
+
+        try:
+            channel = self.bot.get_channel(int(channel_id))
+            if channel:
+                offset = self.last_position
+                for raw_line in raw_lines:
+                    if self.log_index:
+                        self.log_index.observe(offset, raw_line)
+                    offset += len(raw_line)
+                    self.line_position = (self.log_inode, offset)
+                    started = time.perf_counter()
+                    self._dispatch_seconds = self._send_seconds = 0.0
+                    line = raw_line.decode('utf-8', errors='replace')
+                    try:
+                        self.server_facts.feed(line)
+                        await self.process_log_line(line, channel)
+                    except Exception as e:
+                        logger.error(f"Error processing log line: {line}, Error: {str(e)}")
+                        logger.error(traceback.format_exc())
+                    # Whatever the line cost beyond subscribers and sends is matching it
+                    self.instrumentation.observe('ingest_stage_seconds', time.perf_counter() - started
+                                                 - self._dispatch_seconds - self._send_seconds, stage='parse')
+                    if self._dispatch_seconds:
+                        self.instrumentation.observe('ingest_stage_seconds', self._dispatch_seconds, stage='dispatch')
+                self.instrumentation.inc('ingest_lines_total', len(raw_lines))
+                self.instrumentation.inc('ingest_bytes_total', new_position - self.last_position)
+                self.last_line_at = time.time()
+
+                # Update position after successful processing; checkpoints are batched
+                self.last_position = new_position
+                self.last_line = raw_lines[-1]
+                self._lines_since_checkpoint += len(raw_lines)
+                self.maybe_checkpoint()
+            else:
+                logger.error(f"Could not find channel with ID: {channel_id}")
+        except ValueError as e:
+            logger.error(f"Invalid channel ID format: {channel_id}")
+        except Exception as e:
+            logger.error(f"Error processing channel: {str(e)}")
+
+        # Clean up old IP addresses; the queue is ordered by time last seen
+        current_time = time.time()
+        while self.pending_ips:
+            ip_address, timestamp = next(iter(self.pending_ips.items()))
+            if current_time - timestamp <= TIMEOUT_SECONDS:
+                break
+            debug_log('connections', f"Removing timed out IP Address: {ip_address}")
+            del self.pending_ips[ip_address]
+
+    async def resolve_location(self, ip_address):
+        """(country, state) for an address, from the cache or the GeoIP database off the event loop"""
+        if not self.geo_reader:
+            return "Unknown", "Unknown"
+        location = self.geo_cache.get(ip_address)
+        if location is None:
+            location = await self.bot.loop.run_in_executor(None, self.geo_cache.resolve, ip_address)
+        return location
+
+    async def process_event(self, event, line, channel):
+        """Handle a [DW1] softmod record; subscribers get the line and decode() it from cache"""
+        if event is None:
+            logger.warning(f"Malformed softmod record: {line.strip()}")
+            return
+        event_type = event['t']
+        if event_type in EVENT_MESSAGE_TYPES:
+            await self.notify_subscribers(EVENT_MESSAGE_TYPES[event_type], line)
+        elif event_type == 'research':
+            message = f"**Research Completed:** {event.get('n')}"
+            await self.send(channel, message)
+            logger.info(f"Research Completed: {event.get('n')}")
+        elif event_type == 'death' and event.get('c'):
+            message = f"**{event.get('p')}** was killed by {event['c']}"
+            await self.send(channel, message)
+            logger.info(f"Death Event - {event.get('p')} killed by {event['c']}")
+        # join, leave and chat are announced from the server's own date-stamped lines, as before
+
     async def process_log_line(self, line, channel):
         try:
+            # Versioned softmod records are decoded once and skip the regexes below
+            if line.startswith(PROTOCOL_TAG):
+                await self.process_event(decode(line), line, channel)
+                return
+
             # Match the chat pattern and detect if it's the !statsme command
             chat_match = re.search(CHAT_PATTERN, line)
             if chat_match:
@@ -338,7 +568,7 @@ class ReadLogCog(commands.Cog):
                 # Only skip sending to Discord if it contains GPS coordinates
                 if "[gps" not in chat_match.group(3):
                     message = f"**{chat_match.group(2)}** says: {chat_match.group(3)}"
-                    await channel.send(message)
+                    await self.send(channel, message)
                 else:
                     debug_log('debug_chat', f"Skipping GPS message for Discord: {chat_match.group(3)}")
                 
@@ -348,23 +578,18 @@ class ReadLogCog(commands.Cog):
 
             ip_match = re.search(IP_PATTERN, line)
             if ip_match:
-                ip_address = ip_match.group(1)
-                country = "Unknown"
-                state = "Unknown"
-                if hasattr(self, 'geo_reader') and self.geo_reader:
-                    country, state = get_location_from_ip(ip_address, self.geo_reader)
-                logger.debug(f"Cached IP Address: {ip_address}, Location: {country}, {state}")
-                self.ip_to_username[ip_address] = (None, country, state)
-                self.ip_timestamps[ip_address] = time.time()
+                # Resolved lazily on join, so repeated reconnect attempts cost no lookups
+                ip_address = clean_ip(ip_match.group(1))
+                self.pending_ips.pop(ip_address, None)
+                self.pending_ips[ip_address] = time.time()
+                logger.debug(f"Queued IP Address: {ip_address}")
 
             connection_refused_match = re.search(CONNECTION_REFUSED_PATTERN, line)
             if connection_refused_match:
-                ip_address = connection_refused_match.group(1)
+                ip_address = clean_ip(connection_refused_match.group(1))
                 username = connection_refused_match.group(2)
-                if ip_address in self.ip_to_username:
-                    debug_log('connections', f"Removing cached IP Address: {ip_address} for Username: {username}")
-                    del self.ip_to_username[ip_address]
-                    del self.ip_timestamps[ip_address]
+                if self.pending_ips.pop(ip_address, None) is not None:
+                    debug_log('connections', f"Removing queued IP Address: {ip_address} for Username: {username}")
 
             for pattern in JOIN_PATTERNS:
                 join_match = re.search(pattern, line)
@@ -372,30 +597,27 @@ class ReadLogCog(commands.Cog):
                     username = join_match.group(2) if len(join_match.groups()) > 1 else join_match.group(1)
                     if username not in self.connected_players:
                         self.connected_players.add(username)
-                        ip_address = next((ip for ip, (user, _, _) in self.ip_to_username.items() if user is None), None)
+                        # The oldest unclaimed connection attempt belongs to this join
+                        ip_address = self.pending_ips.popitem(last=False)[0] if self.pending_ips else None
 
-                        # Check global location setting first
-                        show_locations = self.config_manager.get('discord.show_locations', True)  # Default to True if not set
-                        
-                        if show_locations:
-                            # Then check individual user preference
-                            for user_id, prefs in self.location_preferences.items():
-                                if prefs.get('factorio_username') == username:
-                                    show_locations = prefs.get('show_location', True)
-                                    break
+                        # Individual user preference applies to announcements and geography alike
+                        user_allows_location = self.location_prefs.allows_location(username)
+
+                        # Then the global location setting
+                        show_locations = user_allows_location and self.config_manager.get('discord.show_locations', True)  # Default to True if not set
 
                         if ip_address:
-                            self.ip_to_username[ip_address] = (username, self.ip_to_username[ip_address][1], self.ip_to_username[ip_address][2])
-                            
+                            if user_allows_location:
+                                country, state = await self.resolve_location(ip_address)
+                                self.player_locations[username] = (country, state)
                             if show_locations:
-                                country, state = self.ip_to_username[ip_address][1], self.ip_to_username[ip_address][2]
                                 message = f"**{username}** has joined the game from **{state}, {country}**."
                             else:
                                 message = f"**{username}** has joined the game. (Location Hidden)"
                         else:
                             message = f"**{username}** has joined the game."
                         
-                        await channel.send(message)
+                        await self.send(channel, message)
                         await self.notify_subscribers("JOIN", line)
                         debug_log('connections', f"Join Event - Username: {username}, IP Address: {ip_address if ip_address else 'Not Found'}")
                         break
@@ -406,19 +628,20 @@ class ReadLogCog(commands.Cog):
 
             if research_match:
                 message = f"**Research Completed:** {research_match.group(1)}"
-                await channel.send(message)
+                await self.send(channel, message)
                 logger.info(f"Research Completed: {research_match.group(1)}")
             elif leave_match:
                 username = leave_match.group(2)
                 if username in self.connected_players:
                     self.connected_players.remove(username)
+                self.player_locations.pop(username, None)
                 message = f"**{username}** left the game."
-                await channel.send(message)
+                await self.send(channel, message)
                 await self.notify_subscribers("LEAVE", line)
                 debug_log('connections', f"Leave Event - Username: {username}")
             elif death_match:
                 message = f"**{death_match.group(1)}** was killed by {death_match.group(2)}"
-                await channel.send(message)
+                await self.send(channel, message)
                 logger.info(f"Death Event - {death_match.group(1)} killed by {death_match.group(2)}")
 
             # Process other event patterns
@@ -441,7 +664,6 @@ class ReadLogCog(commands.Cog):
                     await self.notify_subscribers("ACT", line)
                 return
 
-
             if "[ONLINE2]" in line:
                 debug_log('debug_stats', f"Found ONLINE2 message: {line.strip()}")
                 await self.notify_subscribers("ONLINE2", line)
@@ -461,6 +683,14 @@ class ReadLogCog(commands.Cog):
     @commands.Cog.listener()
     async def on_ready(self):
         if not self.check_log.is_running():
+            try:
+                self.log_index = await self.bot.loop.run_in_executor(None, LogIndex.open, self.log_file)
+            except Exception as e:
+                logger.error(f"Error opening log index: {str(e)}")
+            if self.last_position:
+                # Recover facts from the part of the log consumed before this start
+                self.bot.loop.run_in_executor(None, self.server_facts.bootstrap_from_file, self.log_file,
+                                              self.last_position, self.log_index.launch_offset if self.log_index else None)
             self.check_log.start()
             logger.info("ReadLogCog is ready and log checking has started")
         else:
@@ -24,6 +24,9 @@ class RebootCog(commands.Cog):
         
         try:
             logger.info("Attempting to restart the Discord bot")
+            # execv skips cog_unload, so unload the cogs and close the state store first;
+            # last-seen times, session ledgers and the pending stats batch are flushed there
+            await self.bot.close()
             os.execv(sys.executable, ['python'] + sys.argv)
         except Exception as e:
             logger.error(f"Error during bot restart: {str(e)}")
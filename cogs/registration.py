@@ -1,15 +1,14 @@
-import os
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 import random
 import re
 import string
-import json
 import datetime
 import asyncio
 from logger import setup_logger
 from config_manager import ConfigManager
+from softmod_protocol import decode
 
 logger = setup_logger(__name__, 'logs/registration.log')
 
@@ -20,26 +19,19 @@ class RegistrationCog(commands.Cog):
         self.bot = bot
         self.config_manager = bot.config_manager
         self.server_id = self.config_manager.get('discord.server_id')
-        self.parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.registrations_file = os.path.join(self.parent_dir, "registrations.json")
+        self.registration_store = bot.registration_store
         self.pending_registrations = {}
         self.registration_timestamps = {}
-        self.create_registrations_file()
         self.readlog_cog = None
         logger.info("RegistrationCog initialized")
 
     def cog_unload(self):
         if self.readlog_cog:
             self.readlog_cog.unsubscribe("CMD", self.process_registration)
+            self.readlog_cog.unsubscribe("ACCESS", self.process_registration)
         self.remove_expired_registrations.cancel()
         logger.info("RegistrationCog unloaded")
 
-    def create_registrations_file(self):
-        if not os.path.isfile(self.registrations_file):
-            with open(self.registrations_file, "w") as file:
-                json.dump({}, file)
-            logger.info(f"Created new registrations file: {self.registrations_file}")
-
     @commands.Cog.listener()
     async def on_ready(self):
         await self.ensure_readlog_cog()
@@ -54,6 +46,7 @@ class RegistrationCog(commands.Cog):
             self.readlog_cog = self.bot.get_cog('ReadLogCog')
             if self.readlog_cog:
                 self.readlog_cog.subscribe("CMD", self.process_registration)
+                self.readlog_cog.subscribe("ACCESS", self.process_registration)
                 logger.info("Successfully connected to ReadLogCog.")
                 return True
             attempt += 1
@@ -66,14 +59,12 @@ class RegistrationCog(commands.Cog):
     @app_commands.command(name='register', description='Register for the Factorio server')
     async def register(self, interaction: discord.Interaction):
         # Check if user is already registered
-        with open(self.registrations_file, 'r') as f:
-            registrations = json.load(f)
-            if str(interaction.user.id) in registrations:
-                await interaction.response.send_message(
-                    "You are already registered on the Factorio server.",
-                    ephemeral=True
-                )
-                return
+        if self.registration_store.is_registered(interaction.user.id):
+            await interaction.response.send_message(
+                "You are already registered on the Factorio server.",
+                ephemeral=True
+            )
+            return
 
         # Generate and store registration code
         code = self.generate_code()
@@ -121,70 +112,72 @@ class RegistrationCog(commands.Cog):
 
     async def process_registration(self, line):
         """Process registration commands from the game server"""
-        match = re.search(ACCESS_PATTERN, line)
-        if match:
+        event = decode(line)
+        if event:
+            # Newer softmods report /register as an "access" record; their "cmd" records are not needed here
+            code = str(event.get('code', '')).strip()
+            if event['t'] != 'access' or not event.get('p') or not code.isdigit():
+                return
+            name = event['p']
+        else:
+            match = re.search(ACCESS_PATTERN, line)
+            if not match:
+                return
             name, code = match.groups()
-            logger.debug(f"Received registration attempt: Name={name}, Code={code}")
-
-            if code in self.pending_registrations:
-                user_id = self.pending_registrations[code]
-                guild = self.bot.get_guild(int(self.server_id))
-                if guild:
-                    member = guild.get_member(user_id)
-                    if member:
-                        try:
-                            # Get the Factorio-User role
-                            user_role_id = self.config_manager.get('discord.factorio_user_id')
-                            if not user_role_id:
-                                logger.error("Factorio-User role ID not found in config")
-                                await member.send("Registration error: Role configuration is missing. Please contact an administrator.")
-                                return
-
-                            role = guild.get_role(int(user_role_id))
-                            if not role:
-                                logger.error(f"Could not find Factorio-User role with ID: {user_role_id}")
-                                await member.send("Registration error: Required role not found. Please contact an administrator.")
-                                return
-
-                            # Add role
-                            await member.add_roles(role)
-                            await self.bot.track_role_assignment(member, role)
-                            
-                            # Store registration
-                            self.store_registration(user_id, name)
-                            
-                            # Send success message
-                            await member.send(f"Thank you for registering, {name}! You have been assigned the Factorio-User role.")
-                            logger.info(f"Successfully registered user {user_id} as {name}")
-
-                        except discord.Forbidden:
-                            logger.error(f"Bot lacks permission to assign roles to {member.id}")
-                            await member.send("Registration error: I don't have permission to assign roles. Please contact an administrator.")
-                        except Exception as e:
-                            logger.error(f"Error during registration for {member.id}: {str(e)}")
-                            await member.send("An error occurred during registration. Please contact an administrator.")
-
-                        # Clean up registration data
-                        del self.pending_registrations[code]
-                        del self.registration_timestamps[code]
-                    else:
-                        logger.warning(f"Member {user_id} not found in the guild")
+        logger.debug(f"Received registration attempt: Name={name}, Code={code}")
+
+        if code in self.pending_registrations:
+            user_id = self.pending_registrations[code]
+            guild = self.bot.get_guild(int(self.server_id))
+            if guild:
+                member = guild.get_member(user_id)
+                if member:
+                    try:
+                        # Get the Factorio-User role
+                        user_role_id = self.config_manager.get('discord.factorio_user_id')
+                        if not user_role_id:
+                            logger.error("Factorio-User role ID not found in config")
+                            await member.send("Registration error: Role configuration is missing. Please contact an administrator.")
+                            return
+
+                        role = guild.get_role(int(user_role_id))
+                        if not role:
+                            logger.error(f"Could not find Factorio-User role with ID: {user_role_id}")
+                            await member.send("Registration error: Required role not found. Please contact an administrator.")
+                            return
+
+                        # Add role
+                        await member.add_roles(role)
+                        await self.bot.track_role_assignment(member, role)
+                        
+                        # Store registration
+                        self.store_registration(user_id, name)
+                        
+                        # Send success message
+                        await member.send(f"Thank you for registering, {name}! You have been assigned the Factorio-User role.")
+                        logger.info(f"Successfully registered user {user_id} as {name}")
+
+                    except discord.Forbidden:
+                        logger.error(f"Bot lacks permission to assign roles to {member.id}")
+                        await member.send("Registration error: I don't have permission to assign roles. Please contact an administrator.")
+                    except Exception as e:
+                        logger.error(f"Error during registration for {member.id}: {str(e)}")
+                        await member.send("An error occurred during registration. Please contact an administrator.")
+
+                    # Clean up registration data
+                    del self.pending_registrations[code]
+                    del self.registration_timestamps[code]
                 else:
-                    logger.warning(f"Guild not found")
+                    logger.warning(f"Member {user_id} not found in the guild")
             else:
-                logger.warning(f"Invalid registration code: {code}")
+                logger.warning(f"Guild not found")
+        else:
+            logger.warning(f"Invalid registration code: {code}")
 
     def store_registration(self, user_id, player_name):
-        """Store the registration in the registrations file"""
+        """Store the registration in the shared registration store"""
         try:
-            with open(self.registrations_file, "r") as file:
-                registrations = json.load(file)
-
-            registrations[str(user_id)] = player_name
-
-            with open(self.registrations_file, "w") as file:
-                json.dump(registrations, file, indent=4)
-
+            self.registration_store.register(user_id, player_name)
             logger.info(f"Stored registration for user {user_id} with player name '{player_name}'")
         except Exception as e:
             logger.error(f"Error storing registration: {str(e)}")
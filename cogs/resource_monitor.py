@@ -0,0 +1,150 @@
+import discord
+from discord.ext import commands, tasks
+import time
+import psutil
+from logger import setup_logger
+from resource_history import ResourceHistory, rates, slope_per_hour, sparkline, summary
+
+logger = setup_logger(__name__, 'logs/resource_monitor.log')
+
+DEFAULT_INTERVAL_SECONDS = 10
+DEFAULT_HISTORY_HOURS = 24
+DEFAULT_CPU_ALERT_PERCENT = 95
+DEFAULT_CPU_ALERT_MINUTES = 5
+DEFAULT_LEAK_MB_PER_HOUR = 256
+DEFAULT_LEAK_WINDOW_MINUTES = 60
+# A condition that stays true is reported again after this long
+ALERT_COOLDOWN_SECONDS = 3600
+# Share of a window that must hold samples before it is judged
+MIN_WINDOW_COVERAGE = 0.8
+
+class ResourceMonitorCog(commands.Cog):
+    """Samples the Factorio process into a ring buffer and alerts the admin channel on sustained trouble"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.config_manager = bot.config_manager
+        self.interval = self.config_manager.get('resource_monitor.interval_seconds', DEFAULT_INTERVAL_SECONDS)
+        history_hours = self.config_manager.get('resource_monitor.history_hours', DEFAULT_HISTORY_HOURS)
+        self.history = ResourceHistory(int(history_hours * 3600 / self.interval))
+        self.process = None
+        self.alerted_at = {}
+        self.sample.change_interval(seconds=self.interval)
+        self.sample.start()
+        logger.info(f"ResourceMonitorCog initialized ({self.history.capacity} samples every {self.interval}s)")
+
+    def cog_unload(self):
+        self.sample.cancel()
+        logger.info("ResourceMonitorCog unloaded")
+
+    def server_process(self):
+        """The running Factorio process, reusing the psutil handle so cpu_percent covers one interval"""
+        server_cog = self.bot.get_cog('ServerManagementCog')
+        pid = server_cog.server_pid if server_cog else None
+        if pid is None:
+            self.process = None
+            return None
+        if self.process is None or self.process.pid != pid:
+            self.process = psutil.Process(pid)
+            self.process.cpu_percent()  # The first reading is always 0.0
+            # A new server process starts a new history
+            self.history.clear()
+            self.alerted_at.clear()
+            logger.info(f"Sampling Factorio process {pid}")
+            return None
+        return self.process
+
+    def take_sample(self):
+        try:
+            process = self.server_process()
+            if process is None:
+                return False
+            with process.oneshot():
+                io = process.io_counters() if hasattr(process, 'io_counters') else None
+                self.history.append(
+                    time=time.time(),
+                    cpu_percent=process.cpu_percent(),
+                    rss=process.memory_info().rss,
+                    read_bytes=io.read_bytes if io else 0,
+                    write_bytes=io.write_bytes if io else 0,
+                    fds=process.num_fds() if hasattr(process, 'num_fds') else 0,
+                )
+            return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            self.process = None
+            return False
+
+    @tasks.loop(seconds=DEFAULT_INTERVAL_SECONDS)
+    async def sample(self):
+        try:
+            if self.take_sample():
+                await self.check_alerts()
+        except Exception as e:
+            logger.error(f"Error sampling server resources: {str(e)}")
+
+    @sample.before_loop
+    async def before_sample(self):
+        await self.bot.wait_until_ready()
+
+    def covered(self, window, seconds):
+        return len(window['time']) >= MIN_WINDOW_COVERAGE * seconds / self.interval
+
+    async def check_alerts(self):
+        cpu_minutes = self.config_manager.get('resource_monitor.cpu_alert_minutes', DEFAULT_CPU_ALERT_MINUTES)
+        cpu_threshold = self.config_manager.get('resource_monitor.cpu_alert_percent', DEFAULT_CPU_ALERT_PERCENT)
+        window = self.history.window(cpu_minutes * 60)
+        if self.covered(window, cpu_minutes * 60) and min(window['cpu_percent']) >= cpu_threshold:
+            await self.alert('cpu', "Sustained High CPU",
+                             f"The Factorio server has used at least {cpu_threshold}% CPU for {cpu_minutes} minutes "
+                             f"(average {summary(window['cpu_percent'])[1]:.0f}%). The game is likely running below 60 UPS.",
+                             f"`{sparkline(window['cpu_percent'], low=0)}`")
+
+        leak_minutes = self.config_manager.get('resource_monitor.memory_leak_window_minutes', DEFAULT_LEAK_WINDOW_MINUTES)
+        leak_threshold = self.config_manager.get('resource_monitor.memory_leak_mb_per_hour', DEFAULT_LEAK_MB_PER_HOUR)
+        window = self.history.window(leak_minutes * 60)
+        if self.covered(window, leak_minutes * 60):
+            growth = slope_per_hour(window['time'], window['rss']) / (1024 * 1024)
+            if growth >= leak_threshold:
+                await self.alert('memory', "Memory Growing Steadily",
+                                 f"Factorio's memory has grown by {growth:.0f} MB/hour over the last {leak_minutes} "
+                                 f"minutes and is now {window['rss'][-1] / (1024 * 1024):.0f} MB.",
+                                 f"`{sparkline(window['rss'])}`")
+
+    async def alert(self, kind, title, description, chart):
+        now = time.time()
+        if now - self.alerted_at.get(kind, 0) < ALERT_COOLDOWN_SECONDS:
+            return
+        self.alerted_at[kind] = now
+        logger.warning(f"Resource alert: {title} - {description}")
+        channel_id = self.config_manager.get('discord.factorio_admin_channel_id')
+        if not channel_id or not str(channel_id).isdigit():
+            logger.warning("No admin channel configured for resource alerts")
+            return
+        channel = self.bot.get_channel(int(channel_id))
+        if not channel:
+            logger.error(f"Could not find admin channel with ID: {channel_id}")
+            return
+        embed = discord.Embed(title=title, description=description, color=discord.Color.orange())
+        embed.add_field(name="Trend", value=chart, inline=False)
+        await channel.send(embed=embed)
+
+    def sparklines(self, seconds=3600, width=24):
+        """{'cpu'|'memory'|'io'|'fds': 'sparkline  summary'} over the last `seconds`, or {} without samples"""
+        window = self.history.window(seconds)
+        times = window['time']
+        if len(times) < 2:
+            return {}
+        _, cpu_mean, cpu_high = summary(window['cpu_percent'])
+        rss_mb = [rss / (1024 * 1024) for rss in window['rss']]
+        io_rates = [(read + write) / 1024 for read, write in
+                    zip(rates(times, window['read_bytes']), rates(times, window['write_bytes']))]
+        return {
+            'cpu': f"`{sparkline(window['cpu_percent'], width, low=0)}` avg {cpu_mean:.0f}% / max {cpu_high:.0f}%",
+            'memory': f"`{sparkline(rss_mb, width)}` {rss_mb[-1]:.0f} MB (min {min(rss_mb):.0f} / max {max(rss_mb):.0f})",
+            'io': f"`{sparkline(io_rates, width, low=0)}` avg {summary(io_rates)[1]:.0f} KiB/s",
+            'fds': f"`{sparkline(window['fds'], width)}` {window['fds'][-1]:.0f} open",
+        }
+
+async def setup(bot):
+    await bot.add_cog(ResourceMonitorCog(bot))
+    logger.info("ResourceMonitorCog added to bot")
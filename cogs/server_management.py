@@ -10,10 +10,12 @@ import datetime
 import asyncio
 from logger import setup_logger
 from config_manager import ConfigManager
+from log_rotation import DEFAULT_RETENTION_DAYS, DEFAULT_RETENTION_MB, archive_log, rotate_log
 
 logger = setup_logger(__name__, 'logs/server_management.log')
 
-SERVER_INFO_FILE = 'server_info.txt'
+# Longest accepted line of piped server output
+PIPE_LINE_LIMIT = 1024 * 1024
 
 def setsid():
     if sys.platform == 'win32':
@@ -36,28 +38,65 @@ class ServerManagementCog(commands.Cog):
         self.server_process = None
         self.server_command = None
         self.server_pid = None
+        self.tee_process = None
+        self.pipe_tasks = []
+        self.pipe_queue = None
+        self.state_store = bot.state_store
+        self.instrumentation = bot.instrumentation
+        # Kept between scrapes so cpu_percent() measures the interval since the previous one
+        self.metrics_process = None
         self.load_server_info()
+        self.instrumentation.add_collector(self.collect_metrics)
         logger.info("ServerManagementCog initialized")
 
+    def cog_unload(self):
+        self.instrumentation.remove_collector(self.collect_metrics)
+
+    def collect_metrics(self):
+        """Factorio process figures for the metrics endpoint"""
+        samples = [('log_dispatch_queue_depth', {}, self.pipe_queue.qsize() if self.pipe_queue else 0)]
+        try:
+            if self.server_pid is None:
+                raise psutil.NoSuchProcess(0)
+            if self.metrics_process is None or self.metrics_process.pid != self.server_pid:
+                self.metrics_process = psutil.Process(self.server_pid)
+            process = self.metrics_process
+            with process.oneshot():
+                memory = process.memory_info()
+                samples += [
+                    ('server_up', {}, 1),
+                    ('server_cpu_percent', {}, process.cpu_percent()),
+                    ('server_rss_bytes', {}, memory.rss),
+                    ('server_threads', {}, process.num_threads()),
+                    ('server_start_time_seconds', {}, process.create_time()),
+                ]
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            self.metrics_process = None
+            samples.append(('server_up', {}, 0))
+        return samples
+
     def load_server_info(self):
-        if os.path.exists(SERVER_INFO_FILE):
-            try:
-                with open(SERVER_INFO_FILE, 'r') as file:
-                    self.server_command = file.readline().strip()
-                    self.server_pid = int(file.readline().strip())
+        try:
+            server_info = self.state_store.get_server_info()
+            if server_info:
+                self.server_command, self.server_pid = server_info
                 logger.info(f"Loaded server info: PID {self.server_pid}")
-            except Exception as e:
-                logger.error(f"Error loading server info: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error loading server info: {str(e)}")
 
     def save_server_info(self, command, pid):
         try:
-            with open(SERVER_INFO_FILE, 'w') as file:
-                file.write(command + '\n')
-                file.write(str(pid) + '\n')
+            self.state_store.submit(self.state_store.set_server_info, command, pid)
             logger.info(f"Saved server info: PID {pid}")
         except Exception as e:
             logger.error(f"Error saving server info: {str(e)}")
 
+    def clear_server_info(self):
+        try:
+            self.state_store.submit(self.state_store.clear_server_info)
+        except Exception as e:
+            logger.error(f"Error clearing server info: {str(e)}")
+
     def is_server_running(self):
         if self.server_pid is None:
             return False
@@ -68,18 +107,94 @@ class ServerManagementCog(commands.Cog):
             logger.warning(f"No process found with PID {self.server_pid}")
             return False
 
-    def rename_verbose_log_file(self):
-        verbose_log_file = self.config_manager.get('factorio_server.verbose_log_file')
-        if os.path.exists(verbose_log_file):
-            try:
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                log_dir = os.path.dirname(verbose_log_file)
-                log_filename = os.path.basename(verbose_log_file)
-                renamed_log_file = os.path.join(log_dir, f"previous_{timestamp}_{log_filename}")
-                os.rename(verbose_log_file, renamed_log_file)
-                logger.info(f"Renamed {verbose_log_file} to {renamed_log_file}")
-            except Exception as e:
-                logger.error(f"Failed to rename verbose log file: {str(e)}")
+    def rename_verbose_log_file(self, verbose_log_file=None):
+        """Rotate verbose.log out of the way. Returns the rotated path, or None."""
+        if not verbose_log_file:
+            base_path = self.config_manager.get('factorio_server.install_location')
+            verbose_log_file = get_factorio_path(base_path, "logs/verbose.log")
+        try:
+            return rotate_log(verbose_log_file)
+        except Exception as e:
+            logger.error(f"Failed to rename verbose log file: {str(e)}")
+            return None
+
+    def archive_rotated_log(self, rotated_log_file, verbose_log_file):
+        """Compress a rotated log and apply retention in the background"""
+        max_age_days = self.config_manager.get('factorio_server.log_retention_days', DEFAULT_RETENTION_DAYS)
+        max_total_mb = self.config_manager.get('factorio_server.log_retention_mb', DEFAULT_RETENTION_MB)
+        asyncio.get_running_loop().run_in_executor(
+            None, archive_log, rotated_log_file, verbose_log_file, max_age_days, max_total_mb
+        )
+
+    async def start_piped_process(self, command, verbose_log_file):
+        """Start the server with its output teed into verbose.log and piped through the bot.
+
+        tee appends the output to verbose.log and forwards it to ReadLogCog,
+        so events are dispatched without re-reading the file. It runs in its
+        own session and, with -p, keeps writing the file once the bot's end of
+        the pipe closes, so the server survives a bot restart or crash and is
+        adopted from server_info.txt with the log tailed as usual.
+        """
+        readlog_cog = self.bot.get_cog('ReadLogCog')
+        if readlog_cog:
+            await readlog_cog.attach_pipe()
+        read_end, write_end = os.pipe()
+        try:
+            self.tee_process = await asyncio.create_subprocess_exec(
+                'tee', '-p', '-a', verbose_log_file, stdin=read_end, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL, start_new_session=True, limit=PIPE_LINE_LIMIT
+            )
+            self.server_process = subprocess.Popen(command, stdout=write_end, stderr=subprocess.STDOUT,
+                                                   start_new_session=True)
+        except Exception:
+            self.close_pipe(readlog_cog)
+            raise
+        finally:
+            # tee sees end of file once the server, the last holder of the write end, exits
+            os.close(read_end)
+            os.close(write_end)
+        queue = self.pipe_queue = asyncio.Queue()
+        self.pipe_tasks = [
+            asyncio.create_task(self.pump_server_output(self.tee_process, queue)),
+            asyncio.create_task(self.dispatch_server_output(readlog_cog, queue))
+        ]
+
+    async def pump_server_output(self, process, queue):
+        """Copy server output forwarded by tee into the dispatch queue until the server exits"""
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                queue.put_nowait(line)
+        except Exception as e:
+            logger.error(f"Error reading server output: {str(e)}")
+        finally:
+            queue.put_nowait(None)
+
+    async def dispatch_server_output(self, readlog_cog, queue):
+        """Hand queued output lines to ReadLogCog in batches, so a slow Discord never stalls the server"""
+        try:
+            while True:
+                batch = [await queue.get()]
+                while not queue.empty():
+                    batch.append(queue.get_nowait())
+                done = batch[-1] is None
+                lines = [line for line in batch if line and line.endswith(b'\n')]
+                if lines and readlog_cog:
+                    await readlog_cog.ingest_pipe_lines(lines)
+                if done:
+                    break
+        except Exception as e:
+            logger.error(f"Error dispatching server output: {str(e)}")
+        finally:
+            self.close_pipe(readlog_cog)
+
+    def close_pipe(self, readlog_cog):
+        self.pipe_queue = None
+        self.tee_process = None
+        if readlog_cog:
+            readlog_cog.detach_pipe()
 
     @app_commands.command(name='startserver', description='Start the Factorio server with optional configuration')
     @app_commands.default_permissions(administrator=True, moderate_members=True)
@@ -165,8 +280,24 @@ class ServerManagementCog(commands.Cog):
             else:
                 command.append('--start-server-load-latest')
 
-            verbose_log_file = open(verbose_log_file, 'w')
-            self.server_process = subprocess.Popen(command, stdout=verbose_log_file, stderr=subprocess.STDOUT, start_new_session=True)
+            # Apply mod updates prefetched by the background update check
+            mod_tracker = self.bot.get_cog('ModTrackerCog') if self.bot else None
+            if mod_tracker:
+                applied = await asyncio.get_running_loop().run_in_executor(None, mod_tracker.apply_staged_updates)
+                if applied:
+                    logger.info(f"Applied staged mod updates: {', '.join(applied)}")
+
+            # Start a fresh log; the tailer drains the rotated file before following the new one
+            rotated_log_file = self.rename_verbose_log_file(verbose_log_file)
+            if rotated_log_file:
+                self.archive_rotated_log(rotated_log_file, verbose_log_file)
+            if self.bot:
+                self.bot.server_facts.reset()
+            if self.config_manager.get('factorio_server.pipe_output', False):
+                await self.start_piped_process(command, verbose_log_file)
+            else:
+                verbose_log_file = open(verbose_log_file, 'a')
+                self.server_process = subprocess.Popen(command, stdout=verbose_log_file, stderr=subprocess.STDOUT, start_new_session=True)
             self.server_pid = self.server_process.pid
             self.server_command = ' '.join(command)
             self.save_server_info(self.server_command, self.server_pid)
@@ -183,6 +314,14 @@ class ServerManagementCog(commands.Cog):
             logger.error(f"Failed to start server: {str(e)}")
             return f"Failed to start server: {str(e)}"
 
+    async def wait_for_exit(self, process, timeout):
+        """Wait for the server to exit without blocking the event loop.
+
+        Factorio prints while saving on shutdown; with piped output,
+        pump_server_output must keep reading so tee never stalls on a full pipe.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, lambda: process.wait(timeout=timeout))
+
     async def stop_server(self):
         """Stop the Factorio server safely without affecting client instances"""
         if not self.is_server_running():
@@ -206,7 +345,7 @@ class ServerManagementCog(commands.Cog):
                 
                 try:
                     # Wait for main process to terminate
-                    process.wait(timeout=30)
+                    await self.wait_for_exit(process, timeout=30)
                 except psutil.TimeoutExpired:
                     logger.warning("Server didn't shutdown gracefully within timeout, forcing termination")
                     # Force kill the main server process
@@ -223,9 +362,8 @@ class ServerManagementCog(commands.Cog):
                 self.server_pid = None
                 self.server_command = None
                 
-                # Clean up server info file
-                if os.path.exists(SERVER_INFO_FILE):
-                    os.remove(SERVER_INFO_FILE)
+                # Clean up stored server info
+                self.clear_server_info()
                 
                 logger.info("Server stopped successfully")
                 
@@ -240,8 +378,7 @@ class ServerManagementCog(commands.Cog):
             logger.warning(f"Server process {self.server_pid} no longer exists")
             self.server_pid = None
             self.server_command = None
-            if os.path.exists(SERVER_INFO_FILE):
-                os.remove(SERVER_INFO_FILE)
+            self.clear_server_info()
             return "Server process no longer exists. Server info cleaned up."
             
         except psutil.AccessDenied as e:
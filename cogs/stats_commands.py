@@ -6,8 +6,12 @@ import json
 import traceback
 import re
 import asyncio
+import sys
 from logger import setup_logger
 from .stats_logger import StatsLogger
+from log_index import rotated_logs
+from stats_replay import (DEFAULT_CHUNK_BYTES, aggregate_chunk, get_ingest_cursor, merge_chunk, open_target,
+                          plan_chunks, set_ingest_cursor)
 
 logger = setup_logger(__name__, 'logs/stats_commands.log')
 
@@ -18,7 +22,7 @@ class StatsCog(commands.Cog):
             self.bot = bot
             self.config_manager = bot.config_manager
             self.parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            self.registrations_file = os.path.join(self.parent_dir, "registrations.json")
+            self.registration_store = bot.registration_store
             
             # Initial attempt to get StatsLogger
             self.stats_logger = self.bot.get_cog('StatsLogger')
@@ -29,6 +33,7 @@ class StatsCog(commands.Cog):
                 asyncio.create_task(self.ensure_cogs())
                 
             self.readlog_cog = None
+            self.replay_running = False
     
     async def ensure_cogs(self):
         """Ensure all required cogs are available"""
@@ -58,6 +63,7 @@ class StatsCog(commands.Cog):
                 self.readlog_cog.subscribe("ACT", self.process_stats_line)
                 self.readlog_cog.subscribe("CHAT", self.process_stats_line)
                 self.readlog_cog.subscribe("CHAT_STATS", self.process_statsme_command)
+                self.readlog_cog.add_checkpoint_listener(self.flush_stats)
                 logger.info("Successfully connected to ReadLogCog and subscribed to messages")
                 return True
             attempt += 1
@@ -92,7 +98,19 @@ class StatsCog(commands.Cog):
                     logger.error("StatsLogger not available")
                     return
                     
-            await self.stats_logger.process_line(line)
+            await self.stats_logger.process_line(line, self.readlog_cog.line_position if self.readlog_cog else None)
+
+    def flush_stats(self, reset=False):
+        """Commit buffered stats before ReadLogCog checkpoints its position"""
+        if self.stats_logger:
+            self.stats_logger.flush(reset)
+
+    def cog_unload(self):
+        if self.readlog_cog:
+            for message_type in ("STATS-E1", "STATS-D2", "ACT", "CHAT"):
+                self.readlog_cog.unsubscribe(message_type, self.process_stats_line)
+            self.readlog_cog.unsubscribe("CHAT_STATS", self.process_statsme_command)
+            self.readlog_cog.remove_checkpoint_listener(self.flush_stats)
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -106,16 +124,6 @@ class StatsCog(commands.Cog):
             
         logger.debug(f"Stats requested for user {member.name} (ID: {member.id})")
         player_name = await self.get_player_name(member.id)
-        
-        # Debug logging
-        registration_path = os.path.join(self.parent_dir, "registrations.json")
-        try:
-            with open(registration_path, "r") as file:
-                registrations = json.load(file)
-                logger.debug(f"Current registrations: {registrations}")
-        except Exception as e:
-            logger.error(f"Error reading registrations: {e}")
-            
         logger.debug(f"Found player name: {player_name}")
         await self.post_player_stats(player_name, interaction)
         logger.info(f"Stats command used for player: {player_name}")
@@ -340,47 +348,105 @@ class StatsCog(commands.Cog):
             )
         await interaction.response.send_message(embed=embed)
 
-    async def get_player_name(self, user_id):
-            """Get Factorio username from registrations file"""
-            try:
-                registration_path = os.path.join(self.parent_dir, "registrations.json")
-                logger.debug(f"Looking up user {user_id} in registrations file: {registration_path}")
-                
-                if not os.path.exists(registration_path):
-                    logger.error(f"Registrations file not found at: {registration_path}")
-                    return None
+    async def replay_stats(self):
+        """Rebuild the stats database from rotated logs and the current log, then swap it in.
 
-                with open(registration_path, "r") as file:
-                    registrations = json.load(file)
-                    
-                user_id_str = str(user_id)  # Convert to string since JSON keys are strings
-                player_name = registrations.get(user_id_str)
-                
-                logger.debug(f"Found registration for user {user_id}: {player_name}")
-                return player_name
+        The replay runs as stats_replay.py in its own interpreter, so its spawned
+        workers re-import that script rather than bot.py, against a work
+        database that is resumed if a previous run was interrupted. Lines the tailer handled
+        while it ran are counted at the end, right before the swap.
+        """
+        readlog_cog = self.readlog_cog
+        log_file = readlog_cog.log_file
+        inode = readlog_cog.log_inode
+        replay_end = readlog_cog.last_position
+        work_db = self.stats_logger.db_file + '.replay'
+        loop = asyncio.get_running_loop()
 
-            except json.JSONDecodeError:
-                logger.error(f"Invalid JSON in registrations file")
-                return None
-            except Exception as e:
-                logger.error(f"Error getting player name: {str(e)}")
-                logger.error(traceback.format_exc())
-                return None
+        if os.path.exists(work_db):
+            previous = await loop.run_in_executor(None, get_ingest_cursor, work_db)
+            if not previous or previous[0] != inode:
+                # The log was rotated since; its bytes would be counted again under the archive's name
+                for path in (work_db, work_db + '-wal', work_db + '-shm'):
+                    if os.path.exists(path):
+                        os.remove(path)
+        conn = open_target(work_db)
+        set_ingest_cursor(conn, inode, 0)
+        conn.close()
 
-    async def get_user_id_from_player_name(self, player_name):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(self.parent_dir, 'stats_replay.py'), '--json',
+            '--db', os.path.abspath(work_db), '--end', str(replay_end), *rotated_logs(log_file), log_file,
+            cwd=self.parent_dir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            error = stderr.decode(errors='replace').strip().splitlines()
+            raise RuntimeError(f"The replay exited with code {process.returncode}: {error[-1] if error else 'no output'}")
+        # The logger also writes to stdout; the result is the last line
+        result = json.loads(stdout.decode().strip().splitlines()[-1])
+        if readlog_cog.log_inode != inode:
+            raise RuntimeError("The log was rotated during the replay. Run the command again to resume.")
+
+        # No awaits from here on, so no line can reach the old database between catch-up and swap
+        latest = self.stats_logger.latest_position()
+        caught_up_to = max(replay_end, latest[1]) if latest and latest[0] == inode else replay_end
+        conn = open_target(work_db)
         try:
-            with open(self.registrations_file, "r") as file:
-                registrations = json.load(file)
-            for user_id, registered_name in registrations.items():
-                if registered_name == player_name:
-                    logger.debug(f"Retrieved user ID {user_id} for player name {player_name}")
-                    return int(user_id)
-            logger.warning(f"No user ID found for player name {player_name}")
-            return None
+            for chunk in plan_chunks(conn, [(log_file, caught_up_to)], DEFAULT_CHUNK_BYTES):
+                merge_chunk(conn, *aggregate_chunk(*chunk))
+            set_ingest_cursor(conn, inode, caught_up_to)
+        finally:
+            conn.close()
+        if not self.stats_logger.replace_database(work_db):
+            raise RuntimeError("Could not replace the stats database")
+        return result
+
+    @app_commands.command(name='replaystats', description='Rebuild player statistics from archived server logs')
+    @app_commands.default_permissions(administrator=True, moderate_members=True)
+    @app_commands.checks.has_permissions(administrator=True, moderate_members=True)
+    async def replaystats(self, interaction: discord.Interaction):
+        if not self.stats_logger or not self.readlog_cog:
+            await interaction.response.send_message("Stats tracking is not ready yet.", ephemeral=True)
+            return
+        if self.replay_running:
+            await interaction.response.send_message("A stats replay is already running.", ephemeral=True)
+            return
+
+        await interaction.response.defer()
+        self.replay_running = True
+        try:
+            result = await self.replay_stats()
+            embed = discord.Embed(color=discord.Color.green())
+            embed.add_field(
+                name="Success",
+                value=f"Player statistics were rebuilt from {result['lines']:,} log lines in {result['seconds']}s. "
+                      f"The previous database was kept as a backup.",
+                inline=False
+            )
+            logger.info(f"Stats replay requested by {interaction.user.name} finished: {result}")
         except Exception as e:
-            logger.error(f"Error getting user ID from player name: {str(e)}")
+            logger.error(f"Error replaying stats: {str(e)}")
             logger.error(traceback.format_exc())
-            return None
+            embed = discord.Embed(color=discord.Color.red())
+            embed.add_field(name="Error", value=f"An error occurred while replaying the logs: {str(e)}", inline=False)
+        finally:
+            self.replay_running = False
+        await interaction.followup.send(embed=embed)
+
+    async def get_player_name(self, user_id):
+            """Get Factorio username from the shared registration store"""
+            player_name = self.registration_store.get_player_name(user_id)
+            logger.debug(f"Found registration for user {user_id}: {player_name}")
+            return player_name
+
+    async def get_user_id_from_player_name(self, player_name):
+        user_id = self.registration_store.get_discord_id(player_name)
+        if user_id:
+            logger.debug(f"Retrieved user ID {user_id} for player name {player_name}")
+        else:
+            logger.warning(f"No user ID found for player name {player_name}")
+        return user_id
 
     @commands.Cog.listener()
     async def on_message(self, message):
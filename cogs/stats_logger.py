@@ -1,10 +1,13 @@
 import os
 import sqlite3
-import re
-import json
+import time
 import traceback
 from discord.ext import commands
 from logger import setup_logger
+from stats_parser import CREATE_TABLES_SQL, is_tree_entity, parse_stats_counts, upsert_sql
+
+# Commit buffered stat updates once this many are pending, even between tailer checkpoints
+STATS_BATCH_SIZE = 500
 
 # Ensure the logger is only set up once to prevent duplicate messages
 if 'stats_logger_instance' not in globals():
@@ -16,62 +19,25 @@ if 'stats_logger_instance' not in globals():
     stats_logger_instance = None  # Global instance to prevent reinitialization
 
 class StatsLogger(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, db_file=None):
         global stats_logger_instance
         if stats_logger_instance is not None:
             logger.warning("StatsLogger instance already exists. Reusing existing instance.")
             return  # Prevent multiple initializations
 
         self.bot = bot
+        self.instrumentation = bot.instrumentation
         self.parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.db_file = os.path.join(self.parent_dir, "player_stats.db")
-        self.stats_patterns = {
-            'stats_kill': r"\[STATS-E1\] \[([^]]+)] killed \[([^]]+)] with \[([^]]+)]",
-            'stats_death': r"\[STATS-D2\] \[([^]]+)] killed by \[([^]]+)] force \[enemy]",
-            'stats_place': r"\[ACT\] ([^[\]]+) placed",
-            'stats_mine': r"\[ACT\] ([^[\]]+) mined ([^[\]]+) \["  # Simplified mining pattern
-        }
-        # List of tree-related entities to ignore - expanded list
-        self.tree_entities = [
-            'tree-01', 'tree-02', 'tree-03', 'tree-04', 'tree-05',
-            'tree-06', 'tree-07', 'tree-08', 'tree-09', 'dead-',
-            'dry-hairy-tree', 'dry-tree', 'dead-dry-hairy-tree',
-            'dead-grey-trunk', 'dead-tree-desert', 'demolisher-',
-            '-tree-', 'volcanic'
-        ]
+        self.db_file = db_file or os.path.join(self.parent_dir, "player_stats.db")
         
+        self.conn = None
+        self.pending = []
+        self.cursor = None  # (inode, offset) of the last log line applied
+        self.pending_position = None
+
         # Initialize the database
         try:
-            conn = sqlite3.connect(self.db_file)
-            c = conn.cursor()
-            
-            logger.debug("Creating database tables if they do not exist")
-            c.execute("""CREATE TABLE IF NOT EXISTS player_stats
-                        (player_name TEXT,
-                         action TEXT,
-                         unit TEXT,
-                         weapon TEXT,
-                         count INTEGER DEFAULT 1,
-                         UNIQUE(player_name, action, unit, weapon))""")
-            
-            c.execute("""CREATE TABLE IF NOT EXISTS player_deaths
-                        (player_name TEXT,
-                         killed_by TEXT,
-                         count INTEGER DEFAULT 1,
-                         UNIQUE(player_name, killed_by))""")
-            
-            c.execute("""CREATE TABLE IF NOT EXISTS player_placed
-                        (player_name TEXT UNIQUE,
-                         count INTEGER DEFAULT 1)""")
-            
-            c.execute("""CREATE TABLE IF NOT EXISTS player_mined
-                        (player_name TEXT,
-                         item_type TEXT,
-                         count INTEGER DEFAULT 1,
-                         UNIQUE(player_name, item_type))""")
-            
-            conn.commit()
-            conn.close()
+            self.open_database()
             logger.info(f"Database initialized at {self.db_file}")
         except Exception as e:
             logger.error(f"Error creating database: {str(e)}")
@@ -80,123 +46,114 @@ class StatsLogger(commands.Cog):
         logger.info("StatsLogger initialized")
         stats_logger_instance = self
 
-    def is_tree_entity(self, unit):
-        """Check if an entity is tree-related"""
-        return any(tree_type in unit for tree_type in self.tree_entities)
+    def open_database(self):
+        """Open the stats database, creating tables as needed, and load the ingest cursor"""
+        self.conn = sqlite3.connect(self.db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        c = self.conn.cursor()
+
+        logger.debug("Creating database tables if they do not exist")
+        for create_table in CREATE_TABLES_SQL:
+            c.execute(create_table)
+        self.conn.commit()
+        row = c.execute("SELECT inode, position FROM ingest_cursor WHERE log_name = 'verbose'").fetchone()
+        self.cursor = tuple(row) if row else None
+
+    def close_database(self):
+        if self.conn:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    def cog_unload(self):
+        self.close_database()
+
+    def already_applied(self, position):
+        """True if the line ending at position (inode, offset) was committed before"""
+        if position is None or self.cursor is None:
+            return False
+        return position[0] == self.cursor[0] and position[1] <= self.cursor[1]
+
+    def flush(self, reset=False):
+        """Commit buffered updates together with the ingest cursor.
 
-    async def process_line(self, line):
-        """Process a log line for statistics"""
+        Registered as a ReadLogCog checkpoint listener; reset forgets the
+        cursor because offsets in the truncated log start over.
+        """
+        if not self.conn:
+            return
+        started = time.perf_counter()
         try:
-            logger.debug(f"Processing line: {line}")
-            
-            # Process mining
-            mine_match = re.search(self.stats_patterns['stats_mine'], line)
-            if mine_match:
-                player_name, item_type = mine_match.groups()
-                logger.info(f"Mine match found - Player: {player_name}, Item: {item_type}")
-                self.update_mined_database(player_name, item_type)
-                return
+            with self.conn:
+                for sql, params in self.pending:
+                    self.conn.execute(sql, params)
+                if self.pending_position:
+                    self.conn.execute("""INSERT INTO ingest_cursor (log_name, inode, position) VALUES ('verbose', ?, ?)
+                                        ON CONFLICT(log_name) DO UPDATE SET inode = excluded.inode, position = excluded.position""",
+                                      self.pending_position)
+                    self.cursor = self.pending_position
+                if reset:
+                    self.conn.execute("DELETE FROM ingest_cursor WHERE log_name = 'verbose'")
+                    self.cursor = None
+            if self.pending:
+                self.instrumentation.observe('stats_commit_seconds', time.perf_counter() - started)
+                self.instrumentation.inc('stats_updates_total', len(self.pending))
+                self.instrumentation.inc('stats_commits_total')
+                logger.debug(f"Committed {len(self.pending)} stat updates")
+        except Exception as e:
+            logger.error(f"Error committing stat updates: {str(e)}")
+            logger.error(traceback.format_exc())
+        self.pending = []
+        self.pending_position = None
 
-            # Process kills - with tree filtering
-            kill_match = re.search(self.stats_patterns['stats_kill'], line)
-            if kill_match:
-                player_name, unit, weapon = kill_match.groups()
-                # Skip if the killed entity is a tree
-                if not self.is_tree_entity(unit):
-                    logger.debug(f"Kill match found - Player: {player_name}, Unit: {unit}, Weapon: {weapon}")
-                    self.update_database(player_name, "kill", unit, weapon)
-                else:
-                    logger.debug(f"Skipping tree entity: {unit}")
-                return
+    def latest_position(self):
+        """(inode, offset) of the last log line handed to process_line, committed or not"""
+        return self.pending_position or self.cursor
 
-            death_match = re.search(self.stats_patterns['stats_death'], line)
-            if death_match:
-                player_name, killed_by = death_match.groups()
-                logger.debug(f"Death match found - Player: {player_name}, Killed By: {killed_by}")
-                self.update_deaths_database(player_name, killed_by)
-                return
+    def queue_update(self, sql, params):
+        self.pending.append((sql, params))
+        if len(self.pending) >= STATS_BATCH_SIZE:
+            self.flush()
 
-            place_match = re.search(self.stats_patterns['stats_place'], line)
-            if place_match:
-                player_name = place_match.group(1)
-                logger.debug(f"Place match found - Player: {player_name}")
-                self.update_placed_database(player_name)
-                return
+    def is_tree_entity(self, unit):
+        """Check if an entity is tree-related"""
+        return is_tree_entity(unit)
 
-        except Exception as e:
-            logger.error(f"Error processing stats line: {str(e)}")
-            logger.error(traceback.format_exc())
+    async def process_line(self, line, position=None):
+        """Process a log line for statistics.
 
-    def update_database(self, player_name, action, unit, weapon):
+        position is the (inode, offset) where the line ends in the verbose
+        log; lines at or before the committed cursor are skipped, so lines
+        re-read after a restart are not counted twice.
+        """
         try:
-            conn = sqlite3.connect(self.db_file)
-            c = conn.cursor()
-            logger.debug(f"Updating database for player {player_name} - Action: {action}, Unit: {unit}, Weapon: {weapon}")
-            c.execute("""INSERT INTO player_stats (player_name, action, unit, weapon)
-                        VALUES (?, ?, ?, ?)
-                        ON CONFLICT(player_name, action, unit, weapon)
-                        DO UPDATE SET count = count + 1""",
-                     (player_name, action, unit, weapon))
-            conn.commit()
-            conn.close()
-            logger.info(f"Database updated for player {player_name} - Action: {action}, Unit: {unit}, Weapon: {weapon}")
-        except Exception as e:
-            logger.error(f"Error updating database: {str(e)}")
-            logger.error(traceback.format_exc())
+            if self.already_applied(position):
+                logger.debug(f"Skipping already counted line: {line}")
+                return
+            if position is not None:
+                self.pending_position = position
+            logger.debug(f"Processing line: {line}")
 
-    def update_deaths_database(self, player_name, killed_by):
-        try:
-            conn = sqlite3.connect(self.db_file)
-            c = conn.cursor()
-            logger.debug(f"Updating deaths database for player {player_name} - Killed By: {killed_by}")
-            c.execute("""INSERT INTO player_deaths (player_name, killed_by)
-                        VALUES (?, ?)
-                        ON CONFLICT(player_name, killed_by)
-                        DO UPDATE SET count = count + 1""",
-                     (player_name, killed_by))
-            conn.commit()
-            conn.close()
-            logger.info(f"Deaths database updated for player {player_name} - Killed By: {killed_by}")
-        except Exception as e:
-            logger.error(f"Error updating deaths database: {str(e)}")
-            logger.error(traceback.format_exc())
+            for table, key, count in parse_stats_counts(line):
+                self.update_counter(table, key, count)
 
-    def update_placed_database(self, player_name):
-        try:
-            conn = sqlite3.connect(self.db_file)
-            c = conn.cursor()
-            logger.debug(f"Updating placed database for player {player_name}")
-            c.execute("""INSERT INTO player_placed (player_name)
-                        VALUES (?)
-                        ON CONFLICT(player_name)
-                        DO UPDATE SET count = count + 1""",
-                     (player_name,))
-            conn.commit()
-            conn.close()
-            logger.info(f"Placed database updated for player {player_name}")
         except Exception as e:
-            logger.error(f"Error updating placed database: {str(e)}")
+            logger.error(f"Error processing stats line: {str(e)}")
             logger.error(traceback.format_exc())
 
-    def update_mined_database(self, player_name, item_type):
+    def update_counter(self, table, key, count=1):
+        """Queue a +count on one counter row; see stats_parser.STATS_TABLES for the key columns"""
         try:
-            conn = sqlite3.connect(self.db_file)
-            c = conn.cursor()
-            logger.info(f"Updating mined database for player {player_name} - Item: {item_type}")
-            c.execute("""INSERT INTO player_mined (player_name, item_type)
-                        VALUES (?, ?)
-                        ON CONFLICT(player_name, item_type)
-                        DO UPDATE SET count = count + 1""",
-                     (player_name, item_type))
-            conn.commit()
-            conn.close()
-            logger.info(f"Mined database updated successfully for player {player_name} - Item: {item_type}")
+            self.queue_update(upsert_sql(table), tuple(key) + (count,))
+            logger.debug(f"Queued {table} update: {key} +{count}")
         except Exception as e:
-            logger.error(f"Error updating mined database: {str(e)}")
+            logger.error(f"Error updating {table}: {str(e)}")
             logger.error(traceback.format_exc())
 
     async def get_player_stats(self, player_name):
         try:
+            self.flush()
             conn = sqlite3.connect(self.db_file)
             c = conn.cursor()
             
@@ -241,41 +198,14 @@ class StatsLogger(commands.Cog):
     def wipe_database(self):
         try:
             bak_file = os.path.join(self.parent_dir, "player_stats.db.bak")
+            self.close_database()
             if os.path.isfile(self.db_file):
                 if os.path.isfile(bak_file):
                     os.remove(bak_file)
                 os.rename(self.db_file, bak_file)
             
             # Recreate the database
-            conn = sqlite3.connect(self.db_file)
-            c = conn.cursor()
-            
-            c.execute("""CREATE TABLE IF NOT EXISTS player_stats
-                        (player_name TEXT,
-                         action TEXT,
-                         unit TEXT,
-                         weapon TEXT,
-                         count INTEGER DEFAULT 1,
-                         UNIQUE(player_name, action, unit, weapon))""")
-            
-            c.execute("""CREATE TABLE IF NOT EXISTS player_deaths
-                        (player_name TEXT,
-                         killed_by TEXT,
-                         count INTEGER DEFAULT 1,
-                         UNIQUE(player_name, killed_by))""")
-            
-            c.execute("""CREATE TABLE IF NOT EXISTS player_placed
-                        (player_name TEXT UNIQUE,
-                         count INTEGER DEFAULT 1)""")
-            
-            c.execute("""CREATE TABLE IF NOT EXISTS player_mined
-                        (player_name TEXT,
-                         item_type TEXT,
-                         count INTEGER DEFAULT 1,
-                         UNIQUE(player_name, item_type))""")
-            
-            conn.commit()
-            conn.close()
+            self.open_database()
             
             logger.warning("Player statistics data wiped")
             return True
@@ -284,6 +214,26 @@ class StatsLogger(commands.Cog):
             logger.error(traceback.format_exc())
             return False
 
+    def replace_database(self, new_db_file):
+        """Swap in a rebuilt stats database, keeping the current one as the .bak"""
+        try:
+            bak_file = os.path.join(self.parent_dir, "player_stats.db.bak")
+            self.close_database()
+            if os.path.isfile(self.db_file):
+                os.replace(self.db_file, bak_file)
+            os.replace(new_db_file, self.db_file)
+            self.pending = []
+            self.pending_position = None
+            self.open_database()
+            logger.warning(f"Player statistics replaced with {new_db_file}")
+            return True
+        except Exception as e:
+            logger.error(f"Error replacing stats database: {str(e)}")
+            logger.error(traceback.format_exc())
+            if not self.conn:
+                self.open_database()
+            return False
+
 async def setup(bot):
     global stats_logger_instance
     if stats_logger_instance is None:
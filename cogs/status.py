@@ -1,8 +1,8 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import re
-import os
+import datetime
+import psutil
 from logger import setup_logger
 from config_manager import ConfigManager
 
@@ -12,66 +12,75 @@ class StatusCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_manager = bot.config_manager
-        # Get base path and construct log file path
-        base_path = self.config_manager.get('factorio_server.install_location')
-        self.server_log_file = os.path.join(base_path, "factorio-current.log")
+        self.server_facts = bot.server_facts
+        self.instrumentation = bot.instrumentation
+        self.instrumentation.add_collector(self.collect_metrics)
         logger.info("StatusCog initialized")
 
+    def cog_unload(self):
+        self.instrumentation.remove_collector(self.collect_metrics)
+
+    def collect_metrics(self):
+        return [('players_online', {}, self.get_player_count())]
+
+    def get_player_count(self):
+        """Current player count from the latest [ONLINE2] snapshot, or the tailer's join/leave set"""
+        online_cog = self.bot.get_cog('OnlineCog')
+        if online_cog and online_cog.snapshot:
+            return online_cog.snapshot.count
+        readlog_cog = self.bot.get_cog('ReadLogCog')
+        if readlog_cog:
+            return len(readlog_cog.connected_players)
+        return None
+
+    def get_uptime(self, pid):
+        try:
+            started = datetime.datetime.fromtimestamp(psutil.Process(pid).create_time())
+            return str(datetime.datetime.now() - started).split('.')[0]
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return "Unknown"
+
     @app_commands.command(name='serverstatus', description='Get the current status of the Factorio server')
     async def serverstatus(self, interaction: discord.Interaction):
         """Get the current status of the Factorio server."""
-        await interaction.response.defer()
         logger.info(f"Server status requested by {interaction.user.name}")
 
         server_management_cog = self.bot.get_cog('ServerManagementCog')
         if server_management_cog is None:
             logger.error("ServerManagementCog not found")
-            await interaction.followup.send("Unable to get server status. ServerManagementCog not found.")
+            await interaction.response.send_message("Unable to get server status. ServerManagementCog not found.")
             return
 
         server_status = "Online" if server_management_cog.is_server_running() else "Offline"
-        
+        facts = self.server_facts
+
         if server_status == "Offline":
             embed = discord.Embed(title="Factorio Server Status", description="Server is currently offline.", color=discord.Color.red())
             logger.info("Server status: Offline")
+        elif facts.shutting_down:
+            embed = discord.Embed(title="Factorio Server Status", description="Server is shutting down.", color=discord.Color.orange())
+            logger.info("Server status: Shutting down")
         else:
-            try:
-                with open(self.server_log_file, 'r') as log_file:
-                    log_content = log_file.read()
-
-                if "Goodbye" in log_content:
-                    embed = discord.Embed(title="Factorio Server Status", description="Server is shutting down.", color=discord.Color.orange())
-                    logger.info("Server status: Shutting down")
-                else:
-                    save_file_match = re.search(r'Loading map (.+?\.zip)', log_content)
-                    save_file = save_file_match.group(1) if save_file_match else "Unknown"
-
-                    port_match = re.search(r'Hosting game at IP ADDR:\({.+?:(\d+)}\)', log_content)
-                    port = port_match.group(1) if port_match else "Unknown"
-
-                    ip_match = re.search(r'Own address is IP ADDR:\({(.+?:\d+)}\)', log_content)
-                    ip_address = ip_match.group(1) if ip_match else "Unknown"
-
-                    version_match = re.search(r'Factorio (\d+\.\d+\.\d+)', log_content)
-                    factorio_version = version_match.group(1) if version_match else "Unknown"
-
-                    base_mod_match = re.search(r'Loading mod base (\d+\.\d+\.\d+)', log_content)
-                    base_mod_version = base_mod_match.group(1) if base_mod_match else "Unknown"
+            player_count = self.get_player_count()
+            embed = discord.Embed(title="Factorio Server Status", color=discord.Color.green())
+            embed.add_field(name="Status", value=server_status, inline=False)
+            embed.add_field(name="Save File", value=facts.save_file or "Unknown", inline=False)
+            embed.add_field(name="Port", value=facts.port or "Unknown", inline=False)
+            embed.add_field(name="IP Address", value=facts.ip_address or "Unknown", inline=False)
+            embed.add_field(name="Factorio Version", value=facts.factorio_version or "Unknown", inline=False)
+            embed.add_field(name="Base Mod Version", value=facts.base_mod_version or "Unknown", inline=False)
+            embed.add_field(name="Uptime", value=self.get_uptime(server_management_cog.server_pid), inline=True)
+            embed.add_field(name="Players Online", value=str(player_count) if player_count is not None else "Unknown", inline=True)
+            embed.add_field(name="UPS", value=f"{facts.ups:.1f}" if facts.ups is not None else "Unavailable", inline=True)
+            monitor_cog = self.bot.get_cog('ResourceMonitorCog')
+            sparklines = monitor_cog.sparklines() if monitor_cog else {}
+            if sparklines:
+                embed.add_field(name="CPU / Memory (last hour)", value=f"{sparklines['cpu']}\n{sparklines['memory']}",
+                                inline=False)
+            logger.info(f"Server status: Online (Port: {facts.port}, IP: {facts.ip_address}, Version: {facts.factorio_version})")
 
-                    embed = discord.Embed(title="Factorio Server Status", color=discord.Color.green())
-                    embed.add_field(name="Status", value=server_status, inline=False)
-                    embed.add_field(name="Save File", value=save_file, inline=False)
-                    embed.add_field(name="Port", value=port, inline=False)
-                    embed.add_field(name="IP Address", value=ip_address, inline=False)
-                    embed.add_field(name="Factorio Version", value=factorio_version, inline=False)
-                    embed.add_field(name="Base Mod Version", value=base_mod_version, inline=False)
-                    logger.info(f"Server status: Online (Port: {port}, IP: {ip_address}, Version: {factorio_version})")
-            except Exception as e:
-                logger.error(f"Error reading server log file: {str(e)}")
-                embed = discord.Embed(title="Factorio Server Status", description="Error reading server status.", color=discord.Color.red())
-        
-        await interaction.followup.send(embed=embed)
+        await interaction.response.send_message(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(StatusCog(bot))
-    logger.info("StatusCog added to bot")
\ No newline at end of file
+    logger.info("StatusCog added to bot")
@@ -6,6 +6,7 @@ import os
 import tarfile
 import asyncio
 import re
+import itertools
 from datetime import datetime
 from factorio_rcon import RCONClient
 from logger import setup_logger
@@ -13,6 +14,9 @@ from config_manager import ConfigManager
 
 logger = setup_logger(__name__, 'logs/update.log')
 
+# Lines read from the launch line when looking for the server version
+VERSION_SCAN_LINES = 200
+
 class UpdateCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -38,7 +42,8 @@ class UpdateCog(commands.Cog):
     async def connect_rcon(self):
         try:
             self.rcon_client = RCONClient(self.rcon_host, self.rcon_port, self.rcon_password)
-            await self.bot.loop.run_in_executor(None, self.rcon_client.connect)
+            with self.bot.instrumentation.rcon('update', 'connect'):
+                await self.bot.loop.run_in_executor(None, self.rcon_client.connect)
             logger.info("RCON client connected successfully.")
             self.reconnect_attempts = 0  # Reset attempts on successful connection
             return True
@@ -86,8 +91,13 @@ class UpdateCog(commands.Cog):
                 logger.warning("Server log file not found")
                 return "Version Unknown (Log not found)"
                 
-            with open(log_file, 'r') as f:
-                for line in f:
+            # The version is on the launch line; the tailer's log index knows where that is
+            readlog_cog = self.bot.get_cog('ReadLogCog')
+            log_index = readlog_cog.log_index if readlog_cog else None
+            start = log_index.launch_offset if log_index and log_index.launch_offset is not None else 0
+            with open(log_file, 'r', errors='replace') as f:
+                f.seek(start)
+                for line in itertools.islice(f, VERSION_SCAN_LINES):
                     match = re.search(r'Factorio (\d+\.\d+\.\d+) \(build (\d+)', line)
                     if match:
                         version, build = match.groups()
@@ -174,7 +184,8 @@ class UpdateCog(commands.Cog):
                 if not self.rcon_client:
                     await self.connect_rcon()
                 try:
-                    save_response = await self.bot.loop.run_in_executor(None, self.rcon_client.send_command, "/server-save")
+                    with self.bot.instrumentation.rcon('update'):
+                        save_response = await self.bot.loop.run_in_executor(None, self.rcon_client.send_command, "/server-save")
                     break
                 except Exception as e:
                     logger.error(f"Error sending RCON command (Attempt {attempt + 1}): {str(e)}")
@@ -0,0 +1,141 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import asyncio
+import time
+from logger import setup_logger
+from resource_history import sparkline
+from ups_tracker import HEARTBEAT_TICKS, TICKS_PER_SECOND, UpsTracker
+
+logger = setup_logger(__name__, 'logs/ups.log')
+
+DEFAULT_HISTORY_HOURS = 24
+DEFAULT_ALERT_BELOW = 50
+DEFAULT_ALERT_MINUTES = 5
+# A condition that stays true is reported again after this long
+ALERT_COOLDOWN_SECONDS = 3600
+# Share of a window that must hold samples before it is judged
+MIN_WINDOW_COVERAGE = 0.8
+# (label, seconds) rows shown by /ups
+UPS_PERIODS = [("Last 10 minutes", 600), ("Last hour", 3600), ("Last 24 hours", 86400)]
+
+class UpsCog(commands.Cog):
+    """Measures game UPS from softmod heartbeats, alerts the admin channel when it stays low and reports it via /ups"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.config_manager = bot.config_manager
+        self.server_facts = bot.server_facts
+        self.instrumentation = bot.instrumentation
+        history_hours = self.config_manager.get('ups_monitor.history_hours', DEFAULT_HISTORY_HOURS)
+        # One sample per heartbeat, at most every HEARTBEAT_TICKS at full speed
+        capacity = int(history_hours * 3600 * TICKS_PER_SECOND / HEARTBEAT_TICKS)
+        self.tracker = UpsTracker(capacity)
+        self.readlog_cog = None
+        self.alerted_at = 0
+        self.instrumentation.add_collector(self.collect_metrics)
+        logger.info(f"UpsCog initialized ({capacity} samples)")
+
+    def cog_unload(self):
+        self.instrumentation.remove_collector(self.collect_metrics)
+        if self.readlog_cog:
+            self.readlog_cog.unsubscribe("HEARTBEAT", self.on_heartbeat)
+        logger.info("UpsCog unloaded")
+
+    async def ensure_readlog_cog(self):
+        """Ensure connection to ReadLogCog"""
+        max_attempts = 5
+        attempt = 0
+        while attempt < max_attempts:
+            self.readlog_cog = self.bot.get_cog('ReadLogCog')
+            if self.readlog_cog:
+                self.readlog_cog.subscribe("HEARTBEAT", self.on_heartbeat)
+                logger.info("Successfully connected to ReadLogCog.")
+                return True
+            attempt += 1
+            logger.warning(f"ReadLogCog not found (Attempt {attempt}/{max_attempts}). Retrying in 2 seconds...")
+            await asyncio.sleep(2)
+
+        logger.error("ReadLogCog not found. UPS monitoring will not work.")
+        return False
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.ensure_readlog_cog()
+        logger.info("UpsCog is ready.")
+
+    def collect_metrics(self):
+        last_beat_at = self.tracker.last_beat_at
+        return [
+            ('game_ups', {}, self.tracker.latest()),
+            ('game_heartbeat_age_seconds', {}, time.time() - last_beat_at if last_beat_at else None),
+        ]
+
+    async def on_heartbeat(self, line):
+        ups = self.tracker.feed(line)
+        if ups is None:
+            return
+        self.server_facts.ups = ups
+        self.server_facts.ups_updated_at = time.time()
+        await self.check_alert()
+
+    async def check_alert(self):
+        minutes = self.config_manager.get('ups_monitor.alert_minutes', DEFAULT_ALERT_MINUTES)
+        threshold = self.config_manager.get('ups_monitor.alert_below', DEFAULT_ALERT_BELOW)
+        seconds = minutes * 60
+        now = time.time()
+        window = self.tracker.history.window(seconds, now)
+        times = window['time']
+        if len(times) < 2 or times[0] > now - MIN_WINDOW_COVERAGE * seconds or max(window['ups']) >= threshold:
+            return
+        if now - self.alerted_at < ALERT_COOLDOWN_SECONDS:
+            return
+        self.alerted_at = now
+        stats = self.tracker.stats(seconds, now)
+        description = (f"The game has run below {threshold} UPS for {minutes} minutes "
+                       f"(median {stats['p50']:.1f}, low {stats['min']:.1f}, target {self.tracker.target:.0f}).")
+        logger.warning(f"UPS alert: {description}")
+        channel_id = self.config_manager.get('discord.factorio_admin_channel_id')
+        if not channel_id or not str(channel_id).isdigit():
+            logger.warning("No admin channel configured for UPS alerts")
+            return
+        channel = self.bot.get_channel(int(channel_id))
+        if not channel:
+            logger.error(f"Could not find admin channel with ID: {channel_id}")
+            return
+        embed = discord.Embed(title="Server Running Slow", description=description, color=discord.Color.orange())
+        embed.add_field(name="Trend", value=f"`{sparkline(window['ups'], low=0, high=self.tracker.target)}`",
+                        inline=False)
+        await channel.send(embed=embed)
+
+    @app_commands.command(name="ups", description="Show the game's updates per second and recent history")
+    async def ups(self, interaction: discord.Interaction):
+        current = self.tracker.latest()
+        if current is None:
+            await interaction.response.send_message(
+                "No UPS readings yet. The softmod heartbeat is needed; it arrives every few seconds while the game runs.",
+                ephemeral=True)
+            return
+
+        target = self.tracker.target
+        embed = discord.Embed(title="Server UPS", color=discord.Color.green() if current >= target * 0.95
+                              else discord.Color.orange())
+        embed.add_field(name="Current", value=f"{current:.1f} / {target:.0f}", inline=True)
+        age = time.time() - self.tracker.last_beat_at
+        embed.add_field(name="Last Heartbeat", value=f"{age:.0f}s ago", inline=True)
+        for label, seconds in UPS_PERIODS:
+            stats = self.tracker.stats(seconds)
+            if not stats:
+                continue
+            values = self.tracker.history.window(seconds)['ups']
+            embed.add_field(name=label,
+                            value=f"`{sparkline(values, low=0, high=target)}`\n"
+                                  f"median {stats['p50']:.1f} | p5 {stats['p5']:.1f} | p1 {stats['p1']:.1f} | "
+                                  f"min {stats['min']:.1f}",
+                            inline=False)
+        await interaction.response.send_message(embed=embed)
+        logger.info(f"UPS report requested by {interaction.user.name}")
+
+async def setup(bot):
+    await bot.add_cog(UpsCog(bot))
+    logger.info("UpsCog added to bot")
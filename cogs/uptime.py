@@ -35,6 +35,13 @@ class UptimeCog(commands.Cog):
                 embed = discord.Embed(title="Server Uptime", color=discord.Color.blue())
                 embed.add_field(name="PID", value=str(pid), inline=False)
                 embed.add_field(name="Uptime", value=str(uptime), inline=False)
+                monitor_cog = self.bot.get_cog('ResourceMonitorCog')
+                sparklines = monitor_cog.sparklines() if monitor_cog else {}
+                if sparklines:
+                    embed.add_field(name="CPU (last hour)", value=sparklines['cpu'], inline=False)
+                    embed.add_field(name="Memory (last hour)", value=sparklines['memory'], inline=False)
+                    embed.add_field(name="Disk IO (last hour)", value=sparklines['io'], inline=False)
+                    embed.add_field(name="Open Files (last hour)", value=sparklines['fds'], inline=False)
 
                 await interaction.response.send_message(embed=embed)
                 logger.info(f"Server uptime reported: PID {pid}, Uptime {uptime}")
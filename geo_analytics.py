@@ -0,0 +1,78 @@
+import datetime
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/geo_analytics.log')
+
+def utc_bucket(timestamp: float) -> Tuple[str, int]:
+    """(UTC day, UTC hour) bucket of an epoch timestamp."""
+    moment = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+    return moment.strftime("%Y-%m-%d"), moment.hour
+
+class GeoAnalytics:
+    """Join counts and unique players per country/region in daily, hourly buckets.
+
+    Aggregates are updated incrementally as players join and persisted to the
+    state store; queries scan only the bucketed aggregates, never the logs.
+    Days and hours are UTC so restart windows can be compared across regions.
+    """
+
+    def __init__(self, state_store):
+        self.state_store = state_store
+        self.join_counts: Dict[Tuple[str, int, str, str], int] = {}
+        self.players: Dict[Tuple[str, str, str], Set[str]] = {}
+        self.load()
+
+    def load(self):
+        try:
+            self.join_counts = self.state_store.load_geo_join_counts()
+            self.players = {}
+            for day, country, region, player_name in self.state_store.load_geo_players():
+                self.players.setdefault((day, country, region), set()).add(player_name)
+            logger.info(f"Loaded geography for {len({key[0] for key in self.join_counts})} days")
+        except Exception as e:
+            logger.error(f"Error loading geography aggregates: {str(e)}")
+
+    def record_join(self, player_name: str, country: str, region: str, timestamp: float):
+        day, hour = utc_bucket(timestamp)
+        key = (day, hour, country, region)
+        self.join_counts[key] = self.join_counts.get(key, 0) + 1
+        self.players.setdefault((day, country, region), set()).add(player_name)
+        self.state_store.submit(self.state_store.record_geo_join, day, hour, country, region, player_name)
+
+    def summary(self, days: Optional[int] = None) -> dict:
+        """Aggregate the last `days` UTC days (all history if None).
+
+        Returns joins and unique players per country and per (country, region),
+        plus joins per UTC hour of day.
+        """
+        cutoff = utc_bucket(time.time() - (days - 1) * 86400)[0] if days else ''
+        country_joins: Counter = Counter()
+        region_joins: Counter = Counter()
+        hour_joins: Counter = Counter()
+        for (day, hour, country, region), joins in self.join_counts.items():
+            if day >= cutoff:
+                country_joins[country] += joins
+                region_joins[(country, region)] += joins
+                hour_joins[hour] += joins
+        country_players: Dict[str, Set[str]] = {}
+        region_players: Dict[Tuple[str, str], Set[str]] = {}
+        for (day, country, region), names in self.players.items():
+            if day >= cutoff:
+                country_players.setdefault(country, set()).update(names)
+                region_players.setdefault((country, region), set()).update(names)
+        return {
+            'countries': [(country, joins, len(country_players.get(country, ())))
+                          for country, joins in country_joins.most_common()],
+            'regions': [(country, region, joins, len(region_players.get((country, region), ())))
+                        for (country, region), joins in region_joins.most_common()],
+            'hours': [hour_joins.get(hour, 0) for hour in range(24)],
+            'players': len(set().union(*country_players.values())) if country_players else 0,
+            'joins': sum(country_joins.values()),
+        }
+
+def quietest_window(hours: List[int], length: int = 2) -> int:
+    """Start hour of the `length`-hour window (wrapping at midnight) with the fewest joins."""
+    return min(range(24), key=lambda start: sum(hours[(start + offset) % 24] for offset in range(length)))
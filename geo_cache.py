@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+Location = Tuple[str, str]  # country, state
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 6 * 3600
+
+def clean_ip(ip_address: str) -> str:
+    """'{1.2.3.4:34197}' -> '1.2.3.4'; the port changes on every reconnect."""
+    return ip_address.strip('{}').split(':')[0]
+
+class GeoCache:
+    """LRU + TTL cache of ip -> (country, state) in front of a GeoIP resolver.
+
+    ``get`` only consults the cache and is safe to call from the event loop;
+    ``resolve`` calls the (blocking) resolver and stores the result, so on a
+    miss it can be run in an executor.
+    """
+
+    def __init__(self, resolver: Callable[[str], Location], max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.resolver = resolver
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[float, Location]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, ip_address: str):
+        """Cached location for ip_address, or None on a miss."""
+        key = clean_ip(ip_address)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, location = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return location
+            del self._entries[key]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def put(self, ip_address: str, location: Location):
+        key = clean_ip(ip_address)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, location)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def resolve(self, ip_address: str) -> Location:
+        """Look the address up with the resolver and cache the result. Blocking."""
+        location = self.resolver(clean_ip(ip_address))
+        self.put(ip_address, location)
+        return location
+
+    def lookup(self, ip_address: str) -> Location:
+        """Cached location, resolving on a miss. Blocking on a miss."""
+        location = self.get(ip_address)
+        if location is None:
+            location = self.resolve(ip_address)
+        return location
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hit_rate, 3),
+        }
@@ -0,0 +1,325 @@
+"""In-process metrics for the bot: latency histograms, counters, gauges and event-loop health.
+
+``bot.instrumentation`` is shared by every cog. Timings go into fixed-bucket
+histograms that are cheap enough to update once per log line, and the whole
+registry renders as Prometheus text for the optional local /metrics endpoint.
+``LoopMonitor`` measures event-loop lag continuously and, from a watchdog
+thread, logs the loop thread's stack whenever the loop is blocked, so the
+code doing the blocking shows up by name.
+"""
+import asyncio
+import bisect
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from aiohttp import web
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/instrumentation.log')
+
+METRIC_PREFIX = 'dwire_'
+# Seconds; spans a regex on one line up to a stalled subprocess wait
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LOOP_LAG_INTERVAL_SECONDS = 0.5
+SLOW_CALLBACK_SECONDS = 0.25
+MAX_SLOW_SAMPLES = 20
+MAX_SAMPLE_FRAMES = 25
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]  # name, labels, value
+
+def label_key(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def format_labels(labels: Labels, extra: str = '') -> str:
+    parts = ['{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+             for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Fixed-bucket latency histogram with running sum, count and max."""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+class Instrumentation:
+    """Registry of histograms, counters and gauges, plus collectors polled at export time.
+
+    Updates are plain dict operations made from the event loop (or the GIL-held
+    writer thread), so no locking is needed for the counts to stay coherent
+    enough for monitoring.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.descriptions: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+        self.loop_monitor: Optional['LoopMonitor'] = None
+        self.describe('event_loop_lag_seconds', 'histogram', "Delay of the loop lag probe's wake-up")
+        self.describe('event_loop_stalls_total', 'counter', "Times the event loop was blocked past the slow threshold")
+        self.describe('command_seconds', 'histogram', "Application command run time")
+        self.describe('subscriber_seconds', 'histogram', "ReadLogCog subscriber callback run time")
+        self.describe('ingest_stage_seconds', 'histogram',
+                      "Log ingest time by stage: read per batch, parse/dispatch/send per line, db per checkpoint")
+        self.describe('ingest_lines_total', 'counter', "Log lines processed by ReadLogCog")
+        self.describe('ingest_bytes_total', 'counter', "Log bytes processed by ReadLogCog")
+        self.describe('ingest_lag_bytes', 'gauge', "Bytes written to verbose.log that ReadLogCog has not processed yet")
+        self.describe('ingest_last_line_age_seconds', 'gauge', "Seconds since ReadLogCog last processed a line")
+        self.describe('log_dispatch_queue_depth', 'gauge', "Piped server output lines waiting for ReadLogCog")
+        self.describe('discord_sends_in_flight', 'gauge', "Game channel messages ReadLogCog is waiting on Discord to accept")
+        self.describe('discord_send_errors_total', 'counter', "Game channel messages Discord rejected")
+        self.describe('stats_updates_total', 'counter', "Stat counter updates committed to player_stats.db")
+        self.describe('stats_commits_total', 'counter', "Transactions committed to player_stats.db")
+        self.describe('stats_commit_seconds', 'histogram', "player_stats.db commit time")
+        self.describe('rcon_seconds', 'histogram', "RCON command round trip by calling cog")
+        self.describe('rcon_errors_total', 'counter', "Failed RCON connects and commands by calling cog")
+        self.describe('server_up', 'gauge', "1 if the Factorio server process is running")
+        self.describe('players_online', 'gauge', "Players on the Factorio server")
+        self.describe('game_ups', 'gauge', "Game updates per second, from softmod heartbeats")
+        self.describe('game_heartbeat_age_seconds', 'gauge', "Seconds since the last softmod heartbeat")
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self.descriptions[name] = (kind, help_text)
+
+    def observe(self, name: str, value: float, **labels):
+        series = self.histograms.setdefault(name, {})
+        key = label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        series = self.counters.setdefault(name, {})
+        key = label_key(labels)
+        series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels):
+        self.gauges.setdefault(name, {})[label_key(labels)] = value
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the run time of a with-block into histogram `name`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        return self.histograms.get(name, {}).get(label_key(labels))
+
+    def series(self, name: str) -> Dict[Labels, Histogram]:
+        return self.histograms.get(name, {})
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Register collector() -> [(name, labels, value)], polled on every export"""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Iterable[Sample]]):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    @contextmanager
+    def rcon(self, source: str, operation: str = 'command'):
+        """Time an RCON call from cog `source`, counting it as an error if the block raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('rcon_errors_total', source=source, operation=operation)
+            raise
+        finally:
+            if operation == 'command':
+                self.observe('rcon_seconds', time.perf_counter() - started, source=source)
+
+    def command_finished(self, interaction, status: str):
+        """Record an application command's run time, stamped by the command tree's interaction_check"""
+        started = interaction.extras.get('perf_started')
+        if started is None:
+            return
+        command = interaction.command.qualified_name if interaction.command else 'unknown'
+        self.observe('command_seconds', time.perf_counter() - started, command=command, status=status)
+
+    def collect(self) -> Dict[str, Dict[Labels, float]]:
+        """Gauge values reported by the collectors"""
+        collected: Dict[str, Dict[Labels, float]] = {}
+        for collector in list(self.collectors):
+            try:
+                for name, labels, value in collector():
+                    if value is not None:
+                        collected.setdefault(name, {})[label_key(labels)] = value
+            except Exception as e:
+                logger.error(f"Error in metrics collector {getattr(collector, '__qualname__', collector)}: {str(e)}")
+        return collected
+
+    def render_prometheus(self) -> str:
+        """The registry in the Prometheus text exposition format"""
+        lines = []
+
+        def header(name, default_kind):
+            kind, help_text = self.descriptions.get(name, (default_kind, name.replace('_', ' ')))
+            lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+
+        for name, series in sorted(self.histograms.items()):
+            header(name, 'histogram')
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += bucket_count
+                    le = f'le="{format_value(bound)}"'
+                    lines.append(f"{METRIC_PREFIX}{name}_bucket{format_labels(labels, le)} {cumulative}")
+                lines.append(f"{METRIC_PREFIX}{name}_sum{format_labels(labels)} {histogram.sum!r}")
+                lines.append(f"{METRIC_PREFIX}{name}_count{format_labels(labels)} {histogram.count}")
+        gauges = {name: dict(series) for name, series in self.gauges.items()}
+        for name, series in self.collect().items():
+            gauges.setdefault(name, {}).update(series)
+        for default_kind, metrics in (('counter', self.counters), ('gauge', gauges)):
+            for name, series in sorted(metrics.items()):
+                header(name, 'counter' if name.endswith('_total') else default_kind)
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{METRIC_PREFIX}{name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+class LoopMonitor:
+    """Measures event-loop lag and samples the loop thread's stack while it is blocked.
+
+    A probe coroutine sleeps `interval` seconds at a time and records how late
+    it wakes up. A watchdog thread notices when the probe has not run for
+    `slow_threshold` past its interval and logs the loop thread's current
+    stack once per stall; the last few samples are kept for /perf.
+    """
+
+    def __init__(self, instrumentation: Instrumentation, interval: float = LOOP_LAG_INTERVAL_SECONDS,
+                 slow_threshold: float = SLOW_CALLBACK_SECONDS):
+        self.instrumentation = instrumentation
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.slow_samples: deque = deque(maxlen=MAX_SLOW_SAMPLES)  # (time, blocked seconds, stack)
+        self.last_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start probing; call from the event loop"""
+        if self._task:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+        self.instrumentation.loop_monitor = self
+        logger.info(f"Loop monitor started (interval {self.interval}s, slow threshold {self.slow_threshold}s)")
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+        if self.instrumentation.loop_monitor is self:
+            self.instrumentation.loop_monitor = None
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            self.instrumentation.observe('event_loop_lag_seconds', self.last_lag)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self):
+        sampled_heartbeat = None
+        while not self._stopped.wait(self.slow_threshold / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.slow_threshold or heartbeat == sampled_heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            sampled_heartbeat = heartbeat
+            stack = ''.join(traceback.format_stack(frame, limit=MAX_SAMPLE_FRAMES))
+            self.slow_samples.append((time.time(), blocked, stack))
+            self.instrumentation.inc('event_loop_stalls_total')
+            logger.warning(f"Event loop blocked for {blocked:.2f}s+, loop thread stack:\n{stack}")
+
+class MetricsServer:
+    """Serves ``GET /metrics`` in the Prometheus text format on a local port."""
+
+    def __init__(self, instrumentation: Instrumentation, host: str = '127.0.0.1', port: int = 9105):
+        self.instrumentation = instrumentation
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.instrumentation.render_prometheus(), content_type='text/plain', charset='utf-8')
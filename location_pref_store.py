@@ -0,0 +1,80 @@
+from typing import Dict, Optional
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/location_pref_store.log')
+
+class LocationPreferenceStore:
+    """In-memory location display preferences, indexed by Discord ID and Factorio username.
+
+    Loaded once at startup and kept on the bot as ``bot.location_prefs`` so a
+    join answers "may we use this player's location?" with a dict lookup.
+    It listens to the registration store, so a renamed registration keeps
+    its preference. Every change upserts one row in the state store on its
+    writer thread.
+    """
+
+    def __init__(self, state_store, registration_store):
+        self.state_store = state_store
+        self.registration_store = registration_store
+        self._by_discord_id: Dict[str, dict] = {}
+        self._by_player_name: Dict[str, str] = {}
+        self.load()
+        self.registration_store.add_listener(self.on_registration_changed)
+
+    def load(self):
+        """(Re)load preferences from the state store."""
+        try:
+            prefs = self.state_store.load_location_prefs()
+        except Exception as e:
+            logger.error(f"Error loading location preferences: {str(e)}")
+            return
+        self._by_discord_id = {str(discord_id): pref for discord_id, pref in prefs.items()}
+        self._by_player_name = {}
+        for discord_id, pref in self._by_discord_id.items():
+            # Prefer the current registration over a possibly stale stored username
+            player_name = self.registration_store.get_player_name(discord_id) or pref.get('factorio_username')
+            if player_name:
+                pref['factorio_username'] = player_name
+                self._by_player_name[player_name] = discord_id
+        logger.info(f"Loaded {len(self._by_discord_id)} location preferences")
+
+    def get(self, discord_id) -> Optional[dict]:
+        return self._by_discord_id.get(str(discord_id))
+
+    def allows_location(self, player_name: str) -> bool:
+        """Whether a player's location may be shown or recorded. Defaults to True."""
+        discord_id = self._by_player_name.get(player_name)
+        if discord_id is None:
+            return True
+        return self._by_discord_id[discord_id].get('show_location', True)
+
+    def set_show_location(self, discord_id, player_name: str, show_location: bool):
+        discord_id = str(discord_id)
+        previous = self._by_discord_id.get(discord_id)
+        if previous and self._by_player_name.get(previous.get('factorio_username')) == discord_id:
+            del self._by_player_name[previous['factorio_username']]
+        self._by_discord_id[discord_id] = {'show_location': show_location, 'factorio_username': player_name}
+        self._by_player_name[player_name] = discord_id
+        self._save(discord_id)
+
+    def on_registration_changed(self, discord_id, player_name, previous_name):
+        """Keep the username index pointing at the current Factorio username"""
+        discord_id = str(discord_id)
+        pref = self._by_discord_id.get(discord_id)
+        # An opt-out outlives an unregistration; it is only moved on a rename
+        if not pref or not player_name:
+            return
+        if previous_name and self._by_player_name.get(previous_name) == discord_id:
+            del self._by_player_name[previous_name]
+        self._by_player_name[player_name] = discord_id
+        if pref.get('factorio_username') != player_name:
+            pref['factorio_username'] = player_name
+            self._save(discord_id)
+
+    def _save(self, discord_id: str):
+        pref = self._by_discord_id[discord_id]
+        self.state_store.submit(self.state_store.upsert_location_pref, discord_id,
+                                pref.get('factorio_username'), pref.get('show_location', True))
+
+    def __len__(self):
+        return len(self._by_discord_id)
@@ -0,0 +1,132 @@
+import gzip
+import os
+import re
+from typing import Iterable, List, Optional, Tuple
+from log_time import LogClock
+from logger import setup_logger
+from softmod_protocol import PROTOCOL_TAG, decode
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = setup_logger(__name__, 'logs/log_export.log')
+
+ERROR_PATTERN = re.compile(rb'\b(Error|Warning|Exception|Traceback)\b')
+# Compressors buffer output internally; close a part this far below the limit
+PART_SLACK_BYTES = 1024 * 1024
+READ_CHUNK_BYTES = 1024 * 1024
+PROTOCOL_TAG_BYTES = PROTOCOL_TAG.encode()
+
+def record_type(line: bytes) -> Optional[str]:
+    """The event type of a [DW1] record line, or None for any other line."""
+    if not line.startswith(PROTOCOL_TAG_BYTES):
+        return None
+    event = decode(line.decode('utf-8', errors='replace').rstrip('\r\n'))
+    return event['t'] if event else None
+
+def default_compression() -> str:
+    return 'zstd' if zstandard is not None else 'gzip'
+
+class _PartWriter:
+    """Writes compressed output into numbered part files no larger than part_limit."""
+
+    def __init__(self, output_dir: str, base_name: str, part_limit: int, compression: str):
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.part_limit = max(part_limit - PART_SLACK_BYTES, PART_SLACK_BYTES)
+        self.compression = compression
+        self.extension = '.zst' if compression == 'zstd' else '.gz'
+        self.parts: List[str] = []
+        self._raw = None
+        self._stream = None
+
+    def _open_part(self):
+        path = os.path.join(self.output_dir, f"{self.base_name}.part{len(self.parts) + 1}{self.extension}")
+        self._raw = open(path, 'wb')
+        if self.compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor(level=6).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(filename=self.base_name, mode='wb', fileobj=self._raw, compresslevel=6)
+        self.parts.append(path)
+
+    def write(self, data: bytes):
+        if self._stream is None:
+            self._open_part()
+        self._stream.write(data)
+        if self._raw.tell() >= self.part_limit:
+            self.close()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._raw.close()
+            self._stream = None
+            self._raw = None
+
+def export_log(log_file: str, output_dir: str, part_limit: int, tags: Iterable[str] = (),
+               errors_only: bool = False, since: Optional[float] = None, start_offset: int = 0,
+               clock_base: Optional[float] = None, compression: Optional[str] = None,
+               record_types: Iterable[str] = ()) -> List[str]:
+    """Export a single log file; see export_logs."""
+    return export_logs([(log_file, start_offset, clock_base)], output_dir, os.path.basename(log_file),
+                       part_limit, tags, errors_only, since, compression, record_types)
+
+def export_logs(sources: List[Tuple[str, int, Optional[float]]], output_dir: str, base_name: str,
+                part_limit: int, tags: Iterable[str] = (), errors_only: bool = False,
+                since: Optional[float] = None, compression: Optional[str] = None,
+                record_types: Iterable[str] = ()) -> List[str]:
+    """Stream logs through optional filters into compressed, size-limited parts.
+
+    Blocking; run it in a worker thread. ``sources`` is a list of
+    ``(path, start_offset, clock_base)`` read in order (``.gz`` archives are
+    decompressed on the fly); a start offset from a
+    LogIndex lets time-filtered exports seek instead of scanning, and the
+    clock base times engine lines when reading starts after the launch line.
+    ``tags`` keeps only lines containing one of the given markers (e.g.
+    "[CHAT]") or a [DW1] record of one of ``record_types`` (e.g. "chat"),
+    ``errors_only`` keeps engine errors and warnings, and ``since`` drops
+    lines timed before that epoch. Returns the part file paths in order.
+    """
+    compression = compression or default_compression()
+    if compression == 'zstd' and zstandard is None:
+        compression = 'gzip'
+    markers = tuple(tag.encode() for tag in tags)
+    record_types = frozenset(record_types)
+    writer = _PartWriter(output_dir, base_name, part_limit, compression)
+    lines_in = lines_out = 0
+    batch = []
+    batch_bytes = 0
+    try:
+        for log_file, start_offset, clock_base in sources:
+            clock = LogClock(clock_base)
+            cutoff = since
+            opener = gzip.open if log_file.endswith('.gz') else open
+            with opener(log_file, 'rb') as f:
+                if start_offset:
+                    f.seek(start_offset)
+                for line in f:
+                    lines_in += 1
+                    if cutoff is not None:
+                        timestamp = clock.timestamp(line)
+                        if timestamp is None or timestamp < cutoff:
+                            continue
+                        cutoff = None  # The log is chronological; everything after this qualifies
+                    if markers or record_types:
+                        if not any(marker in line for marker in markers) and record_type(line) not in record_types:
+                            continue
+                    if errors_only and not ERROR_PATTERN.search(line):
+                        continue
+                    batch.append(line)
+                    batch_bytes += len(line)
+                    lines_out += 1
+                    if batch_bytes >= READ_CHUNK_BYTES:
+                        writer.write(b''.join(batch))
+                        batch, batch_bytes = [], 0
+        if batch:
+            writer.write(b''.join(batch))
+    finally:
+        writer.close()
+    logger.info(f"Exported {lines_out}/{lines_in} lines from {len(sources)} log(s) into {len(writer.parts)} {compression} part(s)")
+    return writer.parts
@@ -0,0 +1,162 @@
+import bisect
+import glob
+import os
+import struct
+from array import array
+from typing import List, Optional
+from log_time import LAUNCH_PATTERN, LogClock
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/log_index.log')
+
+# One index entry per this many bytes of log
+INDEX_INTERVAL_BYTES = 64 * 1024
+SIDECAR_SUFFIX = '.idx'
+MAGIC = b'DWX1'
+# magic, inode, clock base (NaN if unknown), launch offset (-1 if unknown), bytes indexed
+HEADER = struct.Struct('<4sQdqq')
+ENTRY = struct.Struct('<dq')
+
+class LogIndex:
+    """Sparse timestamp -> byte offset index over one verbose log.
+
+    Entries are kept in two parallel arrays and persisted to an append-only
+    sidecar file (``<log>.idx``) whose header records the log's inode, the
+    clock base and how far the log has been indexed. The sidecar is only a
+    cache: if it is missing, stale or corrupt the index is rebuilt by
+    scanning the log.
+    """
+
+    def __init__(self, log_file: str):
+        self.log_file = log_file
+        self.sidecar = log_file + SIDECAR_SUFFIX
+        self._clear()
+
+    def _clear(self):
+        self.timestamps = array('d')
+        self.offsets = array('q')
+        self.clock = LogClock()
+        self.launch_offset: Optional[int] = None
+        self.indexed_to = 0
+        self.inode = self._current_inode()
+        self._pending = 0
+
+    def _current_inode(self):
+        try:
+            return os.stat(self.log_file).st_ino
+        except FileNotFoundError:
+            return 0
+
+    @classmethod
+    def open(cls, log_file: str) -> 'LogIndex':
+        """Load the sidecar if it still matches the log, then index any new bytes. Blocking."""
+        index = cls(log_file)
+        if not index.load():
+            index.reset()
+        index.build()
+        return index
+
+    def reset(self):
+        """Forget everything, e.g. after the log was truncated or replaced."""
+        self._clear()
+        try:
+            os.remove(self.sidecar)
+        except FileNotFoundError:
+            pass
+
+    def observe(self, offset: int, line: bytes):
+        """Account for one log line starting at byte `offset`."""
+        if offset < self.indexed_to:
+            return
+        if self.launch_offset is None and LAUNCH_PATTERN.match(line):
+            self.clock.timestamp(line)
+            if self.clock.base is not None:
+                self.launch_offset = offset
+        if not self.offsets or offset - self.offsets[-1] >= INDEX_INTERVAL_BYTES:
+            timestamp = self.clock.timestamp(line)
+            if timestamp is not None and (not self.timestamps or timestamp >= self.timestamps[-1]):
+                # Offsets first so readers on other threads never see a timestamp without one
+                self.offsets.append(offset)
+                self.timestamps.append(timestamp)
+                self._pending += 1
+        self.indexed_to = offset + len(line)
+
+    def build(self):
+        """Scan the log from where the index left off to EOF."""
+        try:
+            with open(self.log_file, 'rb') as f:
+                f.seek(self.indexed_to)
+                offset = self.indexed_to
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Partial line still being written
+                    self.observe(offset, line)
+                    offset += len(line)
+        except FileNotFoundError:
+            return
+        self.flush()
+
+    def flush(self):
+        """Persist the header and any entries added since the last flush."""
+        try:
+            mode = 'r+b' if os.path.exists(self.sidecar) else 'wb'
+            with open(self.sidecar, mode) as f:
+                base = self.clock.base if self.clock.base is not None else float('nan')
+                launch = self.launch_offset if self.launch_offset is not None else -1
+                f.write(HEADER.pack(MAGIC, self.inode, base, launch, self.indexed_to))
+                if self._pending:
+                    f.seek(0, os.SEEK_END)
+                    start = len(self.offsets) - self._pending
+                    f.write(b''.join(ENTRY.pack(self.timestamps[i], self.offsets[i])
+                                     for i in range(start, len(self.offsets))))
+            self._pending = 0
+        except Exception as e:
+            logger.error(f"Error writing log index {self.sidecar}: {str(e)}")
+
+    def load(self) -> bool:
+        """Load the sidecar. Returns False if it is missing or no longer matches the log."""
+        try:
+            with open(self.sidecar, 'rb') as f:
+                data = f.read()
+            magic, inode, base, launch, indexed_to = HEADER.unpack_from(data)
+            size = os.path.getsize(self.log_file)
+        except (FileNotFoundError, struct.error):
+            return False
+        body = data[HEADER.size:]
+        if magic != MAGIC or inode != self._current_inode() or indexed_to > size or len(body) % ENTRY.size:
+            logger.info(f"Discarding stale log index {self.sidecar}")
+            return False
+        self._clear()
+        for timestamp, offset in ENTRY.iter_unpack(body):
+            self.offsets.append(offset)
+            self.timestamps.append(timestamp)
+        self.clock.base = None if base != base else base
+        self.launch_offset = None if launch < 0 else launch
+        self.indexed_to = indexed_to
+        return True
+
+    def offset_for(self, timestamp: float) -> int:
+        """Byte offset of an indexed line at or before `timestamp` (a safe place to start reading)."""
+        position = bisect.bisect_right(self.timestamps, timestamp) - 1
+        if position < 0:
+            return 0
+        return self.offsets[position]
+
+    @property
+    def dirty(self) -> bool:
+        return self._pending > 0
+
+    def first_timestamp(self) -> Optional[float]:
+        return self.timestamps[0] if self.timestamps else None
+
+    def last_timestamp(self) -> Optional[float]:
+        return self.timestamps[-1] if self.timestamps else None
+
+def rotated_logs(log_file: str) -> List[str]:
+    """previous_*_<name> files (plain or .gz archives) rotated out next to log_file, oldest first."""
+    log_dir = os.path.dirname(log_file)
+    pattern = os.path.join(log_dir, f"previous_*_{os.path.basename(log_file)}")
+    plain = set(glob.glob(pattern))
+    # While an archive is being written the plain file is still the complete copy
+    archives = [path for path in glob.glob(pattern + '.gz') if path[:-3] not in plain]
+    return sorted(plain.union(archives), key=os.path.getmtime)
@@ -0,0 +1,91 @@
+import datetime
+import gzip
+import os
+import shutil
+import time
+from typing import List, Optional
+from log_index import SIDECAR_SUFFIX, rotated_logs
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/log_rotation.log')
+
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_RETENTION_MB = 1024
+ARCHIVE_SUFFIX = '.gz'
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def rotate_log(log_file: str) -> Optional[str]:
+    """Rename log_file to previous_<timestamp>_<name> next to it.
+
+    Returns the rotated path, or None if there was nothing to rotate. The
+    index sidecar is dropped with it since it describes the old file.
+    """
+    try:
+        if os.path.getsize(log_file) == 0:
+            return None
+    except FileNotFoundError:
+        return None
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    rotated = os.path.join(os.path.dirname(log_file), f"previous_{timestamp}_{os.path.basename(log_file)}")
+    os.rename(log_file, rotated)
+    _remove_quietly(log_file + SIDECAR_SUFFIX)
+    logger.info(f"Rotated {log_file} to {rotated}")
+    return rotated
+
+def compress_log(path: str) -> str:
+    """Gzip a rotated log in place and return the archive path. Blocking."""
+    archive = path + ARCHIVE_SUFFIX
+    partial = archive + '.tmp'
+    with open(path, 'rb') as source, gzip.open(partial, 'wb', compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    shutil.copystat(path, partial)
+    os.replace(partial, archive)
+    _remove_quietly(path)
+    _remove_quietly(path + SIDECAR_SUFFIX)
+    return archive
+
+def enforce_retention(log_file: str, max_age_days: float = DEFAULT_RETENTION_DAYS,
+                      max_total_mb: float = DEFAULT_RETENTION_MB) -> List[str]:
+    """Delete rotated logs older than max_age_days, then the oldest until they fit in max_total_mb."""
+    archives = rotated_logs(log_file)
+    removed = []
+    cutoff = time.time() - max_age_days * 86400
+    sizes = {}
+    for path in archives:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime < cutoff:
+            removed.append(path)
+        else:
+            sizes[path] = stat.st_size
+    total = sum(sizes.values())
+    for path in sizes:
+        if total <= max_total_mb * 1024 * 1024:
+            break
+        total -= sizes[path]
+        removed.append(path)
+    for path in removed:
+        _remove_quietly(path)
+        _remove_quietly(path + SIDECAR_SUFFIX)
+        logger.info(f"Removed rotated log {path}")
+    return removed
+
+def archive_log(rotated: str, log_file: str, max_age_days: float = DEFAULT_RETENTION_DAYS,
+                max_total_mb: float = DEFAULT_RETENTION_MB):
+    """Compress a freshly rotated log and apply retention. Blocking; run it in a worker thread."""
+    try:
+        archive = compress_log(rotated)
+        logger.info(f"Compressed {rotated} to {archive}")
+    except Exception as e:
+        logger.error(f"Error compressing rotated log {rotated}: {str(e)}")
+    try:
+        enforce_retention(log_file, max_age_days, max_total_mb)
+    except Exception as e:
+        logger.error(f"Error enforcing log retention: {str(e)}")
@@ -0,0 +1,43 @@
+import datetime
+import re
+from typing import Optional
+
+# Softmod lines start with a wall-clock time: "2024-11-01 12:00:00 [CHAT] ..."
+WALL_CLOCK_PATTERN = re.compile(rb'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+# Engine lines start with seconds since launch: "  12.345 Info ..."
+ELAPSED_PATTERN = re.compile(rb'^\s*(\d+\.\d{3}) ')
+# The first engine line also carries the launch time: "   0.000 2024-11-01 12:00:00; Factorio 2.0.15 ..."
+LAUNCH_PATTERN = re.compile(rb'^\s*(\d+\.\d{3}) (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2});')
+
+def _parse_wall_clock(value: bytes) -> Optional[float]:
+    try:
+        return datetime.datetime.strptime(value.decode('ascii'), "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+
+class LogClock:
+    """Turns verbose.log lines into epoch timestamps.
+
+    Feed lines in file order. Engine lines are timed relative to the launch
+    line, which sets ``base``; softmod lines carry their own wall-clock time.
+    Lines with neither return None.
+    """
+
+    def __init__(self, base: Optional[float] = None):
+        self.base = base
+
+    def timestamp(self, line: bytes) -> Optional[float]:
+        match = WALL_CLOCK_PATTERN.match(line)
+        if match:
+            return _parse_wall_clock(match.group(1))
+        match = ELAPSED_PATTERN.match(line)
+        if not match:
+            return None
+        launch = LAUNCH_PATTERN.match(line)
+        if launch:
+            launched_at = _parse_wall_clock(launch.group(2))
+            if launched_at is not None:
+                self.base = launched_at - float(launch.group(1))
+        if self.base is None:
+            return None
+        return self.base + float(match.group(1))
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from atomic_file import atomic_write_json
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/mod_list_store.log')
+
+class ModListStore:
+    """In-memory view of Factorio's mod-list.json.
+
+    The parsed list is kept in memory together with a name -> entry index so
+    lookups never touch the disk. Changes made inside ``batch()`` are written
+    once, atomically, when the outermost batch exits. External edits (the
+    Factorio server rewrites mod-list.json on exit) are detected by comparing
+    the file's mtime and size before every access. If the file can't be
+    parsed (e.g. read mid-write), changes are refused until a clean read
+    succeeds, so a stale or empty list never overwrites it.
+    """
+
+    def __init__(self, mod_list_file: str, protected_mods: Iterable[str] = ()):
+        self.mod_list_file = mod_list_file
+        self.protected_mods = set(protected_mods)
+        self._lock = threading.RLock()
+        self._data = {'mods': []}
+        self._index: Dict[str, dict] = {}
+        self._signature = None
+        self._batch_depth = 0
+        self._dirty = False
+        self._load_error: Optional[str] = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.mod_list_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        """Reload from disk if the file changed since we last read or wrote it."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        if signature is None:
+            self._data = {'mods': []}
+            self._load_error = None
+        else:
+            try:
+                with open(self.mod_list_file, 'r') as file:
+                    data = json.load(file)
+                if not isinstance(data.get('mods'), list):
+                    raise ValueError("mod-list.json has no 'mods' list")
+                self._data = data
+                self._load_error = None
+                logger.debug(f"Loaded mod list from disk ({len(data['mods'])} entries)")
+            except Exception as e:
+                logger.error(f"Error loading mod list: {str(e)}")
+                self._load_error = str(e)
+                return
+        self._index = {mod['name']: mod for mod in self._data['mods'] if 'name' in mod}
+        self._signature = signature
+
+    def _save(self):
+        atomic_write_json(self.mod_list_file, self._data, indent=4)
+        self._signature = self._file_signature()
+        self._dirty = False
+        logger.info(f"Wrote mod list ({len(self._data['mods'])} entries)")
+
+    @contextmanager
+    def batch(self):
+        """Group several changes into a single write of mod-list.json."""
+        with self._lock:
+            if self._batch_depth == 0:
+                self._refresh()
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    if self._load_error:
+                        self._dirty = False
+                    else:
+                        self._save()
+
+    def _refuses_changes(self, action: str) -> bool:
+        """True (and logged) if the last read of mod-list.json failed; call inside batch()"""
+        if self._load_error:
+            logger.warning(f"Not {action}: mod-list.json could not be read ({self._load_error})")
+            return True
+        return False
+
+    def get(self, mod_name: str) -> Optional[dict]:
+        with self._lock:
+            if self._batch_depth == 0:
+                self._refresh()
+            entry = self._index.get(mod_name)
+            return dict(entry) if entry else None
+
+    def is_enabled(self, mod_name: str) -> Optional[bool]:
+        """Return the enabled flag for a mod, or None if it is not in the list."""
+        entry = self.get(mod_name)
+        return entry.get('enabled', False) if entry else None
+
+    def names(self, include_protected: bool = True) -> List[str]:
+        with self._lock:
+            if self._batch_depth == 0:
+                self._refresh()
+            return [mod['name'] for mod in self._data['mods']
+                    if include_protected or mod['name'] not in self.protected_mods]
+
+    def exists(self) -> bool:
+        return os.path.exists(self.mod_list_file)
+
+    def add(self, mod_name: str, enabled: bool = True) -> bool:
+        """Add a mod, or re-enable it if it is already listed."""
+        if mod_name in self.protected_mods:
+            logger.warning(f"Attempted to modify base game mod: {mod_name}")
+            return False
+        with self.batch():
+            if self._refuses_changes(f"adding {mod_name}"):
+                return False
+            entry = self._index.get(mod_name)
+            if entry is None:
+                entry = {'name': mod_name, 'enabled': enabled}
+                self._data['mods'].append(entry)
+                self._index[mod_name] = entry
+                self._dirty = True
+            elif entry.get('enabled') != enabled:
+                entry['enabled'] = enabled
+                self._dirty = True
+        return True
+
+    def remove(self, mod_name: str) -> bool:
+        if mod_name in self.protected_mods:
+            logger.warning(f"Attempted to modify base game mod: {mod_name}")
+            return False
+        with self.batch():
+            if self._refuses_changes(f"removing {mod_name}") or mod_name not in self._index:
+                return False
+            self._data['mods'] = [mod for mod in self._data['mods'] if mod.get('name') != mod_name]
+            del self._index[mod_name]
+            self._dirty = True
+        return True
+
+    def set_enabled(self, mod_name: str, enabled: bool) -> bool:
+        """Set a single mod's enabled flag. Returns True if anything changed."""
+        return bool(self.set_enabled_many([mod_name], enabled))
+
+    def set_enabled_many(self, mod_names: Iterable[str], enabled: bool) -> List[str]:
+        """Enable or disable many mods with one write. Returns the names that changed."""
+        changed = []
+        with self.batch():
+            if self._refuses_changes("changing enabled flags"):
+                return changed
+            for mod_name in mod_names:
+                if mod_name in self.protected_mods:
+                    logger.warning(f"Attempted to modify base game mod: {mod_name}")
+                    continue
+                entry = self._index.get(mod_name)
+                if entry is not None and entry.get('enabled') != enabled:
+                    entry['enabled'] = enabled
+                    changed.append(mod_name)
+            if changed:
+                self._dirty = True
+        return changed
@@ -0,0 +1,99 @@
+import time
+from typing import List, Optional, Tuple
+from softmod_protocol import decode
+
+class OnlinePlayer:
+    """One player entry from an [ONLINE2] line."""
+    __slots__ = ('name', 'score', 'minutes', 'rank', 'afk')
+
+    def __init__(self, name: str, score: Optional[int] = None, minutes: Optional[int] = None,
+                 rank: Optional[str] = None, afk: str = ""):
+        self.name = name
+        self.score = score
+        self.minutes = minutes
+        self.rank = rank
+        self.afk = afk
+
+    def __eq__(self, other):
+        return isinstance(other, OnlinePlayer) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        return f"OnlinePlayer({self.name!r}, score={self.score}, minutes={self.minutes}, rank={self.rank!r})"
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value.strip())
+    except ValueError:
+        return None
+
+class OnlineSnapshot:
+    """Parsed [ONLINE2] line, with the join/leave delta against the previous snapshot.
+
+    Understands [DW1] "online" records, whose player list holds either
+    names or {n, s, m, r, a} objects, and the older text formats: online.lua's
+    ``name,score,minutes,rank,afk;`` records and logging.lua's plain
+    ``name, name`` list (names only).
+    """
+    __slots__ = ('timestamp', 'payload', 'players', 'joined', 'left')
+
+    def __init__(self, timestamp: float, payload: str, players: List[OnlinePlayer]):
+        self.timestamp = timestamp
+        self.payload = payload
+        self.players = players
+        self.joined: Tuple[str, ...] = ()
+        self.left: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_line(cls, line: str, timestamp: Optional[float] = None) -> 'OnlineSnapshot':
+        event = decode(line)
+        if event:
+            return cls.from_event(event, timestamp)
+        payload = line.split("[ONLINE2]", 1)[-1].strip()
+        players = []
+        if ";" in payload:
+            for entry in payload.split(";"):
+                if not entry.strip():
+                    continue
+                parts = entry.split(",")
+                if len(parts) < 4:
+                    players.append(OnlinePlayer(parts[0].strip()))
+                    continue
+                players.append(OnlinePlayer(
+                    parts[0].strip(), _to_int(parts[1]), _to_int(parts[2]), parts[3].strip(),
+                    parts[4].strip() if len(parts) > 4 else ""
+                ))
+        elif payload:
+            players = [OnlinePlayer(name.strip()) for name in payload.split(",") if name.strip()]
+        return cls(timestamp or time.time(), payload, players)
+
+    @classmethod
+    def from_event(cls, event: dict, timestamp: Optional[float] = None) -> 'OnlineSnapshot':
+        players = []
+        entries = event.get('p')
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, str):
+                players.append(OnlinePlayer(entry))
+            elif isinstance(entry, dict) and entry.get('n'):
+                players.append(OnlinePlayer(
+                    str(entry['n']), _to_int(str(entry.get('s', ''))), _to_int(str(entry.get('m', ''))),
+                    entry.get('r'), entry.get('a') or ""
+                ))
+        # Rendered like online.lua's text records
+        payload = "".join(player.name + ";" if player.score is None else
+                          f"{player.name},{player.score},{player.minutes},{player.rank},{player.afk};" for player in players)
+        return cls(timestamp or time.time(), payload, players)
+
+    @property
+    def count(self) -> int:
+        return len(self.players)
+
+    def names(self) -> List[str]:
+        return [player.name for player in self.players]
+
+    def diff(self, previous: Optional['OnlineSnapshot']):
+        """Record which players joined or left since `previous`."""
+        before = set(previous.names()) if previous else set()
+        after = set(self.names())
+        self.joined = tuple(sorted(after - before))
+        self.left = tuple(sorted(before - after))
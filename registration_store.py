@@ -0,0 +1,90 @@
+from typing import Callable, Dict, List, Optional
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/registration_store.log')
+
+class RegistrationStore:
+    """Shared in-memory index of Discord ID <-> Factorio player registrations.
+
+    Loaded once at startup and kept on the bot as ``bot.registration_store`` so
+    every cog answers lookups in O(1) without touching the database.
+    Writes go through ``register``/``unregister``, which upsert a single row in
+    the state store and notify listeners with
+    ``(discord_id, player_name, previous_name)``.
+    """
+
+    def __init__(self, state_store):
+        self.state_store = state_store
+        self._by_discord_id: Dict[str, str] = {}
+        self._by_player_name: Dict[str, str] = {}
+        self._listeners: List[Callable] = []
+        self.load()
+
+    def load(self):
+        """(Re)load registrations from the state store."""
+        try:
+            registrations = self.state_store.load_registrations()
+        except Exception as e:
+            logger.error(f"Error loading registrations: {str(e)}")
+            return
+        self._by_discord_id = {str(discord_id): name for discord_id, name in registrations.items()}
+        self._by_player_name = {name: discord_id for discord_id, name in self._by_discord_id.items()}
+        logger.info(f"Loaded {len(self._by_discord_id)} registrations")
+
+    def get_player_name(self, discord_id) -> Optional[str]:
+        return self._by_discord_id.get(str(discord_id))
+
+    def get_discord_id(self, player_name: str) -> Optional[int]:
+        discord_id = self._by_player_name.get(player_name)
+        return int(discord_id) if discord_id else None
+
+    def is_registered(self, discord_id) -> bool:
+        return str(discord_id) in self._by_discord_id
+
+    def all(self) -> Dict[str, str]:
+        return dict(self._by_discord_id)
+
+    def __len__(self):
+        return len(self._by_discord_id)
+
+    def register(self, discord_id, player_name: str):
+        """Bind a Discord ID to a Factorio player name and persist it."""
+        discord_id = str(discord_id)
+        previous_name = self._by_discord_id.get(discord_id)
+        if previous_name == player_name:
+            return
+        if previous_name is not None and self._by_player_name.get(previous_name) == discord_id:
+            del self._by_player_name[previous_name]
+        self._by_discord_id[discord_id] = player_name
+        self._by_player_name[player_name] = discord_id
+        self.state_store.submit(self.state_store.upsert_registration, discord_id, player_name)
+        logger.info(f"Stored registration for user {discord_id} with player name '{player_name}'")
+        self._notify(discord_id, player_name, previous_name)
+
+    def unregister(self, discord_id) -> bool:
+        discord_id = str(discord_id)
+        previous_name = self._by_discord_id.pop(discord_id, None)
+        if previous_name is None:
+            return False
+        if self._by_player_name.get(previous_name) == discord_id:
+            del self._by_player_name[previous_name]
+        self.state_store.submit(self.state_store.delete_registration, discord_id)
+        logger.info(f"Removed registration for user {discord_id} ('{previous_name}')")
+        self._notify(discord_id, None, previous_name)
+        return True
+
+    def add_listener(self, callback: Callable):
+        """Call ``callback(discord_id, player_name, previous_name)`` after every change."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, discord_id, player_name, previous_name):
+        for callback in list(self._listeners):
+            try:
+                callback(discord_id, player_name, previous_name)
+            except Exception as e:
+                logger.error(f"Error in registration listener {callback.__qualname__}: {str(e)}")
@@ -0,0 +1,100 @@
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+# Sample fields; io counters are cumulative bytes as reported by psutil
+FIELDS = ('time', 'cpu_percent', 'rss', 'read_bytes', 'write_bytes', 'fds')
+
+class ResourceHistory:
+    """Fixed-size ring buffer of process resource samples, one array('d') per field.
+
+    Memory stays constant (8 bytes per field per slot) however long the
+    server runs; the oldest sample is overwritten once the buffer is full.
+    ``fields`` must start with 'time'.
+    """
+
+    def __init__(self, capacity: int, fields: Sequence[str] = FIELDS):
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self.columns: Dict[str, array] = {field: array('d', bytes(8 * capacity)) for field in self.fields}
+        self.head = 0  # Next slot to write
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    def append(self, **sample: float):
+        for field in self.fields:
+            self.columns[field][self.head] = sample.get(field, 0.0)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        if not self.count:
+            return None
+        index = (self.head - 1) % self.capacity
+        return {field: column[index] for field, column in self.columns.items()}
+
+    def window(self, seconds: Optional[float] = None, now: Optional[float] = None) -> Dict[str, List[float]]:
+        """Samples from the last `seconds` (all of them if None), oldest first, per field"""
+        start = (self.head - self.count) % self.capacity
+        indexes = [(start + offset) % self.capacity for offset in range(self.count)]
+        if seconds is not None:
+            cutoff = (now or time.time()) - seconds
+            times = self.columns['time']
+            # Samples are in time order, so skip the old ones from the front
+            first = next((position for position, index in enumerate(indexes) if times[index] >= cutoff), len(indexes))
+            indexes = indexes[first:]
+        return {field: [column[index] for index in indexes] for field, column in self.columns.items()}
+
+def rates(times: Sequence[float], totals: Sequence[float]) -> List[float]:
+    """Per-second rates between consecutive cumulative counter samples"""
+    return [max(0.0, (totals[i] - totals[i - 1]) / (times[i] - times[i - 1])) if times[i] > times[i - 1] else 0.0
+            for i in range(1, len(times))]
+
+def slope_per_hour(times: Sequence[float], values: Sequence[float]) -> float:
+    """Least-squares slope of values over time, in units per hour"""
+    n = len(times)
+    if n < 2:
+        return 0.0
+    mean_time = sum(times) / n
+    mean_value = sum(values) / n
+    variance = sum((t - mean_time) ** 2 for t in times)
+    if not variance:
+        return 0.0
+    covariance = sum((t - mean_time) * (v - mean_value) for t, v in zip(times, values))
+    return covariance / variance * 3600
+
+def sparkline(values: Sequence[float], width: int = 24, low: Optional[float] = None,
+              high: Optional[float] = None) -> str:
+    """Unicode sparkline of values averaged down to at most `width` buckets"""
+    if not values:
+        return ''
+    if len(values) > width:
+        step = len(values) / width
+        values = [sum(bucket) / len(bucket)
+                  for bucket in (values[int(i * step):int((i + 1) * step)] for i in range(width)) if bucket]
+    low = min(values) if low is None else low
+    high = max(values) if high is None else high
+    if high <= low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return ''.join(SPARK_CHARS[max(0, min(len(SPARK_CHARS) - 1, round((value - low) * scale)))] for value in values)
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of unsorted values, or 0.0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summary(values: Sequence[float]) -> Tuple[float, float, float]:
+    """(min, mean, max), or zeros for no values"""
+    if not values:
+        return 0.0, 0.0, 0.0
+    return min(values), sum(values) / len(values), max(values)
@@ -0,0 +1,97 @@
+import re
+import threading
+import time
+from typing import Optional
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/server_status.log')
+
+# (attribute, substring used as a cheap prefilter, pattern)
+FACT_PATTERNS = [
+    ('save_file', 'Loading map', re.compile(r'Loading map (.+?\.zip)')),
+    ('port', 'Hosting game at', re.compile(r'Hosting game at IP ADDR:\({.+?:(\d+)}\)')),
+    ('ip_address', 'Own address is', re.compile(r'Own address is IP ADDR:\({(.+?:\d+)}\)')),
+    ('factorio_version', 'Factorio ', re.compile(r'Factorio (\d+\.\d+\.\d+)')),
+    ('base_mod_version', 'Loading mod base', re.compile(r'Loading mod base (\d+\.\d+\.\d+)')),
+]
+# The engine's own shutdown line, e.g. "  1520.845 Goodbye"; anchored so chat mentioning it doesn't count
+SHUTDOWN_PATTERN = re.compile(r'^\s*\d+\.\d+ (?:Info \S+: )?Goodbye\b')
+SHUTDOWN_PATTERN_BYTES = re.compile(SHUTDOWN_PATTERN.pattern.encode(), re.MULTILINE)
+# How much of the end of the consumed log is checked for a shutdown at startup
+TAIL_CHECK_BYTES = 64 * 1024
+FACT_NAMES = [name for name, _, _ in FACT_PATTERNS] + ['shutting_down']
+
+class ServerFacts:
+    """Facts about the running server, extracted from log lines as the tailer reads them.
+
+    Kept on the bot as ``bot.server_facts`` so /serverstatus can answer without
+    reading the log. ``reset()`` is called whenever the log starts over.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.save_file: Optional[str] = None
+            self.port: Optional[str] = None
+            self.ip_address: Optional[str] = None
+            self.factorio_version: Optional[str] = None
+            self.base_mod_version: Optional[str] = None
+            self.shutting_down = False
+            self.ups: Optional[float] = None
+            self.ups_updated_at: Optional[float] = None
+            self.updated_at = time.time()
+
+    def feed(self, line: str) -> bool:
+        """Update facts from one log line. Returns True if anything changed."""
+        if 'Goodbye' in line and SHUTDOWN_PATTERN.match(line):
+            with self._lock:
+                self.shutting_down = True
+                self.updated_at = time.time()
+            return True
+        for name, marker, pattern in FACT_PATTERNS:
+            if marker in line and getattr(self, name) is None:
+                match = pattern.search(line)
+                if match:
+                    with self._lock:
+                        setattr(self, name, match.group(1))
+                        self.updated_at = time.time()
+                    logger.debug(f"Server fact {name} = {match.group(1)}")
+                    return True
+        return False
+
+    def fill_missing(self, other: 'ServerFacts'):
+        """Copy facts from `other` that this instance has not seen yet."""
+        with self._lock:
+            for name in FACT_NAMES:
+                if not getattr(self, name) and getattr(other, name):
+                    setattr(self, name, getattr(other, name))
+
+    def bootstrap_from_file(self, log_file: str, end_offset: int, start_offset: Optional[int] = None):
+        """Seed facts from the part of the log the tailer has already consumed.
+
+        Meant to run in a worker thread at startup. Reading starts at the
+        launch line (``start_offset``, from the log index) and stops once the
+        startup facts are found; only the last block before ``end_offset`` is
+        then checked for a shutdown, so the cost does not grow with log size.
+        """
+        seen = ServerFacts()
+        try:
+            with open(log_file, 'rb') as f:
+                f.seek(start_offset or 0)
+                for raw_line in f:
+                    if f.tell() > end_offset or all(getattr(seen, name) for name, _, _ in FACT_PATTERNS):
+                        break
+                    seen.feed(raw_line.decode('utf-8', errors='replace'))
+                f.seek(max(0, end_offset - TAIL_CHECK_BYTES))
+                if SHUTDOWN_PATTERN_BYTES.search(f.read(min(end_offset, TAIL_CHECK_BYTES))):
+                    seen.shutting_down = True
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"Error bootstrapping server facts from {log_file}: {str(e)}")
+            return
+        self.fill_missing(seen)
+        logger.info(f"Bootstrapped server facts from {log_file}")
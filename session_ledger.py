@@ -0,0 +1,141 @@
+import datetime
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/session_ledger.log')
+
+# Heartbeat confirmations are persisted at most this often
+CONFIRM_PERSIST_SECONDS = 60
+
+def parse_log_timestamp(value: Optional[str]) -> float:
+    """Convert a verbose.log timestamp to epoch seconds, falling back to now."""
+    if value:
+        try:
+            return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+def format_duration(seconds: float) -> str:
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
+class SessionLedger:
+    """Append-only ledger of player sessions with precomputed playtime rollups.
+
+    Open sessions are persisted so a bot restart does not lose them; the next
+    [ONLINE2] snapshot passed to ``reconcile`` closes sessions for players who
+    left while the bot was away and opens sessions for players it missed.
+    online.lua only prints a snapshot when it changes, so ``confirm`` is fed
+    the softmod heartbeat to keep the end of such sessions accurate.
+    Totals and daily concurrency peaks are held in memory for O(1) queries.
+    """
+
+    def __init__(self, state_store):
+        self.state_store = state_store
+        self.open_sessions: Dict[str, float] = {}
+        self._last_confirmed: Dict[str, float] = {}
+        self._confirm_persisted_at = 0.0
+        self.totals: Dict[str, list] = {}
+        self.peaks: Dict[str, Tuple[int, float]] = {}
+        self.load()
+
+    def load(self):
+        try:
+            open_sessions = self.state_store.load_open_sessions()
+            self.open_sessions = {name: joined_at for name, (joined_at, _) in open_sessions.items()}
+            self._last_confirmed = {name: confirmed for name, (_, confirmed) in open_sessions.items()}
+            self.totals = {name: list(row) for name, row in self.state_store.load_playtime_totals().items()}
+            self.peaks = self.state_store.load_concurrency_peaks()
+            logger.info(f"Loaded playtime for {len(self.totals)} players, {len(self.open_sessions)} open sessions")
+        except Exception as e:
+            logger.error(f"Error loading session ledger: {str(e)}")
+
+    def join(self, player_name: str, timestamp: float):
+        if player_name in self.open_sessions:
+            return
+        self.open_sessions[player_name] = timestamp
+        self._last_confirmed[player_name] = timestamp
+        self.state_store.submit(self.state_store.open_session, player_name, timestamp)
+        self._record_concurrency(timestamp)
+
+    def leave(self, player_name: str, timestamp: float, reason: str = 'leave'):
+        joined_at = self.open_sessions.pop(player_name, None)
+        self._last_confirmed.pop(player_name, None)
+        if joined_at is None:
+            return None
+        duration = max(0.0, timestamp - joined_at)
+        totals = self.totals.setdefault(player_name, [0.0, 0, 0.0, 0.0])
+        totals[0] += duration
+        totals[1] += 1
+        totals[2] = max(totals[2], duration)
+        totals[3] = max(totals[3], timestamp)
+        self.state_store.submit(self.state_store.close_session, player_name, joined_at, timestamp, reason)
+        return duration
+
+    def reconcile(self, online_names: Iterable[str], timestamp: float):
+        """Bring open sessions in line with an authoritative list of online players."""
+        online = set(online_names)
+        for player_name in [name for name in self.open_sessions if name not in online]:
+            # We never saw the leave; end the session when it was last known to be online
+            left_at = self._last_confirmed.get(player_name, timestamp)
+            self.leave(player_name, left_at, reason='reconciled')
+            logger.info(f"Closed stale session for {player_name}")
+        for player_name in online - set(self.open_sessions):
+            self.join(player_name, timestamp)
+            logger.info(f"Opened missed session for {player_name}")
+        if online:
+            for player_name in online:
+                self._last_confirmed[player_name] = timestamp
+            self.state_store.submit(self.state_store.confirm_sessions, list(online), timestamp)
+        self._record_concurrency(timestamp)
+
+    def confirm(self, timestamp: float):
+        """Mark every open session as still running at timestamp, e.g. on a softmod heartbeat.
+
+        Leaves are logged while the server runs, so a session without one
+        lasted at least until the server's last heartbeat.
+        """
+        if not self.open_sessions:
+            return
+        for player_name in self.open_sessions:
+            self._last_confirmed[player_name] = timestamp
+        if timestamp - self._confirm_persisted_at >= CONFIRM_PERSIST_SECONDS:
+            self._confirm_persisted_at = timestamp
+            self.state_store.submit(self.state_store.confirm_sessions, list(self.open_sessions), timestamp)
+
+    def _record_concurrency(self, timestamp: float):
+        count = len(self.open_sessions)
+        day = datetime.date.fromtimestamp(timestamp).isoformat()
+        peak = self.peaks.get(day)
+        if count and (peak is None or count > peak[0]):
+            self.peaks[day] = (count, timestamp)
+            self.state_store.submit(self.state_store.record_concurrency_peak, day, count, timestamp)
+
+    def playtime(self, player_name: str, now: Optional[float] = None) -> Tuple[float, int, float]:
+        """Return (total seconds, session count, longest session) including any open session."""
+        total, count, longest, _ = self.totals.get(player_name, (0.0, 0, 0.0, 0.0))
+        joined_at = self.open_sessions.get(player_name)
+        if joined_at is not None:
+            current = max(0.0, (now or time.time()) - joined_at)
+            total += current
+            count += 1
+            longest = max(longest, current)
+        return total, count, longest
+
+    def top_players(self, limit: int = 10) -> List[Tuple[str, float]]:
+        now = time.time()
+        names = set(self.totals) | set(self.open_sessions)
+        ranked = sorted(((name, self.playtime(name, now)[0]) for name in names), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def peak_concurrency(self, days: Optional[int] = None) -> Optional[Tuple[int, float]]:
+        """Highest concurrent player count, optionally limited to the last `days` days."""
+        if days:
+            cutoff = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+            candidates = [peak for day, peak in self.peaks.items() if day >= cutoff]
+        else:
+            candidates = list(self.peaks.values())
+        return max(candidates, default=None)
@@ -0,0 +1,30 @@
+-- dw_protocol.lua - Versioned machine-readable event records read by D-Wire
+-- Every event is one line: "[DW1] " followed by a JSON object whose "t" field names the event.
+-- JSON escaping keeps player names with brackets, commas or spaces intact.
+-- Bump the version in the tag when a field changes meaning; the bot ignores versions it doesn't know.
+
+local protocol = {}
+
+protocol.TAG = "[DW1] "
+
+function protocol.encode(value)
+    -- helpers.table_to_json since 2.0, game.table_to_json before
+    if helpers and helpers.table_to_json then
+        return helpers.table_to_json(value)
+    end
+    return game.table_to_json(value)
+end
+
+function protocol.storage()
+    -- "storage" since 2.0, "global" before; looked up per call because the game
+    -- swaps in the saved table after control.lua has run
+    return storage or global
+end
+
+function protocol.emit(event_type, fields)
+    fields = fields or {}
+    fields.t = event_type
+    print(protocol.TAG .. protocol.encode(fields))
+end
+
+return protocol
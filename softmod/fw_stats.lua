@@ -1,10 +1,13 @@
+-- Events are emitted as "[DW1] {json}" records, see dw_protocol.lua
+local protocol = require("dw_protocol")
+
 -- https://lua-api.factorio.com/latest/events.html#on_player_died
 local function player_died(event)
     local player = game.players[event.player_index]
     
     -- Handle case where there's no cause
     if not event.cause then
-        print("[STATS-D3] [" .. player.name .. "] died from unknown cause")
+        protocol.emit("pdeath", {p = player.name})
         return
     end
     
@@ -16,11 +19,11 @@ local function player_died(event)
     
     -- Check if killed by player
     if event.cause.is_player and event.cause.is_player() then
-        print("[STATS-D1] [" .. player.name .. "] killed by player [" .. event.cause.player.name .. "] force [" .. force_name .. "]")
+        protocol.emit("pdeath", {p = player.name, k = event.cause.player.name, kp = true, f = force_name})
         return
     end
 
-    print("[STATS-D2] [" .. player.name .. "] killed by [" .. event.cause.name .. "] force [" .. force_name .. "]")
+    protocol.emit("pdeath", {p = player.name, k = event.cause.name, f = force_name})
 end
 
 local function get_weapon_name(player)
@@ -36,6 +39,43 @@ local function get_weapon_name(player)
     return "unknown"
 end
 
+-- Kills are counted in storage and flushed every KILL_FLUSH_TICKS as "kills" events with
+-- per-unit counts in "c": one per player and weapon, and one per other cause (e.g. turrets)
+-- on_nth_tick keeps one handler per interval, so this must differ from the other modules' intervals
+local KILL_FLUSH_TICKS = 1200
+
+-- Walks the stored dwire_kills down the given keys, creating tables on the way, and counts one kill
+local function count_kill(unit_name, ...)
+    local store = protocol.storage()
+    store.dwire_kills = store.dwire_kills or {}
+    local node = store.dwire_kills
+    for _, key in ipairs({...}) do
+        if not node[key] then
+            node[key] = {}
+        end
+        node = node[key]
+    end
+    node[unit_name] = (node[unit_name] or 0) + 1
+end
+
+local function flush_kills()
+    local store = protocol.storage()
+    if not store.dwire_kills then
+        return
+    end
+    for player_name, weapons in pairs(store.dwire_kills.player or {}) do
+        for weapon_name, units in pairs(weapons) do
+            protocol.emit("kills", {p = player_name, w = weapon_name, c = units})
+        end
+    end
+    for cause_name, units in pairs(store.dwire_kills.other or {}) do
+        protocol.emit("kills", {s = cause_name, c = units})
+    end
+    store.dwire_kills = {}
+end
+
+script.on_nth_tick(KILL_FLUSH_TICKS, flush_kills)
+
 -- https://lua-api.factorio.com/latest/events.html#on_entity_died
 local function entity_died(event)
     if not event.cause then
@@ -46,12 +86,11 @@ local function entity_died(event)
     if event.cause.type == "character" then
         player = event.cause.player
         if player then
-            local weapon_name = get_weapon_name(player)
-            print("[STATS-E1] [" .. player.name .. "] killed [" .. event.entity.name .. "] with [" .. weapon_name .. "]")
+            count_kill(event.entity.name, "player", player.name, get_weapon_name(player))
         end
 
     elseif event.cause.name and event.entity and event.entity.name and event.entity.name ~= "character" then
-        print("[STATS-E2] [" .. event.cause.name .. "] killed [" .. event.entity.name .. "]")
+        count_kill(event.entity.name, "other", event.cause.name)
     end
 end
 
@@ -1,22 +1,13 @@
 -- logging.lua - Factorio logging module with standardized output patterns
 
--- Helper function for timestamp format
-local function get_formatted_time()
-    -- Use game.tick to calculate hours, minutes, seconds
-    local total_seconds = game.tick / 60
-    local hours = math.floor(total_seconds / 3600)
-    local minutes = math.floor((total_seconds % 3600) / 60)
-    local seconds = math.floor(total_seconds % 60)
-    
-    -- Format as HH:MM:SS
-    return string.format("%02d:%02d:%02d", hours, minutes, seconds)
-end
+-- Events are emitted as "[DW1] {json}" records, see dw_protocol.lua
+local protocol = require("dw_protocol")
 
 -- Player disconnect/leave event
 script.on_event(defines.events.on_player_left_game, function(event)
     local player = game.players[event.player_index]
     if player then
-        print(get_formatted_time() .. " [LEAVE] " .. player.name .. " left the game")
+        protocol.emit("leave", {p = player.name})
     end
 end)
 
@@ -24,19 +15,53 @@ end)
 script.on_event(defines.events.on_research_finished, function(event)
     if event and event.research then
         local research = event.research
-        print(get_formatted_time() .. " [MSG] Research " .. research.name .. " completed.")
+        protocol.emit("research", {n = research.name})
     end
 end)
 
+-- Mined and placed entities are counted per player in storage and flushed as
+-- one "act" event per player and action, with per-entity counts in "c"
+-- on_nth_tick keeps one handler per interval, so this must differ from the other modules' intervals
+local ACTION_FLUSH_TICKS = 1800
+
+local function count_action(action, player_name, entity_name)
+    local store = protocol.storage()
+    store.dwire_actions = store.dwire_actions or {}
+    local players = store.dwire_actions[action]
+    if not players then
+        players = {}
+        store.dwire_actions[action] = players
+    end
+    local entities = players[player_name]
+    if not entities then
+        entities = {}
+        players[player_name] = entities
+    end
+    entities[entity_name] = (entities[entity_name] or 0) + 1
+end
+
+local function flush_actions()
+    local store = protocol.storage()
+    if not store.dwire_actions then
+        return
+    end
+    for action, players in pairs(store.dwire_actions) do
+        for player_name, entities in pairs(players) do
+            protocol.emit("act", {p = player_name, a = action, c = entities})
+        end
+    end
+    store.dwire_actions = {}
+end
+
+script.on_nth_tick(ACTION_FLUSH_TICKS, flush_actions)
+
 -- Mining event
 script.on_event(defines.events.on_pre_player_mined_item, function(event)
     if event and event.entity and event.player_index then
         local player = game.players[event.player_index]
         local obj = event.entity
         if obj and obj.valid and player and player.valid then
-            local position = obj.position
-            print(get_formatted_time() .. " [ACT] " .. player.name .. " mined " .. obj.name .. 
-                      " [gps=" .. position.x .. "," .. position.y .. "]")
+            count_action("mined", player.name, obj.name)
         end
     end
 end)
@@ -49,7 +74,7 @@ script.on_event(defines.events.on_built_entity, function(event)
         if obj.name ~= "entity-ghost" and 
            obj.name ~= "tile-ghost" and 
            obj.name ~= "tile" then
-            print(get_formatted_time() .. " [ACT] " .. player.name .. " placed " .. obj.name)
+            count_action("placed", player.name, obj.name)
         end
     end
 end)
@@ -58,7 +83,7 @@ end)
 script.on_event(defines.events.on_player_joined_game, function(event)
     local player = game.players[event.player_index]
     if player then
-        print(get_formatted_time() .. " [JOIN] " .. player.name .. " joined the game")
+        protocol.emit("join", {p = player.name})
     end
 end)
 
@@ -68,13 +93,12 @@ script.on_event(defines.events.on_player_died, function(event)
     local cause = event.cause
     
     if player then
-        if cause then
-            print(get_formatted_time() .. " [MSG] " .. player.name .. " was killed by " .. cause.name .. " at [gps=" ..
-                      player.position.x .. "," .. player.position.y .. "]")
-        else
-            print(get_formatted_time() .. " [MSG] " .. player.name .. " died at [gps=" ..
-                      player.position.x .. "," .. player.position.y .. "]")
-        end
+        protocol.emit("death", {
+            p = player.name,
+            c = cause and cause.name or nil,
+            x = player.position.x,
+            y = player.position.y
+        })
     end
 end)
 
@@ -83,7 +107,7 @@ script.on_event(defines.events.on_console_chat, function(event)
     if event.player_index then
         local player = game.players[event.player_index]
         if player and event.message then
-            print(get_formatted_time() .. " [CHAT] " .. player.name .. ": " .. event.message)
+            protocol.emit("chat", {p = player.name, m = event.message})
         end
     end
 end)
@@ -95,10 +119,15 @@ script.on_event(defines.events.on_tick, function(event)
         for _, player in pairs(game.connected_players) do
             table.insert(players, player.name)
         end
-        print("[ONLINE2] " .. table.concat(players, ", "))
+        protocol.emit("online", {p = players})
     end
 end)
 
+-- Heartbeat every 10 seconds at full speed; the bot derives UPS from tick vs wall-clock deltas
+script.on_nth_tick(600, function(event)
+    protocol.emit("heartbeat", {tick = event.tick, speed = game.speed})
+end)
+
 -- Command logging
 function on_console_command(event)
     if event and event.command and event.parameters then
@@ -115,9 +144,9 @@ function on_console_command(event)
 
         if event.player_index then
             local player = game.players[event.player_index]
-            print(string.format("[CMD] NAME: %s, COMMAND: %s, ARGS: %s", player.name, command, args))
+            protocol.emit("cmd", {p = player.name, c = command, a = args})
         elseif command ~= "time" and command ~= "online" and command ~= "server-save" and command ~= "p" then -- Ignore spammy console commands
-            print(string.format("[CMD] NAME: CONSOLE, COMMAND: %s, ARGS: %s", command, args))
+            protocol.emit("cmd", {c = command, a = args})
         end
     end
 end
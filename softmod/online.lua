@@ -1,5 +1,8 @@
 -- online.lua - Track and report online players
 
+-- Events are emitted as "[DW1] {json}" records, see dw_protocol.lua
+local protocol = require("dw_protocol")
+
 -- Use local storage for the scenario level
 local storage = {
     player_list = {},
@@ -9,22 +12,25 @@ local storage = {
 
 -- Function to update and show online players
 local function update_player_list()
-    local buf = "[ONLINE2] "
-    local count = 0
+    local players = {}
     
     for i, target in pairs(storage.player_list) do
         if target and target.victim and target.victim.connected then
-            buf = buf .. target.victim.name .. "," .. 
-                  math.floor(target.score / 60 / 60) .. "," ..
-                  math.floor(target.time / 60 / 60) .. "," .. 
-                  target.type .. "," .. target.afk .. ";"
+            table.insert(players, {
+                n = target.victim.name,
+                s = math.floor(target.score / 60 / 60),
+                m = math.floor(target.time / 60 / 60),
+                r = target.type,
+                a = target.afk
+            })
         end
     end
     
     -- Don't send unless there is a change
+    local buf = protocol.encode(players)
     if storage.lastonlinestring ~= buf then
         storage.lastonlinestring = buf
-        print(buf)
+        protocol.emit("online", {p = players})
     end
 end
 
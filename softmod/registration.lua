@@ -1,6 +1,10 @@
 -- register.lua - Simple registration command handler for Factorio
 
 -- registration.lua
+
+-- Events are emitted as "[DW1] {json}" records, see dw_protocol.lua
+local protocol = require("dw_protocol")
+
 local function smart_print(player, message)
     if player then
         player.print(message)
@@ -14,7 +18,7 @@ commands.add_command("register", "<code> (Requires a registration code from disc
         local player = game.players[param.player_index]
 
         if param.parameter and player and player.valid then
-            print("[ACCESS] " .. player.name .. " " .. param.parameter)
+            protocol.emit("access", {p = player.name, code = param.parameter})
             smart_print(player, "Sending registration code...")
             return
         end
@@ -0,0 +1,61 @@
+"""Decoder for the softmod's versioned event records (softmod/dw_protocol.lua).
+
+Each record is one line, ``[DW1] {"t": "<type>", ...}``, with short field
+names per type:
+
+    act        p player, a 'mined'|'placed', c {entity: count}
+    kills      p player and w weapon, or s other cause; c {unit: count}
+    pdeath     p player, k killer (absent if unknown), kp killer is a player, f killer force
+    online     p [name, ...] (logging.lua) or [{n, s score, m minutes, r rank, a afk}, ...] (online.lua)
+    cmd        p player (absent for the console), c command, a arguments
+    access     p player, code
+    heartbeat  tick, speed
+    research   n research name
+    death      p player, c cause, x, y
+    join, leave, chat   p player (and m message for chat)
+
+Lines in the older human-formatted tags are still parsed by the regexes
+next to their consumers; this module only covers the new records.
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+PROTOCOL_TAG = '[DW1] '
+# Event type -> ReadLogCog message type whose subscribers receive the line
+EVENT_MESSAGE_TYPES = {
+    'act': 'ACT',
+    'kills': 'STATS-E1',
+    'pdeath': 'STATS-D2',
+    'online': 'ONLINE2',
+    'cmd': 'CMD',
+    'access': 'ACCESS',
+    'heartbeat': 'HEARTBEAT',
+}
+
+Event = Dict[str, Any]
+
+@lru_cache(maxsize=64)
+def decode(line: str) -> Optional[Event]:
+    """The event of a [DW1] line, or None for any other line or a malformed record.
+
+    Cached, so every subscriber handed the same line can call this without
+    parsing it again; callers must not modify the returned dict.
+    """
+    # Only the softmod writes at the start of a line; a record quoted in chat is just chat
+    if not line.startswith(PROTOCOL_TAG):
+        return None
+    try:
+        event = json.loads(line[len(PROTOCOL_TAG):])
+    except ValueError:
+        return None
+    if not isinstance(event, dict) or not isinstance(event.get('t'), str):
+        return None
+    return event
+
+def counts(event: Event) -> Dict[str, int]:
+    """The {name: count} map of an act/kills event; table_to_json writes an empty one as []"""
+    value = event.get('c')
+    if not isinstance(value, dict):
+        return {}
+    return {name: int(count) for name, count in value.items() if isinstance(count, (int, float)) and count > 0}
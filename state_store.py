@@ -0,0 +1,427 @@
+import asyncio
+import datetime
+import functools
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from logger import setup_logger
+
+logger = setup_logger(__name__, 'logs/state_store.log')
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# Append new migrations; never edit one that has shipped.
+SCHEMA_MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS registrations (
+        discord_id TEXT PRIMARY KEY,
+        player_name TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_registrations_player ON registrations(player_name);
+
+    CREATE TABLE IF NOT EXISTS last_seen (
+        player_name TEXT PRIMARY KEY,
+        last_seen REAL NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS location_prefs (
+        discord_id TEXT PRIMARY KEY,
+        factorio_username TEXT,
+        show_location INTEGER NOT NULL DEFAULT 1
+    );
+
+    CREATE TABLE IF NOT EXISTS role_assignments (
+        role_id TEXT NOT NULL,
+        member_id TEXT NOT NULL,
+        PRIMARY KEY (role_id, member_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS mod_urls (
+        mod_name TEXT PRIMARY KEY,
+        url TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS log_positions (
+        log_name TEXT PRIMARY KEY,
+        position INTEGER NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS server_info (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        command TEXT,
+        pid INTEGER
+    );
+    """,
+    """
+    ALTER TABLE last_seen ADD COLUMN last_session_seconds REAL;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY,
+        player_name TEXT NOT NULL,
+        joined_at REAL NOT NULL,
+        left_at REAL NOT NULL,
+        close_reason TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_player ON sessions(player_name, joined_at);
+
+    CREATE TABLE IF NOT EXISTS open_sessions (
+        player_name TEXT PRIMARY KEY,
+        joined_at REAL NOT NULL,
+        last_confirmed REAL NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS playtime_totals (
+        player_name TEXT PRIMARY KEY,
+        total_seconds REAL NOT NULL,
+        session_count INTEGER NOT NULL,
+        longest_seconds REAL NOT NULL,
+        last_left REAL NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS concurrency_peaks (
+        day TEXT PRIMARY KEY,
+        peak INTEGER NOT NULL,
+        peak_at REAL NOT NULL
+    );
+    """,
+    """
+    ALTER TABLE log_positions ADD COLUMN inode INTEGER;
+    """,
+    """
+    ALTER TABLE log_positions ADD COLUMN line_hash TEXT;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS geo_join_counts (
+        day TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        country TEXT NOT NULL,
+        region TEXT NOT NULL,
+        joins INTEGER NOT NULL,
+        PRIMARY KEY (day, hour, country, region)
+    );
+
+    CREATE TABLE IF NOT EXISTS geo_players (
+        day TEXT NOT NULL,
+        country TEXT NOT NULL,
+        region TEXT NOT NULL,
+        player_name TEXT NOT NULL,
+        PRIMARY KEY (day, country, region, player_name)
+    );
+    """,
+]
+
+class StateStore:
+    """Single SQLite database (WAL mode) holding the bot's persistent state.
+
+    Every method below is a small synchronous transaction and is safe to call
+    from any thread. From coroutines, use ``await store.run(fn, *args)`` to
+    execute one on the store's writer thread, or ``store.submit(fn, *args)``
+    for fire-and-forget writes. Both go through one worker thread, so queued
+    writes are applied in the order they were issued.
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='state-store')
+        self._migrate_schema()
+        logger.info(f"State store opened at {db_file}")
+
+    def _migrate_schema(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for index, script in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+                self._conn.executescript(f"BEGIN; {script}; PRAGMA user_version = {index}; COMMIT;")
+                logger.info(f"Applied state store schema migration {index}")
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def _executemany(self, sql, rows):
+        with self._lock, self._conn:
+            return self._conn.executemany(sql, rows)
+
+    def _fetchall(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def run(self, fn, *args):
+        """Run a store method on the writer thread and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    def submit(self, fn, *args):
+        """Queue a store method on the writer thread without waiting for it."""
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if future.exception():
+            logger.error(f"State store write failed: {future.exception()}")
+
+    def close(self):
+        """Drain queued writes and close the database."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+        logger.info("State store closed")
+
+    # Registrations
+
+    def load_registrations(self) -> Dict[str, str]:
+        return dict(self._fetchall("SELECT discord_id, player_name FROM registrations"))
+
+    def upsert_registration(self, discord_id, player_name: str):
+        self._execute("""INSERT INTO registrations (discord_id, player_name) VALUES (?, ?)
+                         ON CONFLICT(discord_id) DO UPDATE SET player_name = excluded.player_name""",
+                      (str(discord_id), player_name))
+
+    def delete_registration(self, discord_id):
+        self._execute("DELETE FROM registrations WHERE discord_id = ?", (str(discord_id),))
+
+    # Last seen
+
+    def load_last_seen(self) -> Dict[str, Tuple[float, Optional[float]]]:
+        """Return player name -> (last seen timestamp, last session length in seconds)."""
+        rows = self._fetchall("SELECT player_name, last_seen, last_session_seconds FROM last_seen")
+        return {name: (last_seen, session) for name, last_seen, session in rows}
+
+    def upsert_last_seen(self, player_name: str, timestamp: float, session_seconds: Optional[float] = None):
+        self.upsert_last_seen_many([(player_name, timestamp, session_seconds)])
+
+    def upsert_last_seen_many(self, rows):
+        """Upsert (player_name, timestamp, session_seconds) rows in one transaction.
+
+        A session length of None keeps whatever was stored before.
+        """
+        self._executemany("""INSERT INTO last_seen (player_name, last_seen, last_session_seconds) VALUES (?, ?, ?)
+                             ON CONFLICT(player_name) DO UPDATE SET
+                                 last_seen = excluded.last_seen,
+                                 last_session_seconds = COALESCE(excluded.last_session_seconds, last_session_seconds)""",
+                          rows)
+
+    # Player sessions
+
+    def load_open_sessions(self) -> Dict[str, Tuple[float, float]]:
+        """Return player name -> (joined_at, last_confirmed) for sessions not yet closed."""
+        rows = self._fetchall("SELECT player_name, joined_at, last_confirmed FROM open_sessions")
+        return {name: (joined_at, confirmed) for name, joined_at, confirmed in rows}
+
+    def open_session(self, player_name: str, joined_at: float):
+        self._execute("""INSERT INTO open_sessions (player_name, joined_at, last_confirmed) VALUES (?, ?, ?)
+                         ON CONFLICT(player_name) DO NOTHING""",
+                      (player_name, joined_at, joined_at))
+
+    def confirm_sessions(self, player_names, timestamp: float):
+        self._executemany("UPDATE open_sessions SET last_confirmed = ? WHERE player_name = ?",
+                          [(timestamp, name) for name in player_names])
+
+    def close_session(self, player_name: str, joined_at: float, left_at: float, close_reason: str):
+        """Append a finished session to the ledger and fold it into the player's rollup."""
+        duration = max(0.0, left_at - joined_at)
+        with self._lock, self._conn:
+            self._conn.execute("""INSERT INTO sessions (player_name, joined_at, left_at, close_reason)
+                                  VALUES (?, ?, ?, ?)""",
+                               (player_name, joined_at, left_at, close_reason))
+            self._conn.execute("""INSERT INTO playtime_totals (player_name, total_seconds, session_count, longest_seconds, last_left)
+                                  VALUES (?, ?, 1, ?, ?)
+                                  ON CONFLICT(player_name) DO UPDATE SET
+                                      total_seconds = total_seconds + excluded.total_seconds,
+                                      session_count = session_count + 1,
+                                      longest_seconds = MAX(longest_seconds, excluded.longest_seconds),
+                                      last_left = MAX(last_left, excluded.last_left)""",
+                               (player_name, duration, duration, left_at))
+            self._conn.execute("DELETE FROM open_sessions WHERE player_name = ?", (player_name,))
+
+    def load_playtime_totals(self) -> Dict[str, Tuple[float, int, float, float]]:
+        """Return player name -> (total_seconds, session_count, longest_seconds, last_left)."""
+        rows = self._fetchall("""SELECT player_name, total_seconds, session_count, longest_seconds, last_left
+                                 FROM playtime_totals""")
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def load_concurrency_peaks(self) -> Dict[str, Tuple[int, float]]:
+        return {day: (peak, peak_at) for day, peak, peak_at in
+                self._fetchall("SELECT day, peak, peak_at FROM concurrency_peaks")}
+
+    def record_concurrency_peak(self, day: str, peak: int, peak_at: float):
+        self._execute("""INSERT INTO concurrency_peaks (day, peak, peak_at) VALUES (?, ?, ?)
+                         ON CONFLICT(day) DO UPDATE SET peak = excluded.peak, peak_at = excluded.peak_at
+                         WHERE excluded.peak > concurrency_peaks.peak""",
+                      (day, peak, peak_at))
+
+    # Join geography
+
+    def load_geo_join_counts(self) -> Dict[Tuple[str, int, str, str], int]:
+        """Return (day, hour, country, region) -> joins."""
+        return {(day, hour, country, region): joins for day, hour, country, region, joins in
+                self._fetchall("SELECT day, hour, country, region, joins FROM geo_join_counts")}
+
+    def load_geo_players(self) -> List[Tuple[str, str, str, str]]:
+        """Return (day, country, region, player_name) rows."""
+        return self._fetchall("SELECT day, country, region, player_name FROM geo_players")
+
+    def record_geo_join(self, day: str, hour: int, country: str, region: str, player_name: str):
+        with self._lock, self._conn:
+            self._conn.execute("""INSERT INTO geo_join_counts (day, hour, country, region, joins) VALUES (?, ?, ?, ?, 1)
+                                  ON CONFLICT(day, hour, country, region) DO UPDATE SET joins = joins + 1""",
+                               (day, hour, country, region))
+            self._conn.execute("INSERT OR IGNORE INTO geo_players (day, country, region, player_name) VALUES (?, ?, ?, ?)",
+                               (day, country, region, player_name))
+
+    # Location preferences
+
+    def load_location_prefs(self) -> Dict[str, dict]:
+        rows = self._fetchall("SELECT discord_id, factorio_username, show_location FROM location_prefs")
+        return {discord_id: {'show_location': bool(show), 'factorio_username': username}
+                for discord_id, username, show in rows}
+
+    def upsert_location_pref(self, discord_id, factorio_username: Optional[str], show_location: bool):
+        self._execute("""INSERT INTO location_prefs (discord_id, factorio_username, show_location) VALUES (?, ?, ?)
+                         ON CONFLICT(discord_id) DO UPDATE SET factorio_username = excluded.factorio_username,
+                                                               show_location = excluded.show_location""",
+                      (str(discord_id), factorio_username, int(bool(show_location))))
+
+    # Role assignments
+
+    def get_role_members(self, role_id) -> List[str]:
+        return [row[0] for row in self._fetchall(
+            "SELECT member_id FROM role_assignments WHERE role_id = ?", (str(role_id),))]
+
+    def add_role_assignment(self, role_id, member_id) -> bool:
+        """Record a role assignment. Returns False if it was already recorded."""
+        cursor = self._execute("INSERT OR IGNORE INTO role_assignments (role_id, member_id) VALUES (?, ?)",
+                               (str(role_id), str(member_id)))
+        return cursor.rowcount > 0
+
+    def move_role_assignments(self, old_role_id, new_role_id):
+        with self._lock, self._conn:
+            self._conn.execute("""INSERT OR IGNORE INTO role_assignments (role_id, member_id)
+                                  SELECT ?, member_id FROM role_assignments WHERE role_id = ?""",
+                               (str(new_role_id), str(old_role_id)))
+            self._conn.execute("DELETE FROM role_assignments WHERE role_id = ?", (str(old_role_id),))
+
+    # Mod URLs
+
+    def load_mod_urls(self) -> Dict[str, str]:
+        return dict(self._fetchall("SELECT mod_name, url FROM mod_urls"))
+
+    def upsert_mod_url(self, mod_name: str, url: str):
+        self._execute("""INSERT INTO mod_urls (mod_name, url) VALUES (?, ?)
+                         ON CONFLICT(mod_name) DO UPDATE SET url = excluded.url""",
+                      (mod_name, url))
+
+    def delete_mod_url(self, mod_name: str):
+        self._execute("DELETE FROM mod_urls WHERE mod_name = ?", (mod_name,))
+
+    # Log tailer positions
+
+    def get_log_position(self, log_name: str) -> int:
+        return self.get_log_checkpoint(log_name)[0]
+
+    def get_log_checkpoint(self, log_name: str) -> Tuple[int, Optional[int], Optional[str]]:
+        """Return (position, inode, hash of the line ending at position) for a tailed log.
+
+        inode and hash are None if they were never recorded.
+        """
+        rows = self._fetchall("SELECT position, inode, line_hash FROM log_positions WHERE log_name = ?", (log_name,))
+        return rows[0] if rows else (0, None, None)
+
+    def set_log_position(self, log_name: str, position: int, inode: Optional[int] = None,
+                         line_hash: Optional[str] = None):
+        """Record how far a log has been read. The checkpoint fields are written together."""
+        self._execute("""INSERT INTO log_positions (log_name, position, inode, line_hash) VALUES (?, ?, ?, ?)
+                         ON CONFLICT(log_name) DO UPDATE SET position = excluded.position,
+                         inode = COALESCE(excluded.inode, log_positions.inode),
+                         line_hash = excluded.line_hash""",
+                      (log_name, position, inode, line_hash))
+
+    # Server process info
+
+    def get_server_info(self) -> Optional[Tuple[str, int]]:
+        rows = self._fetchall("SELECT command, pid FROM server_info WHERE id = 1")
+        return rows[0] if rows else None
+
+    def set_server_info(self, command: str, pid: int):
+        self._execute("""INSERT INTO server_info (id, command, pid) VALUES (1, ?, ?)
+                         ON CONFLICT(id) DO UPDATE SET command = excluded.command, pid = excluded.pid""",
+                      (command, pid))
+
+    def clear_server_info(self):
+        self._execute("DELETE FROM server_info WHERE id = 1")
+
+    # Migration from the legacy JSON/text files
+
+    def import_legacy_files(self, base_dir: str):
+        """Import the pre-database state files from base_dir, renaming each to *.migrated."""
+        importers = {
+            'registrations.json': self._import_registrations,
+            'last_seen.json': self._import_last_seen,
+            'location_prefs.json': self._import_location_prefs,
+            'role_assignments.json': self._import_role_assignments,
+            'mod_urls.json': self._import_mod_urls,
+            'last_position.txt': self._import_last_position,
+            'server_info.txt': self._import_server_info,
+        }
+        for file_name, importer in importers.items():
+            path = os.path.join(base_dir, file_name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                with open(path, 'r') as f:
+                    content = f.read()
+                count = importer(content)
+                os.replace(path, path + '.migrated')
+                logger.info(f"Imported {count} record(s) from {file_name}")
+            except Exception as e:
+                logger.error(f"Error importing {file_name}: {str(e)}")
+
+    def _import_registrations(self, content):
+        data = json.loads(content or '{}')
+        self._executemany("INSERT OR REPLACE INTO registrations (discord_id, player_name) VALUES (?, ?)",
+                          [(str(k), v) for k, v in data.items()])
+        return len(data)
+
+    def _import_last_seen(self, content):
+        data = json.loads(content or '{}')
+        self._executemany("INSERT OR REPLACE INTO last_seen (player_name, last_seen) VALUES (?, ?)",
+                          [(k, datetime.datetime.fromisoformat(v).timestamp()) for k, v in data.items()])
+        return len(data)
+
+    def _import_location_prefs(self, content):
+        data = json.loads(content or '{}')
+        self._executemany("""INSERT OR REPLACE INTO location_prefs (discord_id, factorio_username, show_location)
+                             VALUES (?, ?, ?)""",
+                          [(str(k), v.get('factorio_username'), int(bool(v.get('show_location', True))))
+                           for k, v in data.items()])
+        return len(data)
+
+    def _import_role_assignments(self, content):
+        data = json.loads(content or '{}')
+        rows = [(str(role_id), str(member_id)) for role_id, members in data.items() for member_id in members]
+        self._executemany("INSERT OR IGNORE INTO role_assignments (role_id, member_id) VALUES (?, ?)", rows)
+        return len(rows)
+
+    def _import_mod_urls(self, content):
+        data = json.loads(content or '{}')
+        self._executemany("INSERT OR REPLACE INTO mod_urls (mod_name, url) VALUES (?, ?)", list(data.items()))
+        return len(data)
+
+    def _import_last_position(self, content):
+        self.set_log_position('verbose', int(content.strip() or 0))
+        return 1
+
+    def _import_server_info(self, content):
+        lines = content.splitlines()
+        if len(lines) < 2:
+            return 0
+        self.set_server_info(lines[0].strip(), int(lines[1].strip()))
+        return 1
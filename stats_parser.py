@@ -0,0 +1,131 @@
+import re
+from typing import List, Optional, Tuple
+from softmod_protocol import PROTOCOL_TAG, counts, decode
+
+# Markers of the lines ReadLogCog routes to the stats subscribers
+STATS_MARKERS = ('[STATS-E1]', '[STATS-D2]', '[ACT]', PROTOCOL_TAG)
+
+STATS_PATTERNS = {
+    'stats_kill': re.compile(r"\[STATS-E1\] \[([^]]+)] killed \[([^]]+)] with \[([^]]+)]"),
+    'stats_death': re.compile(r"\[STATS-D2\] \[([^]]+)] killed by \[([^]]+)] force \[enemy]"),
+    'stats_place': re.compile(r"\[ACT\] ([^[\]]+) placed"),
+    'stats_mine': re.compile(r"\[ACT\] ([^[\]]+) mined ([^[\]]+) \[")  # Simplified mining pattern
+}
+
+# List of tree-related entities to ignore - expanded list
+TREE_ENTITIES = [
+    'tree-01', 'tree-02', 'tree-03', 'tree-04', 'tree-05',
+    'tree-06', 'tree-07', 'tree-08', 'tree-09', 'dead-',
+    'dry-hairy-tree', 'dry-tree', 'dead-dry-hairy-tree',
+    'dead-grey-trunk', 'dead-tree-desert', 'demolisher-',
+    '-tree-', 'volcanic'
+]
+
+# Counter table -> the columns that identify one counter
+STATS_TABLES = {
+    'player_stats': ('player_name', 'action', 'unit', 'weapon'),
+    'player_deaths': ('player_name', 'killed_by'),
+    'player_placed': ('player_name',),
+    'player_mined': ('player_name', 'item_type'),
+}
+
+CREATE_TABLES_SQL = [
+    """CREATE TABLE IF NOT EXISTS player_stats
+                (player_name TEXT,
+                 action TEXT,
+                 unit TEXT,
+                 weapon TEXT,
+                 count INTEGER DEFAULT 1,
+                 UNIQUE(player_name, action, unit, weapon))""",
+    """CREATE TABLE IF NOT EXISTS player_deaths
+                (player_name TEXT,
+                 killed_by TEXT,
+                 count INTEGER DEFAULT 1,
+                 UNIQUE(player_name, killed_by))""",
+    """CREATE TABLE IF NOT EXISTS player_placed
+                (player_name TEXT UNIQUE,
+                 count INTEGER DEFAULT 1)""",
+    """CREATE TABLE IF NOT EXISTS player_mined
+                (player_name TEXT,
+                 item_type TEXT,
+                 count INTEGER DEFAULT 1,
+                 UNIQUE(player_name, item_type))""",
+    # Where in the verbose log the counts above are up to, committed with them
+    """CREATE TABLE IF NOT EXISTS ingest_cursor
+                (log_name TEXT PRIMARY KEY,
+                 inode INTEGER,
+                 position INTEGER)""",
+]
+
+def is_tree_entity(unit: str) -> bool:
+    """Check if an entity is tree-related"""
+    return any(tree_type in unit for tree_type in TREE_ENTITIES)
+
+def parse_stats_line(line: str) -> Optional[Tuple[str, tuple]]:
+    """Map a stats log line to the (table, key) of the counter it increments, or None."""
+    mine_match = STATS_PATTERNS['stats_mine'].search(line)
+    if mine_match:
+        return 'player_mined', mine_match.groups()
+
+    kill_match = STATS_PATTERNS['stats_kill'].search(line)
+    if kill_match:
+        player_name, unit, weapon = kill_match.groups()
+        if is_tree_entity(unit):
+            return None
+        return 'player_stats', (player_name, 'kill', unit, weapon)
+
+    death_match = STATS_PATTERNS['stats_death'].search(line)
+    if death_match:
+        return 'player_deaths', death_match.groups()
+
+    place_match = STATS_PATTERNS['stats_place'].search(line)
+    if place_match:
+        return 'player_placed', (place_match.group(1),)
+
+    return None
+
+def parse_stats_counts(line: str) -> List[Tuple[str, tuple, int]]:
+    """Map a stats log line to the (table, key, count) of every counter it increments.
+
+    [DW1] records carry many counters each; the per-event lines of older
+    softmods map to a single counter with count 1.
+    """
+    event = decode(line)
+    if event:
+        return event_counts(event)
+
+    counter = parse_stats_line(line)
+    if counter:
+        table, key = counter
+        return [(table, key, 1)]
+    return []
+
+def event_counts(event: dict) -> List[Tuple[str, tuple, int]]:
+    """(table, key, count) of the counters a decoded softmod record increments"""
+    event_type = event['t']
+    player_name = event.get('p')
+    if not player_name:
+        return []
+    if event_type == 'act':
+        if event.get('a') == 'placed':
+            # Placements are counted per player only
+            total = sum(counts(event).values())
+            return [('player_placed', (player_name,), total)] if total else []
+        if event.get('a') == 'mined':
+            return [('player_mined', (player_name, item_type), count) for item_type, count in counts(event).items()]
+    elif event_type == 'kills':
+        weapon = event.get('w', 'unknown')
+        return [('player_stats', (player_name, 'kill', unit, weapon), count)
+                for unit, count in counts(event).items() if not is_tree_entity(unit)]
+    elif event_type == 'pdeath':
+        # Like [STATS-D2]: deaths to the enemy force only
+        if event.get('k') and not event.get('kp') and event.get('f') == 'enemy':
+            return [('player_deaths', (player_name, event['k']), 1)]
+    return []
+
+def upsert_sql(table: str) -> str:
+    """INSERT that adds its count parameter onto an existing counter row."""
+    columns = STATS_TABLES[table]
+    placeholders = ', '.join('?' for _ in range(len(columns) + 1))
+    return (f"INSERT INTO {table} ({', '.join(columns)}, count) VALUES ({placeholders}) "
+            f"ON CONFLICT({', '.join(columns)}) DO UPDATE SET count = count + excluded.count")
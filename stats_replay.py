@@ -0,0 +1,190 @@
+"""Rebuild player stats by replaying verbose logs through the stats parser.
+
+Logs are split into byte-range chunks (gzip archives are one chunk each)
+that are parsed in a process pool. Each worker returns partial counter
+aggregates for its chunk, and these are merged into the target database
+together with a progress row in a single transaction. Re-running the same
+command resumes: only byte ranges without a progress row are replayed.
+
+Run from the repository root::
+
+    python stats_replay.py --db player_stats.replay.db /opt/factorio/logs/previous_*_verbose.log*
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from logger import setup_logger
+from softmod_protocol import PROTOCOL_TAG
+from stats_parser import CREATE_TABLES_SQL, parse_stats_counts, upsert_sql
+
+logger = setup_logger(__name__, 'logs/stats_replay.log')
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+# Cheap byte-level test before decoding and running the stats regexes
+STATS_PREFILTER = (b'[STATS-', b'[ACT', PROTOCOL_TAG.encode())
+
+Chunk = Tuple[str, int, Optional[int]]  # path, start offset, end offset (None = EOF)
+
+def source_key(path: str) -> str:
+    """Progress key for a log; a rotated log keeps its key once it has been gzipped."""
+    name = os.path.basename(path)
+    return name[:-3] if name.endswith('.gz') else name
+
+def read_chunk_lines(path: str, start: int, end: Optional[int]) -> Iterator[bytes]:
+    """Complete lines whose first byte lies in [start, end)."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        offset = 0
+        if start:
+            # Skip the line straddling the chunk start; the previous chunk owns it
+            f.seek(start - 1)
+            offset = start - 1 + len(f.readline())
+        for line in f:
+            if end is not None and offset >= end:
+                break
+            if not line.endswith(b'\n'):
+                break  # Partial line still being written
+            offset += len(line)
+            yield line
+
+def aggregate_chunk(path: str, start: int, end: Optional[int]):
+    """Count stats events in one chunk. Runs in a worker process."""
+    partial: Dict[str, Counter] = {}
+    lines = 0
+    for raw_line in read_chunk_lines(path, start, end):
+        lines += 1
+        if not any(marker in raw_line for marker in STATS_PREFILTER):
+            continue
+        for table, key, count in parse_stats_counts(raw_line.decode('utf-8', errors='replace')):
+            partial.setdefault(table, Counter())[tuple(key)] += count
+    return path, start, end, partial, lines
+
+def open_target(db_file: str) -> sqlite3.Connection:
+    """Open (or create) a stats database with the replay progress table."""
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    for create_table in CREATE_TABLES_SQL:
+        conn.execute(create_table)
+    conn.execute("""CREATE TABLE IF NOT EXISTS replay_progress
+                    (source TEXT,
+                     start INTEGER,
+                     end INTEGER,
+                     lines INTEGER,
+                     PRIMARY KEY (source, start))""")
+    conn.commit()
+    return conn
+
+def plan_chunks(conn: sqlite3.Connection, sources: List[Tuple[str, Optional[int]]], chunk_bytes: int) -> List[Chunk]:
+    """Split the byte ranges of each source that have no progress row into chunks.
+
+    sources holds (path, end offset); an end of None means the whole file.
+    """
+    chunks = []
+    for path, end in sources:
+        compressed = path.endswith('.gz')
+        if end is None and not compressed:
+            end = os.path.getsize(path)
+        done = conn.execute("SELECT start, end FROM replay_progress WHERE source = ? ORDER BY start",
+                            (source_key(path),)).fetchall()
+        gaps = []
+        position = 0
+        for done_start, done_end in done:
+            if done_start > position:
+                gaps.append((position, done_start))
+            position = float('inf') if done_end < 0 else max(position, done_end)
+        if end is None or position < end:
+            gaps.append((position, end))
+        for gap_start, gap_end in gaps:
+            if gap_start == float('inf'):
+                continue
+            if compressed or gap_end is None:
+                chunks.append((path, gap_start, gap_end))  # Archives can't be split without decompressing twice
+                continue
+            for chunk_start in range(gap_start, gap_end, chunk_bytes):
+                chunks.append((path, chunk_start, min(chunk_start + chunk_bytes, gap_end)))
+    return chunks
+
+def merge_chunk(conn: sqlite3.Connection, path: str, start: int, end: Optional[int],
+                partial: Dict[str, Counter], lines: int):
+    """Add a chunk's partial aggregates and mark it done, atomically."""
+    with conn:
+        for table, counts in partial.items():
+            conn.executemany(upsert_sql(table), [key + (count,) for key, count in counts.items()])
+        conn.execute("INSERT INTO replay_progress (source, start, end, lines) VALUES (?, ?, ?, ?)",
+                     (source_key(path), start, -1 if end is None else end, lines))
+
+def get_ingest_cursor(db_file: str) -> Optional[Tuple[int, int]]:
+    """The (inode, position) live stats resume from, as recorded in a stats database."""
+    conn = sqlite3.connect(db_file)
+    try:
+        row = conn.execute("SELECT inode, position FROM ingest_cursor WHERE log_name = 'verbose'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return tuple(row) if row else None
+
+def set_ingest_cursor(conn: sqlite3.Connection, inode: int, position: int):
+    with conn:
+        conn.execute("""INSERT INTO ingest_cursor (log_name, inode, position) VALUES ('verbose', ?, ?)
+                        ON CONFLICT(log_name) DO UPDATE SET inode = excluded.inode, position = excluded.position""",
+                     (inode, position))
+
+def replay(sources: List[Tuple[str, Optional[int]]], db_file: str, workers: Optional[int] = None,
+           chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+           on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """Replay logs into db_file, resuming any earlier run against the same file. Blocking.
+
+    Returns counts of chunks replayed, lines read and seconds taken.
+    on_progress(done, total) is called after each merged chunk.
+    """
+    started = time.time()
+    conn = open_target(db_file)
+    lines_read = 0
+    try:
+        chunks = plan_chunks(conn, sources, chunk_bytes)
+        if chunks:
+            # Forking a threaded caller (the bot) can copy a held lock into the workers
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(aggregate_chunk, *chunk) for chunk in chunks]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    path, start, end, partial, lines = future.result()
+                    merge_chunk(conn, path, start, end, partial, lines)
+                    lines_read += lines
+                    if on_progress:
+                        on_progress(done, len(chunks))
+    finally:
+        conn.close()
+    elapsed = time.time() - started
+    logger.info(f"Replayed {len(chunks)} chunk(s), {lines_read} lines into {db_file} in {elapsed:.1f}s")
+    return {'chunks': len(chunks), 'lines': lines_read, 'seconds': round(elapsed, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild player stats from verbose logs")
+    parser.add_argument('logs', nargs='+', help="verbose logs or .gz archives, oldest first")
+    parser.add_argument('--db', required=True, help="stats database to build (resumed if it exists)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-mb', type=int, default=DEFAULT_CHUNK_BYTES // (1024 * 1024),
+                        help="bytes per chunk of uncompressed logs, in MiB")
+    parser.add_argument('--end', type=int, default=None, help="byte offset to stop reading the last log at")
+    parser.add_argument('--json', action='store_true', help="print only the result, as JSON")
+    args = parser.parse_args()
+
+    sources = [(path, None) for path in args.logs[:-1]] + [(args.logs[-1], args.end)]
+    if args.json:
+        print(json.dumps(replay(sources, args.db, args.workers, args.chunk_mb * 1024 * 1024)))
+        return
+    result = replay(sources, args.db, args.workers, args.chunk_mb * 1024 * 1024,
+                    on_progress=lambda done, total: print(f"\r{done}/{total} chunks", end='', flush=True))
+    print(f"\nReplayed {result['chunks']} chunk(s), {result['lines']} lines in {result['seconds']}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import time
+from collections import deque
+from typing import Dict, Optional
+from resource_history import ResourceHistory, percentile, summary
+from softmod_protocol import decode
+
+# Emitted by the softmod every HEARTBEAT_TICKS as a [DW1] heartbeat record with tick and speed
+HEARTBEAT_TICKS = 600
+TICKS_PER_SECOND = 60
+# UPS is measured across the heartbeats of this many seconds, so the tailer's
+# one-second polling adds at most a few percent of jitter
+DEFAULT_SPAN_SECONDS = 60
+# A longer silence means the game was paused or the bot was down, not slow
+DEFAULT_MAX_GAP_SECONDS = 300
+# Rates far above the game speed come from heartbeats read in one batch
+# (e.g. a backlog at startup) and say nothing about the server
+MAX_SPEED_FACTOR = 1.5
+
+class UpsTracker:
+    """Turns softmod heartbeats into a rolling UPS history.
+
+    Each heartbeat carries the game tick; UPS is the tick delta divided by the
+    wall-clock time between reading the heartbeats. Samples land in a
+    ResourceHistory ring buffer with fields ('time', 'ups').
+    """
+
+    def __init__(self, capacity: int, span: float = DEFAULT_SPAN_SECONDS, max_gap: float = DEFAULT_MAX_GAP_SECONDS):
+        self.history = ResourceHistory(capacity, fields=('time', 'ups'))
+        self.span = span
+        self.max_gap = max_gap
+        self.beats = deque()  # (wall time, tick) of recent heartbeats
+        self.speed = 1.0
+        self.last_beat_at: Optional[float] = None
+
+    @property
+    def target(self) -> float:
+        return TICKS_PER_SECOND * self.speed
+
+    def reset(self):
+        self.beats.clear()
+        self.last_beat_at = None
+
+    def feed(self, line: str, now: Optional[float] = None) -> Optional[float]:
+        """Record a heartbeat record line. Returns the new UPS reading, or None if there is none yet."""
+        event = decode(line)
+        if not event or event['t'] != 'heartbeat' or not isinstance(event.get('tick'), (int, float)):
+            return None
+        return self.beat(int(event['tick']), float(event.get('speed') or 1.0), now)
+
+    def beat(self, tick: int, speed: float = 1.0, now: Optional[float] = None) -> Optional[float]:
+        now = now or time.time()
+        self.speed = speed or 1.0
+        if self.beats:
+            last_time, last_tick = self.beats[-1]
+            # A reloaded save goes back in ticks; a long silence is a pause
+            if tick <= last_tick or now - last_time > self.max_gap:
+                self.beats.clear()
+        self.beats.append((now, tick))
+        self.last_beat_at = now
+        while len(self.beats) > 2 and now - self.beats[1][0] >= self.span:
+            self.beats.popleft()
+        if len(self.beats) < 2:
+            return None
+        first_time, first_tick = self.beats[0]
+        if now <= first_time:
+            return None
+        ups = (tick - first_tick) / (now - first_time)
+        if ups > self.target * MAX_SPEED_FACTOR:
+            # Start over from this heartbeat so the next reading is real
+            self.beats.clear()
+            self.beats.append((now, tick))
+            return None
+        self.history.append(time=now, ups=ups)
+        return ups
+
+    def latest(self) -> Optional[float]:
+        sample = self.history.latest()
+        return sample['ups'] if sample else None
+
+    def stats(self, seconds: Optional[float] = None, now: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """{'samples', 'min', 'p1', 'p5', 'p50', 'mean', 'max'} of UPS over the last `seconds`, or None"""
+        values = self.history.window(seconds, now)['ups']
+        if not values:
+            return None
+        low, mean, high = summary(values)
+        return {
+            'samples': len(values),
+            'min': low,
+            'p1': percentile(values, 0.01),
+            'p5': percentile(values, 0.05),
+            'p50': percentile(values, 0.5),
+            'mean': mean,
+            'max': high,
+        }